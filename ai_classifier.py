@@ -1,20 +1,40 @@
 """AI 智能分类器"""
 import os
 import json
+import time
+import threading
 from typing import List, Tuple, Optional
-from openai import OpenAI
-from dotenv import load_dotenv
 from parser import Bookmark
-from config import DEFAULT_CATEGORY
+from metrics import AIMetrics
+from canonicalizer import CategoryCanonicalizer
+from config import DEFAULT_CATEGORY, AI_MAX_RETRIES, AI_PROMPT_CACHE_MODELS
 
-# 加载环境变量
-load_dotenv()
+# 系统提示词中的示例（书签, 期望的分类），演示请求和返回的格式
+_EXAMPLES = [
+    (Bookmark(url="https://github.com/facebook/react",
+              title="facebook/react: The library for web and native user interfaces"), ("技术开发", "代码仓库")),
+    (Bookmark(url="https://www.binance.com/zh-CN/markets", title="币安 - 行情"), ("金融投资", "数字货币")),
+    (Bookmark(url="https://www.figma.com/", title="Figma: The Collaborative Interface Design Tool"), ("设计资源", None)),
+]
 
 
 class AIBookmarkClassifier:
     """基于 AI 的书签智能分类器"""
 
-    def __init__(self):
+    def __init__(self, resume: bool = True, checkpoint: bool = True, verbose: bool = True):
+        """
+        :param resume: 存在上次中断的分类断点时从断点继续（False 则从头开始）
+        :param checkpoint: 是否记录分类断点（流水线模式每次只分类一小批，不需要）
+        :param verbose: 每次调用 classify_batch 都显示标题和逐批进度；流水线和超出内存模式会分很多批调用，
+                        关闭后整次运行只显示一次标题，进度合并为一行，结束时由调用方调用 end_progress
+        """
+        # openai / dotenv 导入较慢，只在真正使用 AI 分类时加载
+        from openai import OpenAI
+        from dotenv import load_dotenv
+
+        # 加载环境变量
+        load_dotenv()
+
         # 初始化 OpenRouter 客户端
         api_key = os.getenv('OPENROUTER_API_KEY')
         if not api_key:
@@ -26,13 +46,32 @@ class AIBookmarkClassifier:
             default_headers={
                 "HTTP-Referer": "https://github.com/zzfn/tabsort",
                 "X-Title": "TabSort"
-            }
+            },
+            max_retries=0  # 重试由 _request 处理，以便统计重试次数
         )
 
         self.model = os.getenv('OPENROUTER_MODEL', 'anthropic/claude-3.5-sonnet')
 
+        # 每次请求的 token 用量、耗时、重试等指标
+        self.metrics = AIMetrics(self.model)
+        self.resume = resume
+        self.checkpoint = checkpoint
+        self.verbose = verbose
+
+        # 非 verbose 模式下整次运行的累计进度（流水线模式下可能并发调用 classify_batch）
+        self._progress_lock = threading.Lock()
+        self._progress_done = 0
+        self._progress_start = None
+
+        # 逐个分类失败（降级为默认分类）的次数，失败的批次不写入断点，续跑时重新分类
+        self.failures = 0
+
+        # AI 生成的分类名称归一（跨批次合并同义分类），归一后的分类列表提示后续批次复用
+        self.canonicalizer = CategoryCanonicalizer()
+
         # 构建分类提示词
         self.system_prompt = self._build_system_prompt()
+        self.system_message = self._build_system_message()
 
     def _build_system_prompt(self) -> str:
         """构建系统提示词"""
@@ -76,190 +115,344 @@ class AIBookmarkClassifier:
 - figma.com, dribbble.com → 设计资源
 - youtube.com, bilibili.com → 视频娱乐
 
-返回格式（sub为可选，没有子分类时填null）：
-{
-  "results": [
-    {"no": 0, "main": "技术开发", "sub": "代码仓库"},
-    {"no": 1, "main": "技术开发", "sub": "技术社区"},
-    {"no": 2, "main": "设计资源", "sub": null}
-  ]
-}
+书签每行一个 JSON 对象（no 为编号），按编号返回每个书签的分类（sub为可选，没有子分类时填null）：
+{"results": [{"no": 编号, "main": "主分类", "sub": "子分类"}, ...]}
+
+示例输入：
+""" + self._format_bookmarks([bookmark for bookmark, _ in _EXAMPLES], 0) + """
+
+示例输出：
+""" + json.dumps({"results": [{"no": no, "main": main, "sub": sub} for no, (_, (main, sub)) in enumerate(_EXAMPLES)]},
+                 ensure_ascii=False) + """
 
 注意：直接返回JSON，不要添加任何解释文字。
 """
 
-    def classify(self, bookmark: Bookmark) -> Tuple[str, Optional[str]]:
+    def _build_system_message(self) -> dict:
         """
-        使用 AI 分类单个书签
-        返回: (主分类, 子分类)
+        每次请求相同的系统消息（分类规则、返回格式和示例），只构建一次，保证逐字节相同，
+        服务端可以缓存这段前缀，之后的请求只需处理末尾的书签
+        OpenAI、DeepSeek 等模型自动缓存相同前缀；Anthropic、Gemini 需要用 cache_control 标记缓存位置
+        """
+        if self.model.startswith(AI_PROMPT_CACHE_MODELS):
+            content = [{"type": "text", "text": self.system_prompt, "cache_control": {"type": "ephemeral"}}]
+            return {"role": "system", "content": content}
+        return {"role": "system", "content": self.system_prompt}
+
+    @staticmethod
+    def _format_bookmarks(batch: List[Bookmark], batch_start: int) -> str:
+        """书签每行一个紧凑的 JSON 对象（比缩进的 JSON 数组少用很多 token）"""
+        return "\n".join(
+            json.dumps({"no": batch_start + idx, "title": bm.title, "url": bm.url}, ensure_ascii=False)
+            for idx, bm in enumerate(batch)
+        )
+
+    def _messages(self, batch: List[Bookmark], batch_start: int,
+                  known_categories: Optional[List[Tuple[str, Optional[str]]]] = None) -> List[dict]:
+        """
+        请求消息：不变的系统消息在前，每次不同的已有分类和书签放在最后
         """
-        user_message = f"""请分类以下书签：
+        known_section = ""
+        if known_categories:
+            known_section = self._format_known_categories(known_categories) + "\n\n"
 
-标题: {bookmark.title}
-URL: {bookmark.url}
+        user_message = f"""{known_section}请分类以下 {len(batch)} 个书签：
+{self._format_bookmarks(batch, batch_start)}"""
 
-请返回 JSON 格式的分类结果。"""
+        return [self.system_message, {"role": "user", "content": user_message}]
 
+    def _request(self, kind: str, items: int, **kwargs):
+        """
+        发送请求，网络错误、限流和服务端错误时指数退避重试
+        记录每次请求的耗时、token 用量、finish_reason 和重试次数
+        :param kind: 请求类型（'batch' / 'single'）
+        :param items: 本次请求分类的书签数
+        """
+        import openai
+
+        retries = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.client.chat.completions.create(model=self.model, **kwargs)
+            except (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError) as e:
+                if retries < AI_MAX_RETRIES:
+                    retries += 1
+                    time.sleep(min(0.5 * 2 ** retries, 8.0))
+                    continue
+                self.metrics.record(kind, items, time.perf_counter() - start,
+                                    retries=retries, error=type(e).__name__)
+                raise
+            except Exception as e:
+                self.metrics.record(kind, items, time.perf_counter() - start,
+                                    retries=retries, error=type(e).__name__)
+                raise
+
+            usage = getattr(response, 'usage', None)
+            # 命中服务端提示词缓存的输入 token 数（包含在 prompt_tokens 中）
+            prompt_details = getattr(usage, 'prompt_tokens_details', None)
+            self.metrics.record(
+                kind, items, time.perf_counter() - start,
+                prompt_tokens=getattr(usage, 'prompt_tokens', None),
+                completion_tokens=getattr(usage, 'completion_tokens', None),
+                cached_tokens=getattr(prompt_details, 'cached_tokens', None),
+                finish_reason=response.choices[0].finish_reason if response.choices else None,
+                retries=retries,
+            )
+            return response
+
+    def classify(self, bookmark: Bookmark) -> Tuple[str, Optional[str]]:
+        """
+        使用 AI 分类单个书签
+        返回: (主分类, 子分类)
+        """
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
+            # 与批量分类使用相同的系统消息，同样可以命中提示词缓存
+            response = self._request(
+                'single', 1,
+                messages=self._messages([bookmark], 0),
                 temperature=0.3,
                 max_tokens=150,
-                timeout=30.0  # 30秒超时
+                timeout=30.0,  # 30秒超时
+                response_format={"type": "json_object"}
             )
 
             result_text = response.choices[0].message.content.strip()
 
-            # 尝试解析 JSON - 改进的解析逻辑
             # 移除可能的 markdown 代码块标记
             if result_text.startswith('```'):
                 lines = result_text.split('\n')
                 # 移除第一行的 ```json 和最后一行的 ```
                 result_text = '\n'.join(lines[1:-1]).strip()
 
-            # 提取第一个有效的JSON对象
-            # 处理多行或带额外文本的情况
-            start = result_text.find('{')
-            end = result_text.find('}', start)
-            if start != -1 and end != -1:
-                result_text = result_text[start:end+1]
-
             result = json.loads(result_text)
+            if isinstance(result.get('results'), list) and result['results']:
+                result = result['results'][0]
 
             main_category = result.get('main', DEFAULT_CATEGORY)
             sub_category = result.get('sub')
 
-            # 不再验证分类，AI可以自由生成分类名称
-            return main_category, sub_category
+            # AI可以自由生成分类名称，只归一同义名称
+            return self.canonicalizer.canonicalize(main_category, sub_category)
 
         except Exception as e:
+            self.failures += 1
             print(f"⚠️  AI 分类失败 ({bookmark.title[:30]}...): {str(e)}")
             # 降级到默认分类
             return DEFAULT_CATEGORY, None
 
-    def classify_batch(self, bookmarks: List[Bookmark], batch_size: int = 1000) -> dict:
+    def classify_batch(self, bookmarks: List[Bookmark], batch_size: int = 1000,
+                       known_categories: Optional[List[Tuple[str, Optional[str]]]] = None) -> dict:
         """
         批量分类书签（真正的批量，一次请求多个）
+        :param known_categories: 已有的分类 [(主分类, 子分类)]，提示 AI 优先复用
         返回: {(主分类, 子分类): [书签列表]}
         """
+        from checkpoint import ClassificationCheckpoint, input_fingerprint
+
         classified = {}
         total = len(bookmarks)
 
+        if self.verbose:
+            print(f"\n🤖 使用 AI 进行智能分类...")
+            print(f"   模型: {self.model}")
+            print(f"   总计: {total} 个书签")
+            print(f"   批量大小: {batch_size} 个/次")
+        else:
+            self._start_progress(batch_size)
+
+        # 每完成一个批次写入断点，中断后重新运行可跳过已完成的批次
+        checkpoint = None
+        finished = {}
+        if self.checkpoint:
+            checkpoint = ClassificationCheckpoint(
+                input_fingerprint(bookmarks, self.model, batch_size, known_categories)
+            )
+            finished = checkpoint.load() if self.resume else {}
+            checkpoint.open(self.model, batch_size, total, resume=self.resume)
+
+        # 已有分类作为同义名称的标准名称，后续批次的提示中包含已有分类和之前批次出现过的分类
+        if known_categories:
+            self.canonicalizer.add_known(known_categories)
+
+        resumed = sum(len(keys) for keys in finished.values())
+        if resumed:
+            print(f"   ♻️  发现上次中断的分类进度，已完成 {resumed}/{total}，从断点继续")
+
+        pending = total - resumed
+        done = 0
+        processed = 0
+        failed_batches = 0
+        start_time = time.perf_counter()
+
+        try:
+            # 分批处理
+            for batch_start in range(0, total, batch_size):
+                batch_end = min(batch_start + batch_size, total)
+                batch = bookmarks[batch_start:batch_end]
+
+                keys = finished.get(batch_start)
+                if keys is not None and len(keys) == len(batch):
+                    # 断点中的分类也登记到归一器，后续批次沿用相同的名称
+                    keys = [self.canonicalizer.canonicalize(*key) for key in keys]
+                else:
+                    if self.verbose:
+                        print(f"\n   处理批次: {batch_start+1}-{batch_end}/{total}")
+
+                    failures = self.failures
+                    keys = self.classify_chunk(batch, batch_start, self._prompt_categories())
+                    if self.failures == failures:
+                        if checkpoint is not None:
+                            checkpoint.append(batch_start, keys)
+                    else:
+                        failed_batches += 1
+                        print(f"   ⚠️  本批次有 {self.failures - failures} 个书签分类失败，未记录断点，下次运行将重新分类")
+
+                    processed += len(batch)
+                    if self.verbose:
+                        self._print_progress(done + len(batch), total, processed, pending, start_time)
+                    else:
+                        self._advance_progress(len(batch))
+
+                done += len(batch)
+                for bookmark, key in zip(batch, keys):
+                    if key not in classified:
+                        classified[key] = []
+                    classified[key].append(bookmark)
+
+        except KeyboardInterrupt:
+            if checkpoint is None:
+                raise
+            checkpoint.close()
+            print(f"\n\n⏸️  分类已中断，进度已保存（{done}/{total}），重新运行将从断点继续")
+            raise
+
+        # 有批次失败时保留断点，重新运行只会重试失败的批次
+        if checkpoint is not None:
+            if failed_batches:
+                checkpoint.close()
+                print(f"\n   💾 {failed_batches} 个批次分类失败，断点已保留，重新运行将只重试这些批次")
+            else:
+                checkpoint.remove()
+        return classified
+
+    def _print_progress(self, done: int, total: int, processed: int, pending: int, start_time: float):
+        """
+        显示进度、本次运行的吞吐量和预计剩余时间
+        :param processed: 本次运行实际请求分类的书签数
+        :param pending: 本次运行需要请求分类的书签总数（不含从断点恢复的）
+        """
+        elapsed = time.perf_counter() - start_time
+        rate = processed / elapsed if elapsed > 0 else 0
+        progress = f"   进度: {done}/{total} ({done * 100 // total}%)"
+
+        if rate:
+            eta = int((pending - processed) / rate)
+            progress += f" | {rate:.1f} 个/秒 | 预计剩余 {eta // 60}分{eta % 60:02d}秒"
+        print(progress)
+
+    def _start_progress(self, batch_size: int):
+        """非 verbose 模式：第一次调用 classify_batch 时显示一次标题"""
+        with self._progress_lock:
+            if self._progress_start is not None:
+                return
+            self._progress_start = time.perf_counter()
         print(f"\n🤖 使用 AI 进行智能分类...")
         print(f"   模型: {self.model}")
-        print(f"   总计: {total} 个书签")
         print(f"   批量大小: {batch_size} 个/次")
 
-        # 分批处理
-        for batch_start in range(0, total, batch_size):
-            batch_end = min(batch_start + batch_size, total)
-            batch = bookmarks[batch_start:batch_end]
+    def _advance_progress(self, count: int):
+        """非 verbose 模式：在同一行更新本次运行累计的分类数和吞吐量"""
+        with self._progress_lock:
+            self._progress_done += count
+            done = self._progress_done
+            elapsed = time.perf_counter() - self._progress_start
+            rate = done / elapsed if elapsed > 0 else 0
+            print(f"\r   进度: 已分类 {done} 个 | {rate:.1f} 个/秒", end='', flush=True)
+
+    def end_progress(self):
+        """非 verbose 模式：结束进度行（没有显示过进度时不输出）"""
+        with self._progress_lock:
+            if self._progress_done:
+                print()
+
+    def _prompt_categories(self) -> Optional[List[Tuple[str, Optional[str]]]]:
+        """提示 AI 复用的分类：已有分类和之前批次归一后的分类（不含默认分类和未分类）"""
+        categories = [key for key in self.canonicalizer.categories() if key[0] not in (DEFAULT_CATEGORY, '未分类')]
+        return categories or None
+
+    def _format_known_categories(self, known_categories: List[Tuple[str, Optional[str]]]) -> str:
+        """将已有分类格式化为提示词片段"""
+        lines = []
+        for main_category, sub_category in known_categories:
+            lines.append(f"- {main_category} / {sub_category}" if sub_category else f"- {main_category}")
+
+        return "已有分类（请优先复用以下分类名称，确实不合适时再新建）：\n" + "\n".join(lines)
+
+    def classify_chunk(self, batch: List[Bookmark], batch_start: int,
+                       known_categories: Optional[List[Tuple[str, Optional[str]]]] = None) -> List[Tuple[str, Optional[str]]]:
+        """
+        一次请求分类一批书签
+        返回: 与 batch 一一对应的 [(主分类, 子分类)]
+        """
+        try:
+            response = self._request(
+                'batch', len(batch),
+                messages=self._messages(batch, batch_start, known_categories),
+                temperature=0.3,
+                timeout=120.0,  # 增加超时时间
+                response_format={"type": "json_object"}
+            )
 
-            print(f"\n   处理批次: {batch_start+1}-{batch_end}/{total}")
+            # 检查响应
+            if not response.choices:
+                raise ValueError("API返回choices为空")
 
-            # 构建批量请求
-            bookmarks_data = []
-            for idx, bm in enumerate(batch):
-                bookmarks_data.append({
-                    "no": batch_start + idx,
-                    "title": bm.title,
-                    "url": bm.url
-                })
+            result_text = response.choices[0].message.content
 
-            user_message = f"""请分类以下 {len(batch)} 个书签，返回JSON格式：
+            if not result_text:
+                raise ValueError(f"API返回内容为空，finish_reason: {response.choices[0].finish_reason}")
 
-{json.dumps(bookmarks_data, ensure_ascii=False, indent=2)}
+            result_text = result_text.strip()
 
-请返回格式（sub为可选，没有子分类时填null）：
-{{
-  "results": [
-    {{"no": 0, "main": "主分类", "sub": "子分类"}},
-    {{"no": 1, "main": "主分类", "sub": null}},
-    ...
-  ]
-}}"""
+            # 解析 JSON
+            data = json.loads(result_text)
+            results = data.get('results', [])
 
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": user_message}
-                    ],
-                    temperature=0.3,
-                    timeout=120.0,  # 增加超时时间
-                    response_format={"type": "json_object"}
-                )
-
-                # 检查响应
-                if not response.choices:
-                    raise ValueError("API返回choices为空")
-
-                result_text = response.choices[0].message.content
-
-                if not result_text:
-                    raise ValueError(f"API返回内容为空，finish_reason: {response.choices[0].finish_reason}")
-
-                result_text = result_text.strip()
-
-                # 解析 JSON
-                data = json.loads(result_text)
-                results = data.get('results', [])
-
-                # 检查返回数量
-                if len(results) != len(batch):
-                    print(f"\n   ⚠️  AI返回数量不一致: 期望{len(batch)}个，实际{len(results)}个，未分类的将归入'未分类'")
-
-                # 记录已处理的索引
-                processed_indices = set()
-
-                # 处理AI返回的结果
-                for result in results:
-                    idx = result.get('no', 0)
-                    batch_idx = idx - batch_start
-
-                    if batch_idx < 0 or batch_idx >= len(batch):
-                        print(f"\n   ⚠️  索引越界: {idx}，跳过")
-                        continue
-
-                    bookmark = batch[batch_idx]
-                    main_category = result.get('main', DEFAULT_CATEGORY)
-                    sub_category = result.get('sub')
-
-                    # AI自由生成分类，不再验证
-                    key = (main_category, sub_category)
-                    if key not in classified:
-                        classified[key] = []
-                    classified[key].append(bookmark)
-                    processed_indices.add(batch_idx)
-
-                # 处理未被AI分类的书签，归入"未分类"
-                missing_count = len(batch) - len(processed_indices)
-                if missing_count > 0:
-                    print(f"\n   📌 有 {missing_count} 个书签未分类，归入'未分类'")
-                    for i, bookmark in enumerate(batch):
-                        if i not in processed_indices:
-                            key = ("未分类", None)
-                            if key not in classified:
-                                classified[key] = []
-                            classified[key].append(bookmark)
+            # 检查返回数量
+            if len(results) != len(batch):
+                print(f"\n   ⚠️  AI返回数量不一致: 期望{len(batch)}个，实际{len(results)}个，未分类的将归入'未分类'")
 
-            except Exception as e:
-                print(f"\n   ⚠️  批次分类失败: {str(e)}")
-                print(f"   降级为逐个分类...")
-                # 降级处理：逐个分类这个批次
-                for bookmark in batch:
-                    category, subcategory = self.classify(bookmark)
-                    key = (category, subcategory)
-                    if key not in classified:
-                        classified[key] = []
-                    classified[key].append(bookmark)
+            keys: List[Optional[Tuple[str, Optional[str]]]] = [None] * len(batch)
 
-        return classified
+            # 处理AI返回的结果
+            for result in results:
+                idx = result.get('no', 0)
+                batch_idx = idx - batch_start
+
+                if batch_idx < 0 or batch_idx >= len(batch):
+                    print(f"\n   ⚠️  索引越界: {idx}，跳过")
+                    continue
+
+                main_category = result.get('main', DEFAULT_CATEGORY)
+                sub_category = result.get('sub')
+
+                # AI自由生成分类，只归一同义名称
+                keys[batch_idx] = self.canonicalizer.canonicalize(main_category, sub_category)
+
+            # 处理未被AI分类的书签，归入"未分类"
+            missing_count = keys.count(None)
+            if missing_count > 0:
+                print(f"\n   📌 有 {missing_count} 个书签未分类，归入'未分类'")
+                keys = [key if key is not None else ("未分类", None) for key in keys]
+
+            return keys
+
+        except Exception as e:
+            print(f"\n   ⚠️  批次分类失败: {str(e)}")
+            print(f"   降级为逐个分类...")
+            # 降级处理：逐个分类这个批次
+            return [self.classify(bookmark) for bookmark in batch]
 
     def get_category_stats(self, classified: dict) -> dict:
         """获取分类统计"""
@@ -0,0 +1,87 @@
+"""书签分析：一次遍历得到去重、重复分组和统计结果"""
+from functools import cached_property
+from typing import List, Dict, Tuple
+from parser import Bookmark
+
+
+class BookmarkAnalyzer:
+    """
+    书签分析器
+    所有结果都来自同一次遍历（_scan），首次访问任一结果时才执行，之后缓存复用；
+    新增报表时应从 _scan 的中间结果派生，而不是再遍历一遍书签
+    """
+
+    def __init__(self, bookmarks: List[Bookmark]):
+        self.bookmarks = bookmarks
+
+    @cached_property
+    def _scan(self) -> Tuple[List[Bookmark], List[Bookmark], Dict[str, List[Bookmark]], Dict[str, int]]:
+        """
+        单次遍历
+        返回: (唯一书签, 重复书签, {去掉hash的URL: [书签列表]}, {域名: 书签数})
+        """
+        seen = set()
+        unique = []
+        duplicates = []
+        url_groups: Dict[str, List[Bookmark]] = {}
+        domains: Dict[str, int] = {}
+
+        for bookmark in self.bookmarks:
+            url = bookmark.url
+
+            if url not in seen:
+                seen.add(url)
+                unique.append(bookmark)
+            else:
+                duplicates.append(bookmark)
+
+            base_url = url.partition('#')[0]
+            group = url_groups.get(base_url)
+            if group is None:
+                url_groups[base_url] = [bookmark]
+            else:
+                group.append(bookmark)
+
+            if bookmark.domain:
+                domains[bookmark.domain] = domains.get(bookmark.domain, 0) + 1
+
+        return unique, duplicates, url_groups, domains
+
+    @cached_property
+    def unique(self) -> List[Bookmark]:
+        """去重后的书签（基于URL，保留首次出现的）"""
+        return self._scan[0]
+
+    @cached_property
+    def duplicates(self) -> List[Bookmark]:
+        """被去掉的重复书签"""
+        return self._scan[1]
+
+    @cached_property
+    def hash_only_duplicates(self) -> List[Tuple[str, List[Bookmark]]]:
+        """
+        只有hash不同的重复书签
+        返回: [(基础URL, [书签列表])]，只包含有多个书签的组，按重复数量从多到少排序
+        """
+        groups = [(url, group) for url, group in self._scan[2].items() if len(group) > 1]
+        groups.sort(key=lambda x: len(x[1]), reverse=True)
+        return groups
+
+    @cached_property
+    def domain_counts(self) -> Dict[str, int]:
+        """{域名: 书签数}"""
+        return self._scan[3]
+
+    @cached_property
+    def stats(self) -> Dict:
+        """统计信息"""
+        total = len(self.bookmarks)
+        unique = len(self.unique)
+
+        return {
+            'total': total,
+            'unique': unique,
+            'duplicates': total - unique,
+            'domains_count': len(self.domain_counts),
+            'domains': self.domain_counts
+        }
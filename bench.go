@@ -0,0 +1,87 @@
+package main
+
+import (
+	"bufio"
+	"encoding/json"
+	"fmt"
+	"os"
+	"time"
+)
+
+// ---- 基准测试 ----
+// tabsort bench <Bookmarks.json> <结果.jsonl>
+// 读取、去重、规则分类并分阶段计时，分类结果逐行写入 JSONL，耗时汇总以 JSON 打印到标准输出。
+// 由 benchmark.py 调用，与 Python 实现对比吞吐量、峰值内存和分类结果。
+
+type benchRecord struct {
+	URL  string `json:"url"`
+	Main string `json:"main"`
+	Sub  string `json:"sub"`
+}
+
+type benchSummary struct {
+	Total      int     `json:"total"`
+	Unique     int     `json:"unique"`
+	ParseMs    float64 `json:"parse_ms"`
+	DedupMs    float64 `json:"dedup_ms"`
+	ClassifyMs float64 `json:"classify_ms"`
+}
+
+func msSince(t time.Time) float64 {
+	return float64(time.Since(t).Microseconds()) / 1000
+}
+
+func runBench(args []string) int {
+	if len(args) != 2 {
+		fmt.Fprintln(os.Stderr, "用法: tabsort bench <Bookmarks.json> <结果.jsonl>")
+		return 2
+	}
+
+	var summary benchSummary
+
+	start := time.Now()
+	bf, err := ReadBookmarks(args[0])
+	if err != nil {
+		fmt.Fprintf(os.Stderr, "❌ 读取失败: %v\n", err)
+		return 1
+	}
+	bookmarks := FlattenBookmarks(&bf.Roots.BookmarkBar)
+	summary.ParseMs = msSince(start)
+	summary.Total = len(bookmarks)
+
+	start = time.Now()
+	unique, _ := Dedup(bookmarks)
+	summary.DedupMs = msSince(start)
+	summary.Unique = len(unique)
+
+	start = time.Now()
+	classified := ClassifyRules(unique)
+	summary.ClassifyMs = msSince(start)
+
+	f, err := os.Create(args[1])
+	if err != nil {
+		fmt.Fprintf(os.Stderr, "❌ 写入失败: %v\n", err)
+		return 1
+	}
+	defer f.Close()
+
+	w := bufio.NewWriter(f)
+	enc := json.NewEncoder(w)
+	enc.SetEscapeHTML(false)
+	for key, bms := range classified {
+		for _, bm := range bms {
+			if err := enc.Encode(benchRecord{URL: bm.URL, Main: key.Main, Sub: key.Sub}); err != nil {
+				fmt.Fprintf(os.Stderr, "❌ 写入失败: %v\n", err)
+				return 1
+			}
+		}
+	}
+	if err := w.Flush(); err != nil {
+		fmt.Fprintf(os.Stderr, "❌ 写入失败: %v\n", err)
+		return 1
+	}
+
+	out, _ := json.Marshal(summary)
+	fmt.Println(string(out))
+	return 0
+}
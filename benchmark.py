@@ -0,0 +1,374 @@
+"""
+性能基准测试
+
+用法：
+    python benchmark.py            # 运行全部检查
+    python benchmark.py startup    # 只检查导入耗时和冷启动耗时
+    python benchmark.py go         # 与 Go 实现对比吞吐量、峰值内存和分类结果（需要 Go 1.22+，见 go.mod）
+
+不满足预算时以非零状态码退出，可以直接放进 CI。
+"""
+import os
+import sys
+import json
+import time
+import html
+import shutil
+import random
+import tempfile
+import subprocess
+from typing import Dict, Tuple, Iterator
+
+from config import CATEGORIES
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 导入 main 模块的耗时预算（毫秒，取多次运行的最小值）
+IMPORT_BUDGET_MS = 150
+
+# 规则分类冷启动目标：新进程整理 1000 个书签的总耗时（毫秒）
+COLD_START_TARGET_MS = 1000
+COLD_START_CORPUS_SIZE = 1000
+
+# 导入 main 时不应加载的重依赖（只在对应功能中按需导入）
+HEAVY_MODULES = ('openai', 'bs4', 'pick', 'dotenv', 'numpy')
+
+# 与 Go 实现对比时的语料书签数
+GO_BENCH_CORPUS_SIZE = 100000
+
+# Chrome 时间戳起点（1601-01-01）与 Unix 时间戳的差（秒）
+_CHROME_EPOCH_DELTA = 11644473600
+
+
+def _corpus_records(count: int, seed: int = 0) -> Iterator[Tuple[str, str, int]]:
+    """
+    生成合成书签 (URL, 标题, 添加时间)
+    域名一半来自规则配置，一半是随机域名；约 5% 为重复书签
+    """
+    rng = random.Random(seed)
+    known_domains = sorted({d for info in CATEGORIES.values() for d in info.get('domains', [])})
+    words = ['react', 'python', 'blog', 'docs', 'music', 'stock', 'design', 'docker',
+             'tutorial', 'api', 'news', 'video', '教程', '工具', '笔记', 'guide']
+
+    previous = []
+    for i in range(count):
+        if previous and rng.random() < 0.05:
+            url, title = rng.choice(previous)
+        else:
+            if rng.random() < 0.5:
+                domain = rng.choice(known_domains)
+            else:
+                domain = f"site{rng.randrange(count)}.example.com"
+            path_part = '/'.join(rng.sample(words, 2))
+            url = f"https://{domain}/{path_part}/{i}"
+            title = ' '.join(rng.sample(words, 3))
+            previous.append((url, title))
+
+        yield url, title, 1500000000 + rng.randrange(200000000)
+
+
+def generate_corpus(path: str, count: int, seed: int = 0):
+    """生成 Netscape 格式的合成书签文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE NETSCAPE-Bookmark-file-1>\n')
+        f.write('<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n')
+        f.write('<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n')
+        f.write('    <DT><H3 ADD_DATE="1700000000">书签栏</H3>\n    <DL><p>\n')
+
+        for url, title, add_date in _corpus_records(count, seed):
+            f.write(f'        <DT><A HREF="{html.escape(url)}" ADD_DATE="{add_date}">'
+                    f'{html.escape(title)}</A>\n')
+
+        f.write('    </DL><p>\n</DL><p>\n')
+
+
+def generate_chrome_corpus(path: str, count: int, seed: int = 0):
+    """生成与 generate_corpus 内容相同的 Chrome Bookmarks JSON 文件（Go 实现读取该格式）"""
+    children = [
+        {
+            'date_added': str((add_date + _CHROME_EPOCH_DELTA) * 1_000_000),
+            'id': str(i + 4),
+            'name': title,
+            'type': 'url',
+            'url': url,
+        }
+        for i, (url, title, add_date) in enumerate(_corpus_records(count, seed))
+    ]
+    data = {
+        'checksum': '',
+        'roots': {
+            'bookmark_bar': {'children': children, 'id': '1', 'name': '书签栏', 'type': 'folder'},
+            'other': {'children': [], 'id': '2', 'name': '其他书签', 'type': 'folder'},
+            'synced': {'children': [], 'id': '3', 'name': '移动设备书签', 'type': 'folder'},
+        },
+        'version': 1,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """
+    解析 `python -X importtime` 的输出
+    返回: {模块名: (自身耗时us, 累计耗时us)}
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        modules[name] = (int(parts[0]), int(parts[1]))
+    return modules
+
+
+def measure_import(module: str = 'main', runs: int = 5) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """
+    在新进程中测量导入模块的耗时
+    返回: (最小耗时ms, 最后一次运行导入的模块)
+    """
+    best = None
+    modules = {}
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True
+        )
+        modules = parse_importtime(result.stderr)
+        cumulative_ms = modules.get(module, (0, 0))[1] / 1000
+        best = cumulative_ms if best is None else min(best, cumulative_ms)
+    return best, modules
+
+
+def measure_cold_start(corpus: str, output: str, runs: int = 3) -> float:
+    """新进程中以规则模式整理书签的耗时（毫秒，取最小值）"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, 'main.py'), corpus, '--mode', 'rules', '-o', output],
+            cwd=os.path.dirname(corpus), stdout=subprocess.DEVNULL, check=True
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def check_startup() -> bool:
+    """检查导入耗时预算、重依赖是否被提前导入，以及规则分类冷启动耗时"""
+    ok = True
+
+    print("\n⏱️  启动耗时")
+    print("-" * 60)
+
+    import_ms, modules = measure_import('main')
+    status = "✅" if import_ms <= IMPORT_BUDGET_MS else "❌"
+    ok &= import_ms <= IMPORT_BUDGET_MS
+    print(f"   {status} import main: {import_ms:.1f} ms (预算 {IMPORT_BUDGET_MS} ms)")
+
+    eager = [name for name in HEAVY_MODULES if name in modules]
+    if eager:
+        ok = False
+        print(f"   ❌ 导入 main 时加载了重依赖: {', '.join(eager)}")
+    else:
+        print(f"   ✅ 未提前加载重依赖: {', '.join(HEAVY_MODULES)}")
+
+    slowest = sorted(modules.items(), key=lambda x: x[1][0], reverse=True)[:5]
+    print("   最慢的模块（自身耗时）:")
+    for name, (self_us, _) in slowest:
+        print(f"     • {name}: {self_us / 1000:.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, 'corpus.html')
+        generate_corpus(corpus, COLD_START_CORPUS_SIZE)
+        cold_ms = measure_cold_start(corpus, os.path.join(tmp, 'out.html'))
+
+    status = "✅" if cold_ms <= COLD_START_TARGET_MS else "❌"
+    ok &= cold_ms <= COLD_START_TARGET_MS
+    print(f"   {status} 规则分类冷启动（{COLD_START_CORPUS_SIZE} 个书签）: {cold_ms:.0f} ms "
+          f"(目标 {COLD_START_TARGET_MS} ms)")
+
+    return ok
+
+
+def python_bench(corpus: str, output: str):
+    """
+    Python 实现的基准（在子进程中运行）：解析、去重、规则分类并分阶段计时
+    分类结果逐行写入 output（JSONL），耗时汇总以 JSON 打印到标准输出，格式与 `tabsort bench` 相同
+    只使用 config.CATEGORIES 的内置规则（不加载 generated_rules.json 和 TABSORT_RULES_FILE），结果不随本地环境变化
+    """
+    from parser import BookmarkParser
+    from classifier import BookmarkClassifier
+    from rules import load_rules
+
+    rules = load_rules(path=None, generated_path=None, verbose=False)
+
+    start = time.perf_counter()
+    parser = BookmarkParser(corpus)
+    bookmarks = parser.parse()
+    parse_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    unique, _ = parser.get_unique_bookmarks()
+    dedup_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    classified = BookmarkClassifier(rules).classify_batch(unique)
+    classify_ms = (time.perf_counter() - start) * 1000
+
+    with open(output, 'w', encoding='utf-8') as f:
+        for (category, subcategory), group in classified.items():
+            for bookmark in group:
+                f.write(json.dumps({'url': bookmark.url, 'main': category, 'sub': subcategory or ''},
+                                   ensure_ascii=False))
+                f.write('\n')
+
+    print(json.dumps({'total': len(bookmarks), 'unique': len(unique), 'parse_ms': parse_ms,
+                      'dedup_ms': dedup_ms, 'classify_ms': classify_ms}))
+
+
+def run_measured(cmd: list, cwd: str) -> Tuple[dict, float, float]:
+    """
+    运行基准子进程
+    返回: (子进程打印的耗时汇总, 总耗时ms, 峰值内存MB)
+    """
+    with tempfile.TemporaryFile(mode='w+', encoding='utf-8') as stdout:
+        start = time.perf_counter()
+        process = subprocess.Popen(cmd, cwd=cwd, stdout=stdout)
+        # 用 wait4 取得子进程的资源用量（ru_maxrss 在 Linux 上单位为 KB，macOS 上为字节）
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = (time.perf_counter() - start) * 1000
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+
+        stdout.seek(0)
+        summary = json.loads(stdout.read().strip().splitlines()[-1])
+
+    peak_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return summary, elapsed, peak_mb
+
+
+def load_results(path: str) -> Dict[str, Tuple[str, str]]:
+    """读取分类结果 JSONL: {URL: (主分类, 子分类)}"""
+    results = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            results[record['url']] = (record['main'], record['sub'])
+    return results
+
+
+def check_go() -> bool:
+    """
+    在同一份合成语料上对比 Python 与 Go 实现：吞吐量、峰值内存，以及去重和规则分类结果的差异
+    分类差异只做报告（两边的规则表各自维护），去重结果不一致或任一实现运行失败时检查不通过
+    """
+    print("\n🆚 Python / Go 实现对比")
+    print("-" * 60)
+
+    if shutil.which('go') is None:
+        print("   ⏭️  未找到 go，跳过")
+        return True
+
+    # 本地安装的版本（GOTOOLCHAIN=local，不触发工具链切换）
+    go_version = subprocess.run(['go', 'env', 'GOVERSION'], capture_output=True, text=True,
+                                env={**os.environ, 'GOTOOLCHAIN': 'local'}).stdout.strip()
+    print(f"   Go: {go_version or '未知版本'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        go_binary = os.path.join(tmp, 'tabsort-go')
+        try:
+            subprocess.run(['go', 'build', '-o', go_binary, '.'], cwd=REPO_DIR, check=True)
+        except subprocess.CalledProcessError:
+            # go.mod 要求 go 1.22.0：Go 1.21 会自动下载该版本的工具链（GOTOOLCHAIN=auto），离线或 GOTOOLCHAIN=local 时编译失败
+            print("   ❌ Go 实现编译失败（需要 Go 1.22+；Go 1.21 需要能联网自动下载 go1.22.0 工具链）")
+            return False
+
+        html_corpus = os.path.join(tmp, 'corpus.html')
+        json_corpus = os.path.join(tmp, 'Bookmarks')
+        generate_corpus(html_corpus, GO_BENCH_CORPUS_SIZE)
+        generate_chrome_corpus(json_corpus, GO_BENCH_CORPUS_SIZE)
+        print(f"   语料: {GO_BENCH_CORPUS_SIZE} 个书签（HTML / Chrome JSON 内容相同）")
+
+        python_out = os.path.join(tmp, 'python.jsonl')
+        go_out = os.path.join(tmp, 'go.jsonl')
+        runs = {}
+        try:
+            runs['Python'] = run_measured(
+                [sys.executable, '-c', 'import sys, benchmark; benchmark.python_bench(*sys.argv[1:])',
+                 html_corpus, python_out], cwd=REPO_DIR
+            )
+            runs['Go'] = run_measured([go_binary, 'bench', json_corpus, go_out], cwd=tmp)
+        except subprocess.CalledProcessError as e:
+            print(f"   ❌ 基准运行失败: {' '.join(e.cmd[:2])}")
+            return False
+
+        print()
+        for name, (summary, elapsed, peak_mb) in runs.items():
+            throughput = summary['total'] / (elapsed / 1000)
+            print(f"   {name}: 总耗时 {elapsed:.0f} ms，{throughput:.0f} 个/秒，峰值内存 {peak_mb:.1f} MB"
+                  f"（解析 {summary['parse_ms']:.0f} ms，去重 {summary['dedup_ms']:.0f} ms，"
+                  f"分类 {summary['classify_ms']:.0f} ms）")
+
+        python_results = load_results(python_out)
+        go_results = load_results(go_out)
+
+    ok = True
+    if python_results.keys() != go_results.keys():
+        ok = False
+        only_python = len(python_results.keys() - go_results.keys())
+        only_go = len(go_results.keys() - python_results.keys())
+        print(f"\n   ❌ 去重结果不一致: 仅 Python {only_python} 个，仅 Go {only_go} 个")
+    else:
+        print(f"\n   ✅ 去重结果一致: {len(python_results)} 个唯一书签")
+
+    # 主分类对比（Go 规则分类不产生子分类）
+    common = python_results.keys() & go_results.keys()
+    confusion: Dict[Tuple[str, str], int] = {}
+    for url in common:
+        python_category, go_category = python_results[url][0], go_results[url][0]
+        if python_category != go_category:
+            pair = (python_category, go_category)
+            confusion[pair] = confusion.get(pair, 0) + 1
+
+    disagreements = sum(confusion.values())
+    agreement = (len(common) - disagreements) * 100 / len(common) if common else 100.0
+    print(f"   主分类一致率: {agreement:.1f}%（{disagreements} 个书签不一致）")
+
+    python_categories = {category for category, _ in python_results.values()}
+    go_categories = {category for category, _ in go_results.values()}
+    if python_categories != go_categories:
+        print(f"   仅 Python 使用的分类: {', '.join(sorted(python_categories - go_categories)) or '无'}")
+        print(f"   仅 Go 使用的分类: {', '.join(sorted(go_categories - python_categories)) or '无'}")
+
+    if confusion:
+        print("   差异最多的分类（Python → Go）:")
+        for (python_category, go_category), count in sorted(confusion.items(), key=lambda x: x[1], reverse=True)[:10]:
+            print(f"     • {python_category} → {go_category}: {count}")
+
+    return ok
+
+
+CHECKS = {
+    'startup': check_startup,
+    'go': check_go,
+}
+
+
+def main(argv=None):
+    names = (argv if argv is not None else sys.argv[1:]) or list(CHECKS)
+    unknown = [name for name in names if name not in CHECKS]
+    if unknown:
+        print(f"❌ 未知的检查项: {', '.join(unknown)}（可选: {', '.join(CHECKS)}）")
+        return 2
+
+    results = [CHECKS[name]() for name in names]
+    print()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
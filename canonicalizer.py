@@ -0,0 +1,125 @@
+"""分类名称归一：合并 AI 在不同批次中生成的同义分类名"""
+import threading
+import unicodedata
+from typing import Dict, List, Tuple, Optional
+from config import CATEGORY_SYNONYMS, DEFAULT_CATEGORY
+
+
+def normalize_category(name: str) -> str:
+    """
+    分类名的归一化键：全半角统一、忽略大小写、去掉空格和标点（保留字符顺序）
+    "AI 工具" / "ai工具" / "AI-工具" 得到相同的键，"技术开发" / "开发技术" 的键不同
+    """
+    name = unicodedata.normalize('NFKC', name).casefold()
+    return ''.join(char for char in name if char.isalnum())
+
+
+class CategoryCanonicalizer:
+    """
+    分类名称归一器
+    - 归一化键相同的名称视为同一分类
+    - CATEGORY_SYNONYMS 中的同义名用并查集合并到标准名称（同义关系可传递）
+    - 不做模糊匹配：字面相近的名称可能意思相反（"Web前端" / "Web后端"），只合并明确配置的同义名
+    - 每组同义名的标准名称：配置了标准名称时用标准名称，否则用第一次出现的名称
+    - 子分类在所属的（已归一的）主分类内归一，与主分类同义的子分类去掉
+
+    结果按原始名称缓存，重复出现的名称只需一次字典查询；并查集带路径压缩，新名称的归一接近 O(1)
+    流水线模式下多个线程会同时调用，内部加锁
+    """
+
+    def __init__(self, synonyms: Dict[str, List[str]] = CATEGORY_SYNONYMS):
+        """
+        :param synonyms: {标准名称: [同义名]}
+        """
+        # 并查集：归一化键 → 父节点
+        self._parent: Dict[str, str] = {}
+        # 根节点 → 配置的标准名称
+        self._preferred: Dict[str, str] = {}
+        # (所属主分类（主分类为 None）, 根节点) → 标准名称
+        self._names: Dict[Tuple[Optional[str], str], str] = {}
+        # (主分类, 子分类) 原始名称 → 归一后的名称
+        self._memo: Dict[tuple, Tuple[str, Optional[str]]] = {}
+        # 出现过的分类（归一后，按第一次出现的顺序）
+        self._categories: Dict[Tuple[str, Optional[str]], None] = {}
+        self._lock = threading.Lock()
+
+        for canonical, variants in synonyms.items():
+            root = normalize_category(canonical)
+            self._preferred[self._find(root)] = canonical
+            for variant in variants:
+                self._union(normalize_category(variant), root)
+
+    def _find(self, key: str) -> str:
+        """查找根节点（新键自成一组），路径减半压缩"""
+        parent = self._parent.setdefault(key, key)
+        while parent != key:
+            grandparent = self._parent[parent]
+            self._parent[key] = grandparent
+            key, parent = parent, grandparent
+        return key
+
+    def _union(self, key: str, target: str):
+        """把 key 所在的组并入 target 所在的组（保留 target 组的标准名称）"""
+        root, target_root = self._find(key), self._find(target)
+        if root == target_root:
+            return
+        self._parent[root] = target_root
+        preferred = self._preferred.pop(root, None)
+        if preferred is not None:
+            self._preferred.setdefault(target_root, preferred)
+
+    def _resolve(self, name: str, scope: Optional[str]) -> Tuple[str, Optional[str]]:
+        """
+        名称在 scope（主分类）内的标准名称
+        返回: (标准名称, 根节点)，名称全是空格或标点时原样返回、根节点为 None
+        """
+        key = normalize_category(name)
+        if not key:
+            return name, None
+
+        root = self._find(key)
+        canonical = self._names.get((scope, root))
+        if canonical is None:
+            canonical = self._names[(scope, root)] = self._preferred.get(root, name.strip())
+        return canonical, root
+
+    def canonicalize(self, main: str, sub: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """
+        归一一个分类
+        返回: (主分类, 子分类)
+        """
+        # AI 返回的名称不一定是字符串（可能是列表等不可哈希的值），先换成默认分类 / 无子分类再查缓存
+        if not isinstance(main, str):
+            main, sub = DEFAULT_CATEGORY, None
+        elif sub is not None and not isinstance(sub, str):
+            sub = None
+
+        raw = (main, sub)
+        result = self._memo.get(raw)
+        if result is not None:
+            return result
+
+        with self._lock:
+            result = self._memo.get(raw)
+            if result is not None:
+                return result
+
+            main, main_root = self._resolve(main, None)
+            if sub is not None:
+                sub, sub_root = self._resolve(sub, main)
+                if not sub.strip() or sub_root == main_root:
+                    sub = None
+
+            result = self._memo[raw] = (main, sub)
+            self._categories.setdefault(result, None)
+            return result
+
+    def add_known(self, categories: List[Tuple[str, Optional[str]]]):
+        """登记已有的分类（如规则分类的结果），之后的同义名称归到这些名称上"""
+        for main, sub in categories:
+            self.canonicalize(main, sub)
+
+    def categories(self) -> List[Tuple[str, Optional[str]]]:
+        """出现过的分类（归一后，按第一次出现的顺序）"""
+        with self._lock:
+            return list(self._categories)
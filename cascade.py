@@ -0,0 +1,85 @@
+"""级联分类器：规则优先，剩余交给 AI"""
+import threading
+from typing import List, Optional
+from parser import Bookmark
+from classifier import BookmarkClassifier
+from config import DEFAULT_CATEGORY, CASCADE_WEAK_MATCHES
+
+
+class CascadeBookmarkClassifier:
+    """
+    级联分类器
+    1. 先用规则分类器处理全部书签
+    2. 只把落入默认分类或弱匹配（见 CASCADE_WEAK_MATCHES）的书签交给 AI
+    3. AI 会被要求优先复用规则已产生的分类名称
+    """
+
+    def __init__(self, ai_classifier, rule_classifier: Optional[BookmarkClassifier] = None,
+                 keep_ai_results: bool = True, verbose: bool = True):
+        """
+        :param keep_ai_results: 保留 AI 层的分类结果（超出内存模式不保留）
+        :param verbose: 每次调用 classify_batch 都显示规则层命中数；流水线和超出内存模式会分很多批调用，
+                        不显示，由调用方在结束时统一显示 tier_counts
+        """
+        self.ai_classifier = ai_classifier
+        self.rule_classifier = rule_classifier or BookmarkClassifier()
+        # 各层处理的书签数量（多次调用 classify_batch 时累计，流水线模式下可能并发调用）
+        self.tier_counts = {'rules': 0, 'ai': 0}
+        # AI 层的分类结果（用于提炼域名规则，不含规则层已分类的书签）
+        self.ai_classified = {}
+        self.keep_ai_results = keep_ai_results
+        self.verbose = verbose
+        self._lock = threading.Lock()
+
+    def classify_batch(self, bookmarks: List[Bookmark]) -> dict:
+        """
+        批量分类书签
+        返回: {(主分类, 子分类): [书签列表]}
+        """
+        classified = {}
+        leftovers = []
+
+        # 第一层：规则分类
+        for bookmark in bookmarks:
+            category, subcategory, match = self.rule_classifier.classify_with_strength(bookmark)
+
+            if category == DEFAULT_CATEGORY or match in CASCADE_WEAK_MATCHES:
+                leftovers.append(bookmark)
+                continue
+
+            key = (category, subcategory)
+            if key not in classified:
+                classified[key] = []
+            classified[key].append(bookmark)
+
+        with self._lock:
+            self.tier_counts['rules'] += len(bookmarks) - len(leftovers)
+            self.tier_counts['ai'] += len(leftovers)
+
+        if self.verbose:
+            print(f"\n📏 规则分类命中: {len(bookmarks) - len(leftovers)} 个，剩余 {len(leftovers)} 个交给 AI")
+
+        # 第二层：AI 分类剩余书签，合并到同一个结果中
+        if leftovers:
+            known_categories = sorted(classified.keys(), key=lambda k: (k[0], k[1] or ''))
+            ai_classified = self.ai_classifier.classify_batch(leftovers, known_categories=known_categories)
+
+            if self.keep_ai_results:
+                with self._lock:
+                    for key, group in ai_classified.items():
+                        self.ai_classified.setdefault(key, []).extend(group)
+
+            for key, group in ai_classified.items():
+                if key not in classified:
+                    classified[key] = []
+                classified[key].extend(group)
+
+        return classified
+
+    def end_progress(self):
+        """结束 AI 层的单行进度"""
+        self.ai_classifier.end_progress()
+
+    def get_category_stats(self, classified: dict) -> dict:
+        """获取分类统计"""
+        return self.rule_classifier.get_category_stats(classified)
@@ -0,0 +1,139 @@
+"""分类断点续跑：按批次记录 AI 分类结果"""
+import os
+import glob
+import json
+import time
+import hashlib
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from parser import Bookmark
+from config import CACHE_DIR, CHECKPOINT_MAX_AGE_DAYS
+
+# 断点文件格式版本，结构变化时递增以使旧断点失效
+_JOURNAL_VERSION = 1
+
+
+def input_fingerprint(bookmarks: List[Bookmark], model: str, batch_size: int,
+                      known_categories: Optional[List[Tuple[str, Optional[str]]]] = None) -> str:
+    """
+    计算一次分类任务的输入指纹
+    书签（URL、标题及顺序）、模型、批量大小或已有分类任一变化，指纹都会不同，
+    保证断点中的批次与本次任务的批次一一对应
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([_JOURNAL_VERSION, model, batch_size, known_categories or []],
+                             ensure_ascii=False).encode('utf-8'))
+    for bm in bookmarks:
+        digest.update(bm.url.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update((bm.title or '').encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+class ClassificationCheckpoint:
+    """
+    分类断点日志（JSONL）
+    - 第一行为任务信息（指纹、模型、批量大小、书签总数）
+    - 之后每完成一个批次追加一行 {"batch": 批次起始序号, "keys": [[主分类, 子分类], ...]}
+    每行写入后立即落盘，进程中途退出时最多丢失正在处理的那个批次
+    """
+
+    def __init__(self, fingerprint: str, directory: str = CACHE_DIR):
+        self.fingerprint = fingerprint
+        self.directory = directory
+        self.journal_file = os.path.join(directory, f"checkpoint-{fingerprint[:16]}.jsonl")
+        self._file = None
+        # load() 读到的最后一条完整记录的结束位置（字节），续写前在此截断
+        self._valid_end = 0
+
+    def load(self) -> Dict[int, List[Tuple[str, Optional[str]]]]:
+        """
+        读取已完成的批次
+        返回: {批次起始序号: [(主分类, 子分类)]}，没有断点或指纹不一致时返回空字典
+        """
+        self._valid_end = 0
+        if not os.path.exists(self.journal_file):
+            return {}
+
+        batches = {}
+        with open(self.journal_file, 'rb') as f:
+            line = f.readline()
+            try:
+                header = json.loads(line)
+            except ValueError:
+                return {}
+            if not line.endswith(b'\n') or header.get('fingerprint') != self.fingerprint:
+                return {}
+            valid_end = len(line)
+
+            for line in f:
+                # 最后一行可能在写入时被中断（没有换行符或不是完整的 JSON），忽略即可
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                batches[record['batch']] = [(main, sub) for main, sub in record['keys']]
+                valid_end += len(line)
+
+        self._valid_end = valid_end
+        return batches
+
+    def open(self, model: str, batch_size: int, total: int, resume: bool = True):
+        """
+        打开断点日志准备追加
+        :param resume: False 时丢弃已有断点，从头开始
+        """
+        os.makedirs(os.path.dirname(self.journal_file) or '.', exist_ok=True)
+        self._prune_stale()
+
+        if resume and self.load():
+            # 去掉被中断的半行，否则新记录会接在它后面，之后的记录都无法读取
+            os.truncate(self.journal_file, self._valid_end)
+            self._file = open(self.journal_file, 'a', encoding='utf-8')
+            return
+
+        self._file = open(self.journal_file, 'w', encoding='utf-8')
+        self._write({
+            'version': _JOURNAL_VERSION,
+            'fingerprint': self.fingerprint,
+            'model': model,
+            'batch_size': batch_size,
+            'total': total,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+        })
+
+    def _prune_stale(self):
+        """删除其他任务超过 CHECKPOINT_MAX_AGE_DAYS 天未更新的断点（输入变化后旧断点不会再被使用）"""
+        cutoff = time.time() - CHECKPOINT_MAX_AGE_DAYS * 86400
+        for path in glob.glob(os.path.join(self.directory, 'checkpoint-*.jsonl')):
+            if os.path.abspath(path) == os.path.abspath(self.journal_file):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def append(self, batch_start: int, keys: List[Tuple[str, Optional[str]]]):
+        """记录一个已完成的批次"""
+        self._write({'batch': batch_start, 'keys': [list(key) for key in keys]})
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write('\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """任务完成后删除断点"""
+        self.close()
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
@@ -1,65 +1,136 @@
 """智能分类器"""
+import time
 from typing import List, Tuple, Optional
 from parser import Bookmark
-from config import CATEGORIES, DEFAULT_CATEGORY
+from config import DEFAULT_CATEGORY
+from rules import CompiledRules, CompiledRule, load_rules
+from rule_stats import RuleStats
 
 
 class BookmarkClassifier:
     """书签智能分类器"""
 
-    def __init__(self):
-        self.categories = CATEGORIES
+    def __init__(self, rules: Optional[CompiledRules] = None, stats: Optional[RuleStats] = None):
+        """
+        :param stats: 传入时记录每条规则的命中、未命中次数和检查耗时（会稍微变慢）
+        """
+        # 编译后的规则（外部规则文件或 config.CATEGORIES）
+        self.rules = rules or load_rules()
+        self.stats = stats
+
+        if stats is not None:
+            self._match_type = self._match_type_instrumented
 
     def classify(self, bookmark: Bookmark) -> Tuple[str, Optional[str]]:
         """
         分类单个书签
         返回: (主分类, 子分类)
         """
+        category, subcategory, _ = self.classify_with_strength(bookmark)
+        return category, subcategory
+
+    def classify_with_strength(self, bookmark: Bookmark) -> Tuple[str, Optional[str], Optional[str]]:
+        """
+        分类单个书签，并返回主分类的匹配方式
+        返回: (主分类, 子分类, 匹配方式)
+        匹配方式为 'domain' / 'keyword' / 'url_pattern'，未匹配时为 None
+        """
+        if self.stats is not None:
+            self.stats.bookmarks += 1
+
         # 准备用于匹配的文本（小写）
         url_lower = bookmark.url.lower()
         title_lower = bookmark.title.lower()
         domain_lower = bookmark.domain.lower() if bookmark.domain else ""
 
+        # 从 AI 分类结果提炼的域名规则优先
+        if self.rules.generated:
+            generated = self.rules.lookup_generated(domain_lower)
+            if generated is not None:
+                return generated[0], generated[1], 'domain'
+
+        rules = self.rules.rules
+
+        # 域名索引命中时，只需检查优先级更高的分类，索引命中的分类必定匹配
+        limit = self.rules.lookup_domain(domain_lower)
+        candidates = rules[:limit] if limit is not None else rules
+
         # 遍历所有分类
-        for category_name, category_info in self.categories.items():
+        for rule in candidates:
             # 检查主分类
-            if self._matches_category(url_lower, title_lower, domain_lower, category_info):
-                # 检查子分类
-                if 'subcategories' in category_info:
-                    for sub_name, sub_info in category_info['subcategories'].items():
-                        if self._matches_category(url_lower, title_lower, domain_lower, sub_info):
-                            return category_name, sub_name
+            match = self._match_type(url_lower, title_lower, domain_lower, rule)
+            if match:
+                return rule.name, self._match_subcategory(url_lower, title_lower, domain_lower, rule), match
 
-                # 只匹配主分类
-                return category_name, None
+        if limit is not None:
+            rule = rules[limit]
+            if self.stats is not None:
+                self.stats.record_index_hit(rule, self._find_match(url_lower, title_lower, domain_lower, rule)[1])
+            return rule.name, self._match_subcategory(url_lower, title_lower, domain_lower, rule), 'domain'
 
         # 未匹配到任何分类
-        return DEFAULT_CATEGORY, None
+        return DEFAULT_CATEGORY, None, None
+
+    def _match_subcategory(self, url: str, title: str, domain: str, rule: CompiledRule) -> Optional[str]:
+        """检查子分类，未匹配时返回 None（只匹配主分类）"""
+        for subrule in rule.subrules:
+            if self._matches_category(url, title, domain, subrule):
+                return subrule.name
+        return None
 
-    def _matches_category(self, url: str, title: str, domain: str, category_info: dict) -> bool:
+    def _matches_category(self, url: str, title: str, domain: str, rule: CompiledRule) -> bool:
         """
         检查是否匹配分类
         """
+        return self._match_type(url, title, domain, rule) is not None
+
+    def _match_type(self, url: str, title: str, domain: str, rule: CompiledRule) -> Optional[str]:
+        """
+        返回匹配方式（'domain' / 'keyword' / 'url_pattern'），未匹配返回 None
+        规则模式在编译时已转为小写
+        """
         # 检查域名匹配
-        if 'domains' in category_info:
-            for cat_domain in category_info['domains']:
-                if cat_domain.lower() in domain:
-                    return True
+        for cat_domain in rule.domains:
+            if cat_domain in domain:
+                return 'domain'
 
         # 检查关键词匹配
-        if 'keywords' in category_info:
-            for keyword in category_info['keywords']:
-                keyword_lower = keyword.lower()
-                if keyword_lower in url or keyword_lower in title or keyword_lower in domain:
-                    return True
+        for keyword in rule.keywords:
+            if keyword in url or keyword in title or keyword in domain:
+                return 'keyword'
 
         # 检查URL模式匹配
-        if 'url_patterns' in category_info:
-            for pattern in category_info['url_patterns']:
-                if pattern.lower() in url:
-                    return True
+        for pattern in rule.url_patterns:
+            if pattern in url:
+                return 'url_pattern'
+
+        return None
+
+    def _match_type_instrumented(self, url: str, title: str, domain: str, rule: CompiledRule) -> Optional[str]:
+        """同 _match_type，并记录命中情况和耗时"""
+        start = time.perf_counter_ns()
+        match, pattern = self._find_match(url, title, domain, rule)
+        self.stats.record(rule, match, pattern, time.perf_counter_ns() - start)
+        return match
+
+    def _find_match(self, url: str, title: str, domain: str, rule: CompiledRule) -> Tuple[Optional[str], Optional[str]]:
+        """
+        同 _match_type，并返回命中的模式（统计用，热路径仍使用 _match_type）
+        返回: (匹配方式, 命中的模式)，未匹配返回 (None, None)
+        """
+        for cat_domain in rule.domains:
+            if cat_domain in domain:
+                return 'domain', cat_domain
+
+        for keyword in rule.keywords:
+            if keyword in url or keyword in title or keyword in domain:
+                return 'keyword', keyword
+
+        for pattern in rule.url_patterns:
+            if pattern in url:
+                return 'url_pattern', pattern
 
-        return False
+        return None, None
 
     def classify_batch(self, bookmarks: List[Bookmark]) -> dict:
         """
@@ -1,3 +1,5 @@
+import os
+
 # 分类配置
 CATEGORIES = {
     "技术学习": {
@@ -198,3 +200,105 @@ DEFAULT_CATEGORY = "其他"
 
 # 最小分类阈值（书签数量少于此值的子分类会被合并到父分类）
 MIN_CATEGORY_SIZE = 3
+
+# 分类名称同义词（AI 分类时归一到标准名称）：{标准名称: [同义名]}
+# 标准名称与 AI 系统提示词推荐的主分类一致（见 ai_classifier.py）；大小写、全半角、空格或标点不同的名称会自动合并，不需要列出
+# 不做模糊匹配（字面相近的名称可能意思相反，如"前端" / "后端"），需要合并的名称都要在这里列出
+# 同义名不要与 CATEGORIES 中的子分类重名（否则该子分类会被当作与主分类同义而去掉）
+CATEGORY_SYNONYMS = {
+    "技术开发": ["开发技术", "编程开发", "软件开发", "程序开发", "编程技术"],
+    "金融投资": ["金融理财", "理财投资", "投资金融", "金融"],
+    "视频娱乐": ["影音娱乐", "视频影音", "视频"],
+    "新闻资讯": ["新闻媒体", "资讯新闻", "新闻", "资讯"],
+    "社交平台": ["社交网络", "社交媒体", "社交"],
+    "工具软件": ["软件工具", "实用工具"],
+    "云服务器": ["云服务", "云计算", "服务器"],
+    "AI": ["人工智能"],
+}
+
+# 按时间归档（--archive-months）：添加时间早于 N 个月前的书签按年份移入该文件夹，书签栏只保留近期书签
+ARCHIVE_FOLDER_NAME = "归档"
+
+# 本地模型文件（由 AI 分类结果训练得到）
+LOCAL_MODEL_FILE = "tabsort_model.npz"
+
+# 本地模型最低置信度（余弦相似度低于此值的书签归入默认分类）
+LOCAL_MIN_CONFIDENCE = 0.2
+
+# 本地模型最多保留的特征数（按文档频率取前 N 个），质心矩阵大小为 特征数 × 分类数
+LOCAL_MAX_FEATURES = 50000
+
+# 级联分类：规则以这些方式匹配的书签视为弱匹配，仍交给 AI 处理
+# 可选值：'domain' / 'keyword' / 'url_pattern'
+CASCADE_WEAK_MATCHES = ("url_pattern",)
+
+# 外部规则文件（JSON 或 TOML，结构与 CATEGORIES 相同），未设置时使用 CATEGORIES
+RULES_FILE = os.getenv('TABSORT_RULES_FILE')
+
+# 从 AI 分类结果提炼的域名规则（结构与 CATEGORIES 相同，每次 AI 分类后自动更新），优先于手写规则按域名精确匹配
+GENERATED_RULES_FILE = "generated_rules.json"
+
+# 提炼规则：域名至少有这么多个书签、且多数分类的占比不低于该值时才生成规则
+DISTILL_MIN_VOTES = 2
+DISTILL_MIN_CONFIDENCE = 0.8
+
+# 缓存目录（编译后的规则、AI 分类断点等）
+CACHE_DIR = ".tabsort_cache"
+
+# 超过这么多天未使用的规则编译缓存（规则文件修改前的旧版本）在重新编译规则时删除
+RULES_CACHE_MAX_AGE_DAYS = 30
+
+# 超过这么多天未更新的 AI 分类断点视为废弃（输入已变化，不会再被续跑），开始新的分类时删除
+CHECKPOINT_MAX_AGE_DAYS = 7
+
+# 全文检索索引文件（每次整理时增量更新，用 `python main.py search` 查询）
+SEARCH_INDEX_FILE = "tabsort_index.db"
+
+# 已整理书签索引目录（--seen-index，记录整理过的 URL 哈希及其分类）
+SEEN_INDEX_DIR = "tabsort_seen"
+
+# 多文件合并：内存中最多保留的书签数，超过后按 URL 哈希分片溢写到临时文件
+MERGE_MAX_IN_MEMORY = 200000
+MERGE_PARTITIONS = 16
+
+# 流水线模式（--pipeline）：每批书签数、阶段之间的队列容量（批）、AI 分类的并发请求数
+PIPELINE_BATCH_SIZE = 500
+PIPELINE_QUEUE_SIZE = 4
+PIPELINE_AI_WORKERS = 4
+
+# 超出内存模式（--out-of-core）：每批分类的书签数、合并和排序时内存中保留的最大记录数（超过时溢写到磁盘）
+SPILL_BATCH_SIZE = 1000
+SPILL_SORT_RUN_SIZE = 50000
+
+# AI 请求失败（网络错误、限流、服务端错误）时的最大重试次数
+AI_MAX_RETRIES = 2
+
+# 需要用 cache_control 显式标记提示词缓存的模型（前缀匹配）；其他模型由服务端自动缓存相同的前缀
+AI_PROMPT_CACHE_MODELS = ("anthropic/", "google/gemini")
+
+# AI 指标保留明细的最近请求数（用于耗时分位数和 JSON 报告；计数和 token 用量始终累计全部请求）
+AI_METRICS_WINDOW = 10000
+
+# 模型价格（美元 / 百万 token，(输入, 输出, 命中缓存的输入)），用于估算 AI 分类费用，以 OpenRouter 实际价格为准
+MODEL_PRICING = {
+    "anthropic/claude-3.5-sonnet": (3.0, 15.0, 0.3),
+    "anthropic/claude-3-haiku": (0.25, 1.25, 0.03),
+    "openai/gpt-4o": (2.5, 10.0, 1.25),
+    "openai/gpt-4o-mini": (0.15, 0.6, 0.075),
+    "google/gemini-flash-1.5": (0.075, 0.3, 0.01875),
+    "deepseek/deepseek-chat": (0.14, 0.28, 0.014),
+}
+
+# 常驻服务（main.py serve）默认监听端口
+DAEMON_PORT = 8765
+
+# 常驻服务合并 AI 请求：第一个书签到达后最多等待的时间（秒）和每批最多书签数
+DAEMON_BATCH_WINDOW = 0.05
+DAEMON_MAX_BATCH = 100
+
+# 常驻服务在内存中缓存的 AI 分类结果数（按 URL，超出时淘汰最久未使用的）
+DAEMON_CACHE_SIZE = 100000
+
+# HTML 生成：书签数达到该值时按主分类用多个进程并行生成，以及默认进程数
+GENERATOR_PARALLEL_MIN = 100000
+GENERATOR_WORKERS = min(4, os.cpu_count() or 1)
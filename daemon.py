@@ -0,0 +1,327 @@
+"""常驻分类服务：规则、AI 客户端和 AI 结果缓存常驻内存，通过本地 HTTP 接口分类书签"""
+import os
+import json
+import time
+import queue
+import threading
+import socketserver
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple, Optional, Dict
+from parser import Bookmark
+from classifier import BookmarkClassifier
+from metrics import percentile
+from config import DEFAULT_CATEGORY, LOCAL_MODEL_FILE, CASCADE_WEAK_MATCHES, DAEMON_BATCH_WINDOW, DAEMON_MAX_BATCH, DAEMON_CACHE_SIZE
+
+# 请求耗时统计保留的最近请求数
+_LATENCY_WINDOW = 10000
+
+
+class AIMicroBatcher:
+    """
+    把并发到达的单个分类请求合并成小批次发给 AI
+    第一个书签到达后最多等待 window 秒（或凑满 max_batch 个）再发出请求，
+    同一批次内相同 URL 只请求一次
+    """
+
+    def __init__(self, ai_classifier, window: float = DAEMON_BATCH_WINDOW, max_batch: int = DAEMON_MAX_BATCH,
+                 known_categories=None):
+        """
+        :param known_categories: 返回已有分类 [(主分类, 子分类)] 的函数，提示 AI 优先复用
+        """
+        self.ai_classifier = ai_classifier
+        self.window = window
+        self.max_batch = max_batch
+        self.known_categories = known_categories
+        self.batches = 0
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, bookmark: Bookmark) -> Future:
+        """提交一个书签，返回结果为 (主分类, 子分类) 的 Future"""
+        future = Future()
+        self._queue.put((bookmark, future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(pending) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._classify(pending)
+
+    def _classify(self, pending: List[Tuple[Bookmark, Future]]):
+        by_url: Dict[str, List[Future]] = {}
+        batch = []
+        for bookmark, future in pending:
+            futures = by_url.get(bookmark.url)
+            if futures is None:
+                by_url[bookmark.url] = futures = []
+                batch.append(bookmark)
+            futures.append(future)
+
+        try:
+            known = self.known_categories() if self.known_categories else None
+            keys = self.ai_classifier.classify_chunk(batch, 0, known)
+        except BaseException as e:
+            for futures in by_url.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        for bookmark, key in zip(batch, keys):
+            for future in by_url[bookmark.url]:
+                future.set_result(key)
+
+
+class ClassificationService:
+    """
+    常驻分类服务
+    - rules: 编译后的规则常驻内存，直接分类
+    - local: 本地模型常驻内存
+    - ai / cascade: AI 结果按 URL 缓存（LRU）；未命中缓存的书签经 AIMicroBatcher 合并请求，
+      cascade 模式只有规则未命中或弱匹配的书签才请求 AI
+    """
+
+    def __init__(self, classification_mode: str = 'rules', rule_classifier: Optional[BookmarkClassifier] = None,
+                 ai_classifier=None, cache_size: int = DAEMON_CACHE_SIZE,
+                 batch_window: float = DAEMON_BATCH_WINDOW, max_batch: int = DAEMON_MAX_BATCH):
+        self.mode = classification_mode
+        self.rule_classifier = rule_classifier or BookmarkClassifier()
+        self.ai_classifier = ai_classifier
+        self.local_classifier = None
+        self.cache_size = cache_size
+        self.started_at = time.time()
+
+        # {URL: (主分类, 子分类)}，按最近使用排序
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 各来源的分类次数和最近请求的耗时（秒）
+        self.sources = {'rules': 0, 'local': 0, 'cache': 0, 'ai': 0}
+        self._latencies = deque(maxlen=_LATENCY_WINDOW)
+
+        if classification_mode == 'local':
+            from local_classifier import LocalBookmarkClassifier
+            if not LocalBookmarkClassifier.exists():
+                raise ValueError(f"未找到本地模型 {LOCAL_MODEL_FILE}，请先用 AI 或级联模式分类一次（会自动训练本地模型）")
+            self.local_classifier = LocalBookmarkClassifier().load()
+
+        self.batcher = None
+        if classification_mode in ('ai', 'cascade'):
+            if ai_classifier is None:
+                raise ValueError(f"分类模式 {classification_mode} 需要 AI 分类器")
+            self.batcher = AIMicroBatcher(ai_classifier, window=batch_window, max_batch=max_batch,
+                                          known_categories=self._known_categories)
+
+    def _known_categories(self) -> List[Tuple[str, Optional[str]]]:
+        """已缓存结果中出现过的分类，提示 AI 优先复用"""
+        with self._lock:
+            keys = set(self._cache.values())
+        return sorted(keys, key=lambda k: (k[0], k[1] or ''))
+
+    def _cache_get(self, url: str) -> Optional[Tuple[str, Optional[str]]]:
+        with self._lock:
+            key = self._cache.get(url)
+            if key is not None:
+                self._cache.move_to_end(url)
+            return key
+
+    def _cache_put(self, url: str, key: Tuple[str, Optional[str]]):
+        with self._lock:
+            self._cache[url] = key
+            self._cache.move_to_end(url)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _count(self, source: str, count: int = 1):
+        with self._lock:
+            self.sources[source] += count
+
+    def classify(self, bookmarks: List[Bookmark]) -> List[dict]:
+        """
+        分类一组书签（单个请求的书签一起提交，并发请求的书签在 AI 批次中合并）
+        返回: 与 bookmarks 一一对应的 [{"url", "main", "sub", "source"}]
+        """
+        start = time.perf_counter()
+        results: List[Optional[dict]] = [None] * len(bookmarks)
+        waiting: List[Tuple[int, Future]] = []
+
+        for i, bookmark in enumerate(bookmarks):
+            if self.mode == 'local':
+                key, source = self.local_classifier.classify(bookmark), 'local'
+            elif self.mode == 'ai':
+                key, source = self._cache_get(bookmark.url), 'cache'
+            else:
+                category, subcategory, match = self.rule_classifier.classify_with_strength(bookmark)
+                key, source = (category, subcategory), 'rules'
+                if self.mode == 'cascade' and (category == DEFAULT_CATEGORY or match in CASCADE_WEAK_MATCHES):
+                    key, source = self._cache_get(bookmark.url), 'cache'
+
+            if key is None:
+                waiting.append((i, self.batcher.submit(bookmark)))
+                continue
+
+            self._count(source)
+            results[i] = {'url': bookmark.url, 'main': key[0], 'sub': key[1], 'source': source}
+
+        for i, future in waiting:
+            key = future.result()
+            # 分类失败（降级为默认分类或 AI 遗漏）的结果不缓存，下次请求重试
+            if key[0] not in (DEFAULT_CATEGORY, '未分类'):
+                self._cache_put(bookmarks[i].url, key)
+            self._count('ai')
+            results[i] = {'url': bookmarks[i].url, 'main': key[0], 'sub': key[1], 'source': 'ai'}
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._latencies.append(elapsed)
+        return results
+
+    def status(self) -> dict:
+        """服务状态：各来源的分类次数、最近请求的耗时分位数、缓存和 AI 请求指标"""
+        with self._lock:
+            latencies = list(self._latencies)
+            sources = dict(self.sources)
+            cached = len(self._cache)
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 3) if value is not None else None
+
+        status = {
+            'status': 'ok',
+            'mode': self.mode,
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'sources': sources,
+            'cache_size': cached,
+            'latency_ms': {
+                'p50': ms(percentile(latencies, 0.5)),
+                'p99': ms(percentile(latencies, 0.99)),
+                'max': ms(max(latencies) if latencies else None),
+            },
+        }
+        if self.batcher is not None:
+            totals = self.ai_classifier.metrics.totals()
+            status['ai'] = {
+                'batches': self.batcher.batches,
+                'requests': totals['requests'],
+                'prompt_tokens': totals['prompt_tokens'],
+                'cached_tokens': totals['cached_tokens'],
+                'completion_tokens': totals['completion_tokens'],
+                'cost_usd': totals['cost_usd'],
+            }
+        return status
+
+
+def _parse_bookmark(data) -> Bookmark:
+    """请求中的书签 {"url", "title"}"""
+    if not isinstance(data, dict) or not isinstance(data.get('url'), str) or not data['url']:
+        raise ValueError("书签必须包含 url")
+    title = data.get('title') or ''
+    if not isinstance(title, str):
+        raise ValueError("title 必须是字符串")
+    return Bookmark(url=data['url'], title=title)
+
+
+class ClassificationHandler(BaseHTTPRequestHandler):
+    """
+    接口（JSON）：
+    - GET  /health          服务状态
+    - POST /classify        {"url", "title"} → {"url", "main", "sub", "source"}
+    - POST /classify/batch  {"bookmarks": [{"url", "title"}, ...]} → {"results": [...]}
+    """
+
+    # 保持连接，浏览器扩展连续保存书签时不必每次重新建立连接
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    service: ClassificationService = None
+
+    def log_message(self, format, *args):
+        # 不逐个请求打印日志（Unix socket 没有客户端地址）
+        pass
+
+    def _send_json(self, status: int, data: dict):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, self.service.status())
+        else:
+            self._send_json(404, {'error': f"未知的路径: {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self._send_json(400, {'error': "Content-Length 无效"})
+            self.close_connection = True
+            return
+        body = self.rfile.read(length)
+
+        try:
+            data = json.loads(body or b'null')
+            if self.path == '/classify':
+                bookmarks = [_parse_bookmark(data)]
+            elif self.path == '/classify/batch':
+                if not isinstance(data, dict) or not isinstance(data.get('bookmarks'), list):
+                    raise ValueError("请求必须包含 bookmarks 列表")
+                bookmarks = [_parse_bookmark(item) for item in data['bookmarks']]
+            else:
+                self._send_json(404, {'error': f"未知的路径: {self.path}"})
+                return
+        except ValueError as e:
+            # json.JSONDecodeError 是 ValueError 的子类
+            self._send_json(400, {'error': str(e)})
+            return
+
+        try:
+            results = self.service.classify(bookmarks)
+        except Exception as e:
+            self._send_json(502, {'error': f"分类失败: {e}"})
+            return
+
+        self._send_json(200, results[0] if self.path == '/classify' else {'results': results})
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """监听 Unix socket 的多线程 HTTP 服务"""
+    daemon_threads = True
+
+
+def create_server(service: ClassificationService, host: str = '127.0.0.1', port: int = 0,
+                  socket_path: Optional[str] = None):
+    """
+    创建 HTTP 服务（指定 socket_path 时监听 Unix socket，否则监听 host:port）
+    调用方负责 serve_forever() 和 server_close()
+    """
+    # Unix socket 不支持 TCP_NODELAY
+    handler = type('BoundClassificationHandler', (ClassificationHandler,),
+                   {'service': service, 'disable_nagle_algorithm': not socket_path})
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
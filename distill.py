@@ -0,0 +1,93 @@
+"""从 AI 分类结果提炼域名规则"""
+import os
+import json
+from typing import Dict, Tuple, Optional
+from config import DEFAULT_CATEGORY, GENERATED_RULES_FILE, DISTILL_MIN_VOTES, DISTILL_MIN_CONFIDENCE
+
+# AI 未能分类时使用的分类，不参与提炼
+_UNCLASSIFIED = (DEFAULT_CATEGORY, '未分类')
+
+
+def distill_domains(classified: dict, min_votes: int = DISTILL_MIN_VOTES,
+                    min_confidence: float = DISTILL_MIN_CONFIDENCE) -> Dict[str, Tuple[str, Optional[str]]]:
+    """
+    按域名汇总分类结果，多数投票决定域名的分类
+    书签数不少于 min_votes、且得票最多的 (主分类, 子分类) 占比不低于 min_confidence 的域名才会保留
+    :param classified: {(主分类, 子分类): [书签列表]}
+    返回: {域名: (主分类, 子分类)}
+    """
+    votes: Dict[str, Dict[Tuple[str, Optional[str]], int]] = {}
+    for key, bookmarks in classified.items():
+        if key[0] in _UNCLASSIFIED:
+            continue
+        for bookmark in bookmarks:
+            if not bookmark.domain:
+                continue
+            domain_votes = votes.setdefault(bookmark.domain.lower(), {})
+            domain_votes[key] = domain_votes.get(key, 0) + 1
+
+    decisions = {}
+    for domain, domain_votes in votes.items():
+        total = sum(domain_votes.values())
+        if total < min_votes:
+            continue
+        # 票数相同时按名称取，保证结果与遍历顺序无关
+        key, count = max(domain_votes.items(), key=lambda item: (item[1], item[0][0], item[0][1] or ''))
+        if count / total >= min_confidence:
+            decisions[domain] = key
+    return decisions
+
+
+def categories_to_domains(categories: dict) -> Dict[str, Tuple[str, Optional[str]]]:
+    """将 CATEGORIES 结构的规则展开为 {域名: (主分类, 子分类)}（只取 domains）"""
+    domains = {}
+    for name, info in categories.items():
+        for domain in info.get('domains', []):
+            domains[domain.lower()] = (name, None)
+        for sub_name, sub_info in info.get('subcategories', {}).items():
+            for domain in sub_info.get('domains', []):
+                domains[domain.lower()] = (name, sub_name)
+    return domains
+
+
+def domains_to_categories(domains: Dict[str, Tuple[str, Optional[str]]]) -> dict:
+    """
+    将 {域名: (主分类, 子分类)} 转为 CATEGORIES 结构（分类和域名均排序，输出稳定便于 diff）
+    子分类的域名同时列在主分类中，保证只按主分类匹配时也能命中
+    """
+    categories: Dict[str, dict] = {}
+    for domain, (name, sub_name) in sorted(domains.items(), key=lambda item: (item[1][0], item[1][1] or '', item[0])):
+        info = categories.setdefault(name, {'domains': []})
+        info['domains'].append(domain)
+        if sub_name:
+            info.setdefault('subcategories', {}).setdefault(sub_name, {'domains': []})['domains'].append(domain)
+
+    return {name: categories[name] for name in sorted(categories)}
+
+
+def update_generated_rules(classified: dict, path: str = GENERATED_RULES_FILE,
+                           min_votes: int = DISTILL_MIN_VOTES,
+                           min_confidence: float = DISTILL_MIN_CONFIDENCE) -> Dict[str, int]:
+    """
+    提炼本次分类结果并合并到生成的规则文件：本次有明确结论的域名覆盖旧结论，其余保留
+    返回: {'added': 新增域名数, 'updated': 分类变化的域名数, 'total': 文件中的域名总数}
+    """
+    decisions = distill_domains(classified, min_votes, min_confidence)
+
+    existing = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            existing = categories_to_domains(json.load(f))
+
+    added = sum(1 for domain in decisions if domain not in existing)
+    updated = sum(1 for domain, key in decisions.items() if domain in existing and existing[domain] != key)
+
+    merged = {**existing, **decisions}
+    if added or updated:
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(domains_to_categories(merged), f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        os.replace(tmp_file, path)
+
+    return {'added': added, 'updated': updated, 'total': len(merged)}
@@ -0,0 +1,143 @@
+"""SQLite 导出器"""
+import sqlite3
+from datetime import datetime
+from typing import List, Optional, Tuple
+from parser import Bookmark, canonicalize_url
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    input_file TEXT,
+    output_file TEXT,
+    mode TEXT,
+    total INTEGER,
+    unique_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS domains (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    main TEXT NOT NULL,
+    sub TEXT NOT NULL DEFAULT '',
+    UNIQUE (main, sub)
+);
+CREATE TABLE IF NOT EXISTS bookmarks (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    url TEXT NOT NULL,
+    canonical_url TEXT NOT NULL,
+    title TEXT,
+    add_date INTEGER,
+    domain_id INTEGER REFERENCES domains(id),
+    category_id INTEGER NOT NULL REFERENCES categories(id)
+);
+CREATE TABLE IF NOT EXISTS duplicate_groups (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    base_url TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT
+);
+"""
+
+# 数据加载完成后再创建的索引
+INDEXES = {
+    'idx_bookmarks_run': 'bookmarks(run_id)',
+    'idx_bookmarks_canonical_url': 'bookmarks(canonical_url)',
+    'idx_bookmarks_domain': 'bookmarks(domain_id)',
+    'idx_bookmarks_category': 'bookmarks(category_id)',
+    'idx_duplicate_groups_run': 'duplicate_groups(run_id, base_url)',
+}
+
+
+class SQLiteExporter:
+    """
+    将分类结果批量写入 SQLite，便于跨用户、跨运行查询
+    每次导出在一个事务内完成，多次运行追加到同一数据库
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+
+    def _connect(self) -> sqlite3.Connection:
+        # 手动管理事务，保证建表之外的所有写入（包括删建索引）在同一个事务中
+        conn = sqlite3.connect(self.db_file, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA cache_size=-65536')  # 64MB
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _upsert_names(self, conn: sqlite3.Connection, sql_insert: str, sql_select: str, values) -> dict:
+        """批量插入去重后的名称，返回 {名称: id}"""
+        conn.executemany(sql_insert, values)
+        return {tuple(row[1:]) if len(row) > 2 else row[1]: row[0] for row in conn.execute(sql_select)}
+
+    def export(self, classified: dict,
+               duplicate_groups: Optional[List[Tuple[str, List[Bookmark]]]] = None,
+               input_file: Optional[str] = None, output_file: Optional[str] = None,
+               mode: Optional[str] = None, total: Optional[int] = None) -> int:
+        """
+        导出一次运行的结果
+        :param classified: {(主分类, 子分类): [书签列表]}
+        :param duplicate_groups: [(基础URL, [书签列表])]，即 find_hash_only_duplicates() 的结果
+        返回: 本次运行的 run_id
+        """
+        bookmark_count = sum(len(group) for group in classified.values())
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('BEGIN')
+                existing = conn.execute('SELECT COUNT(*) FROM bookmarks').fetchone()[0]
+
+                # 追加的数据量超过已有数据时，先删索引、加载后重建更快
+                if bookmark_count > existing:
+                    for name in INDEXES:
+                        conn.execute(f'DROP INDEX IF EXISTS {name}')
+
+                cursor = conn.execute(
+                    'INSERT INTO runs (created_at, input_file, output_file, mode, total, unique_count) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (datetime.now().isoformat(timespec='seconds'), input_file, output_file,
+                     mode, total if total is not None else bookmark_count, bookmark_count)
+                )
+                run_id = cursor.lastrowid
+
+                domain_ids = self._upsert_names(
+                    conn,
+                    'INSERT OR IGNORE INTO domains (name) VALUES (?)',
+                    'SELECT id, name FROM domains',
+                    ((domain,) for domain in {bm.domain for group in classified.values()
+                                              for bm in group if bm.domain})
+                )
+                category_ids = self._upsert_names(
+                    conn,
+                    'INSERT OR IGNORE INTO categories (main, sub) VALUES (?, ?)',
+                    'SELECT id, main, sub FROM categories',
+                    ((main, sub or '') for main, sub in classified)
+                )
+
+                conn.executemany(
+                    'INSERT INTO bookmarks (run_id, url, canonical_url, title, add_date, domain_id, category_id) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    ((run_id, bm.url, canonicalize_url(bm.url), bm.title, bm.added_at,
+                      domain_ids.get(bm.domain), category_ids[(main, sub or '')])
+                     for (main, sub), group in classified.items() for bm in group)
+                )
+
+                if duplicate_groups:
+                    conn.executemany(
+                        'INSERT INTO duplicate_groups (run_id, base_url, url, title) VALUES (?, ?, ?, ?)',
+                        ((run_id, base_url, bm.url, bm.title)
+                         for base_url, group in duplicate_groups for bm in group)
+                    )
+
+                for name, target in INDEXES.items():
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+
+            return run_id
+        finally:
+            conn.close()
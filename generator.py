@@ -1,21 +1,162 @@
 """HTML生成器"""
-from typing import TextIO
-from organizer import Folder
+import io
+import os
+import re
 import time
 import html
+from typing import TextIO, Iterable, Iterator, List, Optional, Tuple
+from organizer import Folder
+from parser import Bookmark
+from config import GENERATOR_WORKERS, GENERATOR_PARALLEL_MIN
+
+# 文件名中不允许的字符（按分类拆分输出时替换为下划线）
+_UNSAFE_FILENAME_RE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+# fork 方式启动的工作进程直接继承待生成的文件夹树，不需要序列化传递
+_shard_root: Optional[Folder] = None
+
+
+def _render_folder(folder: Folder, timestamp: str) -> str:
+    """在工作进程中把一个主分类文件夹生成为 HTML 片段"""
+    buffer = io.StringIO()
+    BookmarkHTMLGenerator(timestamp=timestamp)._write_folder(buffer, folder, 2)
+    return buffer.getvalue()
+
+
+def _render_shard(index: int, timestamp: str) -> str:
+    """fork 方式：按序号取继承来的主分类文件夹"""
+    return _render_folder(_shard_root.subfolders[index], timestamp)
 
 
 class BookmarkHTMLGenerator:
     """Chrome书签HTML生成器"""
 
-    def __init__(self, root_folder: Folder):
+    def __init__(self, root_folder: Optional[Folder] = None, timestamp: Optional[str] = None):
+        """
+        :param root_folder: 组织好的根文件夹（只使用 generate_stream 时可以不传）
+        :param timestamp: 文件夹和缺少添加时间的书签使用的时间戳（默认取生成开始的时间）
+        """
         self.root = root_folder
+        self.timestamp = timestamp
+
+    def _start(self):
+        """同一次生成的所有时间戳相同，并行生成与串行生成的结果逐字节一致"""
+        if self.timestamp is None:
+            self.timestamp = str(int(time.time()))
 
-    def generate(self, output_file: str):
-        """生成HTML文件"""
+    def generate(self, output_file: str, workers: Optional[int] = None):
+        """
+        生成HTML文件
+        :param workers: 并行生成的进程数，默认书签数达到 GENERATOR_PARALLEL_MIN 时使用 GENERATOR_WORKERS 个进程
+        """
+        self._start()
+        workers = self._workers(workers)
+
+        with open(output_file, 'w', encoding='utf-8') as f:
+            self._write_header(f)
+            self._write_folder_open(f, self.root.name, 1, is_root=True)
+            if workers > 1:
+                for section in self._render_categories(workers):
+                    f.write(section)
+            else:
+                for folder in self.root.subfolders:
+                    self._write_folder(f, folder, 2)
+            for bookmark in self.root.bookmarks:
+                self._write_bookmark(f, bookmark, 2)
+            self._write_folder_close(f, 1)
+            self._write_footer(f)
+
+    def generate_split(self, output_dir: str, workers: Optional[int] = None) -> List[str]:
+        """
+        每个主分类生成一个独立的HTML文件（结构与完整文件相同，只包含该分类），可以只导入部分分类
+        根目录下的直属书签（如果有）单独写入一个文件
+        返回: 生成的文件路径（按分类顺序）
+        """
+        self._start()
+        workers = self._workers(workers)
+        os.makedirs(output_dir, exist_ok=True)
+
+        sections = self._render_categories(workers) if workers > 1 else [None] * len(self.root.subfolders)
+        parts = list(zip(self.root.subfolders, sections))
+        if self.root.bookmarks:
+            parts.append((self.root, None))
+
+        files = []
+        for index, (folder, section) in enumerate(parts, 1):
+            path = os.path.join(output_dir, f"{index:02d}-{_UNSAFE_FILENAME_RE.sub('_', folder.name)}.html")
+            with open(path, 'w', encoding='utf-8') as f:
+                self._write_header(f)
+                self._write_folder_open(f, self.root.name, 1, is_root=True)
+                if section is not None:
+                    f.write(section)
+                elif folder is self.root:
+                    for bookmark in folder.bookmarks:
+                        self._write_bookmark(f, bookmark, 2)
+                else:
+                    self._write_folder(f, folder, 2)
+                self._write_folder_close(f, 1)
+                self._write_footer(f)
+            files.append(path)
+        return files
+
+    def _workers(self, workers: Optional[int]) -> int:
+        """实际使用的进程数（不超过主分类数）"""
+        if workers is None:
+            workers = GENERATOR_WORKERS if self.root.get_total_count() >= GENERATOR_PARALLEL_MIN else 1
+        return max(1, min(workers, len(self.root.subfolders)))
+
+    def _render_categories(self, workers: int) -> List[str]:
+        """
+        用进程池把每个主分类并行生成为 HTML 片段，返回顺序与 root.subfolders 相同
+        （转义和拼接字符串受 GIL 限制，线程无法加速）
+        """
+        # multiprocessing 导入较慢，只在并行生成时加载
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        folders = self.root.subfolders
+        timestamps = [self.timestamp] * len(folders)
+
+        global _shard_root
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # 工作进程通过 fork 继承文件夹树，只传回生成的字符串
+            _shard_root = self.root
+            try:
+                with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                    return list(pool.map(_render_shard, range(len(folders)), timestamps))
+            finally:
+                _shard_root = None
+
+        with ProcessPoolExecutor(workers) as pool:
+            return list(pool.map(_render_folder, folders, timestamps))
+
+    def generate_stream(self, output_file: str, root_name: str,
+                        categories: Iterable[Tuple[str, Iterator[Tuple[Optional[str], Iterator[Bookmark]]]]]):
+        """
+        流式生成HTML文件，不需要在内存中构建 Folder 树
+        :param categories: 按输出顺序产出 (主分类, 分组迭代器)；
+                           分组迭代器按输出顺序产出 (子分类, 书签迭代器)，子分类为 None 表示主分类下直属的书签
+        """
+        self._start()
         with open(output_file, 'w', encoding='utf-8') as f:
             self._write_header(f)
-            self._write_folder(f, self.root, is_root=True)
+            self._write_folder_open(f, root_name, 1, is_root=True)
+
+            for category, sections in categories:
+                self._write_folder_open(f, category, 2)
+                for subcategory, bookmarks in sections:
+                    if subcategory is None:
+                        for bookmark in bookmarks:
+                            self._write_bookmark(f, bookmark, 3)
+                        continue
+
+                    self._write_folder_open(f, subcategory, 3)
+                    for bookmark in bookmarks:
+                        self._write_bookmark(f, bookmark, 4)
+                    self._write_folder_close(f, 3)
+                self._write_folder_close(f, 2)
+
+            self._write_folder_close(f, 1)
             self._write_footer(f)
 
     def _write_header(self, f: TextIO):
@@ -37,29 +178,37 @@ class BookmarkHTMLGenerator:
         """
         写入文件夹及其内容
         """
+        self._write_folder_open(f, folder.name, indent, is_root)
+
+        # 写入子文件夹
+        for subfolder in folder.subfolders:
+            self._write_folder(f, subfolder, indent + 1)
+
+        # 写入书签
+        for bookmark in folder.bookmarks:
+            self._write_bookmark(f, bookmark, indent + 1)
+
+        self._write_folder_close(f, indent)
+
+    def _write_folder_open(self, f: TextIO, name: str, indent: int, is_root: bool = False):
+        """写入文件夹标题和列表开始标签"""
         spaces = '    ' * indent
-        timestamp = str(int(time.time()))
+        timestamp = self.timestamp
 
         if is_root:
             # 根目录（书签栏）
             f.write(f'{spaces}<DT><H3 ADD_DATE="{timestamp}" LAST_MODIFIED="{timestamp}" '
-                    f'PERSONAL_TOOLBAR_FOLDER="true">{html.escape(folder.name)}</H3>\n')
+                    f'PERSONAL_TOOLBAR_FOLDER="true">{html.escape(name)}</H3>\n')
         else:
             # 普通文件夹
             f.write(f'{spaces}<DT><H3 ADD_DATE="{timestamp}" LAST_MODIFIED="{timestamp}">'
-                    f'{html.escape(folder.name)}</H3>\n')
+                    f'{html.escape(name)}</H3>\n')
 
         f.write(f'{spaces}<DL><p>\n')
 
-        # 写入子文件夹
-        for subfolder in folder.subfolders:
-            self._write_folder(f, subfolder, indent + 1)
-
-        # 写入书签
-        for bookmark in folder.bookmarks:
-            self._write_bookmark(f, bookmark, indent + 1)
-
-        f.write(f'{spaces}</DL><p>\n')
+    def _write_folder_close(self, f: TextIO, indent: int):
+        """写入文件夹列表结束标签"""
+        f.write(f'{"    " * indent}</DL><p>\n')
 
     def _write_bookmark(self, f: TextIO, bookmark, indent: int):
         """写入单个书签"""
@@ -68,10 +217,10 @@ class BookmarkHTMLGenerator:
         # 构建书签标签
         attrs = [f'HREF="{html.escape(bookmark.url)}"']
 
-        if bookmark.add_date:
-            attrs.append(f'ADD_DATE="{bookmark.add_date}"')
+        if bookmark.added_at is not None:
+            attrs.append(f'ADD_DATE="{bookmark.added_at}"')
         else:
-            attrs.append(f'ADD_DATE="{int(time.time())}"')
+            attrs.append(f'ADD_DATE="{self.timestamp}"')
 
         if bookmark.icon:
             attrs.append(f'ICON="{html.escape(bookmark.icon)}"')
@@ -1,6 +1,6 @@
 module tabsort
 
-go 1.22
+go 1.22.0
 
 require (
 	github.com/openai/openai-go v1.12.0 // indirect
@@ -0,0 +1,313 @@
+"""本地向量化分类器（NumPy TF-IDF）"""
+import os
+import re
+import json
+from typing import List, Tuple, Optional, Dict
+from urllib.parse import urlparse
+
+import numpy as np
+
+from parser import Bookmark
+from config import DEFAULT_CATEGORY, LOCAL_MODEL_FILE, LOCAL_MIN_CONFIDENCE, LOCAL_MAX_FEATURES
+
+# 英文/数字单词，或连续的中文字符
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]+|[\u4e00-\u9fff]+")
+
+# scheme://netloc 之后到 ? 或 # 之前的路径（与 urlparse 的 path 相同），不匹配时才回退到 urlparse
+_URL_PATH_RE = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*://[^/?#]*([^?#]*)")
+
+# 不参与训练的分类（没有信息量）
+_IGNORED_CATEGORIES = {DEFAULT_CATEGORY, "未分类"}
+
+
+def _words(text: str) -> List[str]:
+    """切分单词，中文按二元组切分"""
+    words = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token[0] >= '\u4e00':
+            if len(token) == 1:
+                words.append(token)
+            else:
+                words.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            words.append(token)
+    return words
+
+
+def extract_features(bookmark: Bookmark) -> List[str]:
+    """
+    提取书签的特征词
+    - d: 域名标签（github、com ...），D: 完整域名
+    - p: URL 路径片段中的单词（只取前3段）
+    - t: 标题中的单词
+    """
+    features = []
+
+    domain = (bookmark.domain or "").lower()
+    if domain:
+        features.append("D:" + domain)
+        features.extend("d:" + label for label in domain.split('.') if label)
+
+    match = _URL_PATH_RE.match(bookmark.url)
+    if match:
+        path = match.group(1)
+    else:
+        try:
+            path = urlparse(bookmark.url).path
+        except ValueError:
+            path = ""
+    # 单词不会跨越 /，前3段合在一起切分，结果与逐段切分相同
+    segments = [s for s in path.split('/') if s][:3]
+    if segments:
+        features.extend("p:" + w for w in _words('/'.join(segments)))
+
+    features.extend("t:" + w for w in _words(bookmark.title or ""))
+
+    return features
+
+
+class LocalBookmarkClassifier:
+    """基于 TF-IDF 最近质心的本地分类器"""
+
+    def __init__(self, model_file: str = LOCAL_MODEL_FILE,
+                 min_confidence: float = LOCAL_MIN_CONFIDENCE,
+                 max_features: int = LOCAL_MAX_FEATURES):
+        self.model_file = model_file
+        self.min_confidence = min_confidence
+        self.max_features = max_features
+
+        self.vocab: Dict[str, int] = {}
+        self.idf: Optional[np.ndarray] = None
+        # 形状 (词表大小, 分类数)，每列是归一化后的分类质心
+        self.weights: Optional[np.ndarray] = None
+        self.labels: List[Tuple[str, Optional[str]]] = []
+        self._weights_t: Optional[np.ndarray] = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.weights is not None and bool(self.labels)
+
+    def _vectorize(self, bookmarks: List[Bookmark], grow_vocab: bool = False):
+        """
+        将书签转换为稀疏矩阵（COO 格式，按行、列排序）
+        返回: (行号, 列号, 词频) 三个数组
+        """
+        rows, cols = [], []
+
+        if grow_vocab:
+            vocab = self.vocab
+            for row, bookmark in enumerate(bookmarks):
+                features = extract_features(bookmark)
+                for feature in features:
+                    col = vocab.get(feature)
+                    if col is None:
+                        col = vocab[feature] = len(vocab)
+                    cols.append(col)
+                rows.extend([row] * len(features))
+        else:
+            # 未登录词记为 -1，之后统一去掉
+            vocab_get = self.vocab.get
+            for row, bookmark in enumerate(bookmarks):
+                features = extract_features(bookmark)
+                cols.extend([vocab_get(feature, -1) for feature in features])
+                rows.extend([row] * len(features))
+
+        rows = np.array(rows, dtype=np.int64)
+        cols = np.array(cols, dtype=np.int64)
+        known = cols >= 0
+        rows, cols = rows[known], cols[known]
+
+        # 同一书签中重复的特征合并为词频
+        width = max(len(self.vocab), 1)
+        cells, counts = np.unique(rows * width + cols, return_counts=True)
+        return cells // width, cells % width, counts.astype(np.float32)
+
+    def _tfidf(self, rows: np.ndarray, cols: np.ndarray, counts: np.ndarray, n_rows: int) -> np.ndarray:
+        """计算 TF-IDF 并按行做 L2 归一化，返回每个非零元素的值"""
+        values = (1.0 + np.log(counts)) * self.idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=n_rows)).astype(np.float32)
+        norms[norms == 0] = 1.0
+        return values / norms[rows]
+
+    def fit(self, classified: dict) -> "LocalBookmarkClassifier":
+        """
+        使用已有的分类结果训练模型
+        :param classified: {(主分类, 子分类): [书签列表]}（AI 或规则分类的输出）
+        """
+        bookmarks = []
+        targets = []
+        self.labels = []
+
+        for key, group in classified.items():
+            if key[0] in _IGNORED_CATEGORIES or not group:
+                continue
+            label_idx = len(self.labels)
+            self.labels.append(key)
+            bookmarks.extend(group)
+            targets.extend([label_idx] * len(group))
+
+        if not bookmarks:
+            raise ValueError("没有可用于训练的分类结果")
+
+        self.vocab = {}
+        rows, cols, counts = self._vectorize(bookmarks, grow_vocab=True)
+
+        # 逆文档频率
+        n_docs = len(bookmarks)
+        df = np.bincount(cols, minlength=len(self.vocab))
+        if len(self.vocab) > self.max_features:
+            rows, cols, counts, df = self._prune_vocab(rows, cols, counts, df)
+        df = df.astype(np.float32)
+        self.idf = (np.log((1.0 + n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+
+        values = self._tfidf(rows, cols, counts, n_docs)
+
+        # 累加每个分类的质心，然后按列归一化
+        n_labels = len(self.labels)
+        cells = cols * n_labels + np.array(targets, dtype=np.int64)[rows]
+        weights = np.bincount(cells, weights=values, minlength=len(self.vocab) * n_labels)
+        weights = weights.reshape(len(self.vocab), n_labels).astype(np.float32)
+        norms = np.linalg.norm(weights, axis=0)
+        norms[norms == 0] = 1.0
+        self.weights = weights / norms
+        self._weights_t = None
+
+        return self
+
+    def _prune_vocab(self, rows: np.ndarray, cols: np.ndarray, counts: np.ndarray, df: np.ndarray):
+        """只保留文档频率最高的 max_features 个特征（频率相同时保留先出现的），词表按原顺序重新编号"""
+        keep = np.sort(np.argsort(-df, kind='stable')[:self.max_features])
+        new_index = np.full(len(df), -1, dtype=np.int64)
+        new_index[keep] = np.arange(len(keep))
+
+        tokens = list(self.vocab)
+        self.vocab = {tokens[old]: new for new, old in enumerate(keep.tolist())}
+
+        cols = new_index[cols]
+        kept = cols >= 0
+        return rows[kept], cols[kept], counts[kept], df[keep]
+
+    def _weights_by_label(self) -> np.ndarray:
+        """按分类连续存放的质心（形状 (分类数, 词表大小)），按列取值更快"""
+        if self._weights_t is None or self._weights_t.shape[::-1] != self.weights.shape:
+            self._weights_t = np.ascontiguousarray(self.weights.T)
+        return self._weights_t
+
+    def predict(self, bookmarks: List[Bookmark]) -> Tuple[List[Tuple[str, Optional[str]]], np.ndarray]:
+        """
+        批量预测
+        返回: ([(主分类, 子分类)], 置信度数组)
+        置信度为书签向量与分类质心的余弦相似度，低于阈值的归入默认分类
+        """
+        if not self.is_trained:
+            raise ValueError("本地模型尚未训练")
+
+        n = len(bookmarks)
+        if n == 0:
+            return [], np.zeros(0, dtype=np.float32)
+
+        rows, cols, counts = self._vectorize(bookmarks)
+        values = self._tfidf(rows, cols, counts, n)
+
+        # 稀疏矩阵 × 质心矩阵：逐个分类按行累加，不生成 非零元素数 × 分类数 的临时矩阵
+        weights_by_label = self._weights_by_label()
+        scores = np.empty((n, len(self.labels)), dtype=np.float32)
+        for label_idx, label_weights in enumerate(weights_by_label):
+            scores[:, label_idx] = np.bincount(rows, weights=values * label_weights[cols], minlength=n)
+
+        best = scores.argmax(axis=1)
+        confidence = scores[np.arange(n), best]
+
+        predictions = [
+            self.labels[idx] if conf >= self.min_confidence else (DEFAULT_CATEGORY, None)
+            for idx, conf in zip(best.tolist(), confidence.tolist())
+        ]
+        return predictions, confidence
+
+    def classify(self, bookmark: Bookmark) -> Tuple[str, Optional[str]]:
+        """
+        分类单个书签
+        返回: (主分类, 子分类)
+        """
+        predictions, _ = self.predict([bookmark])
+        return predictions[0]
+
+    def classify_batch(self, bookmarks: List[Bookmark], batch_size: int = 2000,
+                       with_confidence: bool = False):
+        """
+        批量分类书签
+        :param with_confidence: 同时返回置信度（例如供调用方把低置信度的书签交给其他分类器）
+        返回: {(主分类, 子分类): [书签列表]}；with_confidence 时返回 (分类结果, 置信度数组)，
+              置信度与输入书签顺序一一对应
+        """
+        classified = {}
+        confidences = []
+
+        # 分块计算，避免分数矩阵过大
+        for batch_start in range(0, len(bookmarks), batch_size):
+            batch = bookmarks[batch_start:batch_start + batch_size]
+            predictions, confidence = self.predict(batch)
+            confidences.append(confidence)
+
+            for bookmark, key in zip(batch, predictions):
+                if key not in classified:
+                    classified[key] = []
+                classified[key].append(bookmark)
+
+        if with_confidence:
+            return classified, (np.concatenate(confidences) if confidences else np.zeros(0, dtype=np.float32))
+        return classified
+
+    def get_category_stats(self, classified: dict) -> dict:
+        """获取分类统计"""
+        stats = {}
+
+        for (category, subcategory), bookmarks in classified.items():
+            if category not in stats:
+                stats[category] = {
+                    'total': 0,
+                    'subcategories': {}
+                }
+
+            count = len(bookmarks)
+            stats[category]['total'] += count
+
+            if subcategory:
+                stats[category]['subcategories'][subcategory] = count
+            else:
+                stats[category]['subcategories']['未分组'] = count
+
+        return stats
+
+    def save(self, model_file: Optional[str] = None):
+        """保存模型到磁盘"""
+        if not self.is_trained:
+            raise ValueError("本地模型尚未训练")
+
+        vocab = [''] * len(self.vocab)
+        for token, idx in self.vocab.items():
+            vocab[idx] = token
+
+        with open(model_file or self.model_file, 'wb') as f:
+            np.savez(
+                f,
+                vocab=np.array(vocab, dtype=str),
+                idf=self.idf,
+                weights=self.weights,
+                labels=np.array(json.dumps(self.labels, ensure_ascii=False)),
+            )
+
+    def load(self, model_file: Optional[str] = None) -> "LocalBookmarkClassifier":
+        """从磁盘加载模型"""
+        with np.load(model_file or self.model_file, allow_pickle=False) as data:
+            self.vocab = {token: idx for idx, token in enumerate(data['vocab'].tolist())}
+            self.idf = data['idf']
+            self.weights = data['weights']
+            self.labels = [tuple(label) for label in json.loads(str(data['labels']))]
+        self._weights_t = None
+        return self
+
+    @classmethod
+    def exists(cls, model_file: str = LOCAL_MODEL_FILE) -> bool:
+        """模型文件是否存在"""
+        return os.path.exists(model_file)
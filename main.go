@@ -173,6 +173,10 @@ func printStats(classified map[CategoryKey][]Bookmark) {
 }
 
 func main() {
+	if len(os.Args) > 1 && os.Args[1] == "bench" {
+		os.Exit(runBench(os.Args[2:]))
+	}
+
 	fmt.Println(strings.Repeat("=", 60))
 	fmt.Println("   Chrome 书签智能整理工具")
 	fmt.Println(strings.Repeat("=", 60))
@@ -7,35 +7,52 @@
 """
 
 import os
+import sys
 import glob
+import json
+import time
+import argparse
 from datetime import datetime
-from dotenv import load_dotenv
-from pick import pick
 from parser import BookmarkParser
 from classifier import BookmarkClassifier
-from ai_classifier import AIBookmarkClassifier
 from organizer import BookmarkOrganizer
 from generator import BookmarkHTMLGenerator
+from config import LOCAL_MODEL_FILE, SEARCH_INDEX_FILE, SEEN_INDEX_DIR, ARCHIVE_FOLDER_NAME
 
-# 加载环境变量
-load_dotenv()
+# 较重的依赖（openai、bs4、pick、dotenv、numpy）只在用到时才导入，
+# 这样规则分类等非交互运行可以快速启动
+
+CLASSIFICATION_MODES = ('ai', 'cascade', 'local', 'rules')
+
+
+def load_env():
+    """加载 .env 环境变量"""
+    from dotenv import load_dotenv
+    load_dotenv()
 
 
 def select_classification_mode():
     """选择分类模式"""
+    options = []
+
     # 检查是否配置了 AI
-    has_ai_config = os.getenv('OPENROUTER_API_KEY')
+    if os.getenv('OPENROUTER_API_KEY'):
+        options.append(("🤖 AI 智能分类 (使用 OpenRouter)", 'ai'))
+        options.append(("🔀 级联分类 (规则优先，剩余交给 AI)", 'cascade'))
 
-    if not has_ai_config:
+    # 检查是否有训练好的本地模型
+    if os.path.exists(LOCAL_MODEL_FILE):
+        options.append(("🧠 本地模型分类 (基于历史 AI 分类结果训练)", 'local'))
+
+    options.append(("📏 规则分类 (基于域名和关键词)", 'rules'))
+
+    if len(options) == 1:
         print("\n💡 未检测到 OPENROUTER_API_KEY，将使用规则分类")
         return 'rules'
 
-    try:
-        options = [
-            ("🤖 AI 智能分类 (使用 OpenRouter)", 'ai'),
-            ("📏 规则分类 (基于域名和关键词)", 'rules')
-        ]
+    from pick import pick
 
+    try:
         title = "\n🎯 请选择分类模式:\n"
         selected, index = pick([opt[0] for opt in options], title, indicator="=>", default_index=0)
 
@@ -64,6 +81,8 @@ def select_html_file():
         display = f"{file:<30} | {file_size:>8.1f} KB | {mod_time.strftime('%Y-%m-%d %H:%M:%S')}"
         options.append((display, file))
 
+    from pick import pick
+
     try:
         title = "\n📋 请使用 ↑↓ 方向键选择要整理的书签文件，按 Enter 确认:\n"
         # 使用 pick 进行交互式选择
@@ -77,32 +96,450 @@ def select_html_file():
         return None
 
 
-def main():
-    print("=" * 60)
-    print("Chrome 书签智能整理工具")
-    print("=" * 60)
+def load_local_classifier():
+    """加载本地模型，模型文件不存在时提示先训练并返回 None"""
+    from local_classifier import LocalBookmarkClassifier
 
-    # 选择分类模式
-    classification_mode = select_classification_mode()
-    if not classification_mode:
+    if not LocalBookmarkClassifier.exists():
+        print(f"\n❌ 未找到本地模型 {LOCAL_MODEL_FILE}，请先用 AI 或级联模式分类一次（会自动训练本地模型）")
+        return None
+    return LocalBookmarkClassifier().load()
+
+
+def train_local_model(classified: dict):
+    """使用 AI 分类结果训练本地模型，供下次离线使用"""
+    from local_classifier import LocalBookmarkClassifier
+
+    try:
+        model = LocalBookmarkClassifier().fit(classified)
+        model.save()
+        print(f"\n🧠 已根据本次分类结果训练本地模型: {model.model_file} ({len(model.labels)} 个分类)")
+    except ValueError as e:
+        print(f"\n⚠️  本地模型训练跳过: {e}")
+
+
+def distill_rules(classified: dict):
+    """从 AI 分类结果提炼域名规则，下次运行时这些域名直接由规则分类"""
+    from distill import update_generated_rules
+    from config import GENERATED_RULES_FILE
+
+    try:
+        changes = update_generated_rules(classified)
+    except (OSError, ValueError) as e:
+        print(f"\n⚠️  域名规则提炼跳过: {e}")
         return
 
-    # 选择输入文件
-    input_file = select_html_file()
-    if not input_file:
+    if changes['added'] or changes['updated']:
+        print(f"\n🧪 已从 AI 分类结果提炼域名规则: 新增 {changes['added']}，更新 {changes['updated']}"
+              f"（共 {changes['total']} 个域名，{GENERATED_RULES_FILE}）")
+
+
+def create_rule_classifier(with_stats: bool = False, adaptive: bool = False):
+    """
+    创建规则分类器，规则文件无效时提示并退出
+    :param with_stats: 记录规则命中统计
+    :param adaptive: 按历史累计的命中次数重排规则模式（不改变分类结果）
+    返回: (分类器, 历史累计统计)，不记录统计时历史累计统计为 None
+    """
+    from rules import load_rules
+
+    try:
+        rules = load_rules()
+    except ValueError as e:
+        print(f"❌ 规则加载失败: {e}")
+        sys.exit(1)
+
+    if not (with_stats or adaptive):
+        return BookmarkClassifier(rules), None
+
+    from rule_stats import RuleStats, reorder_rules, stats_file
+
+    history = RuleStats(rules)
+    if history.load(stats_file(rules)) and adaptive:
+        rules = reorder_rules(rules, history)
+        print(f"\n⚡ 已按历史命中次数重排规则（累计 {history.bookmarks} 个书签）")
+
+    return BookmarkClassifier(rules, stats=RuleStats(rules)), history
+
+
+def save_rule_stats(rule_classifier: BookmarkClassifier, history, report_file: str = None):
+    """累计本次规则命中统计，并输出报告"""
+    from rule_stats import print_report, stats_file
+
+    stats = rule_classifier.stats
+    if not stats.bookmarks:
         return
 
-    # 生成输出文件名（只用时间戳）
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f"{timestamp}.html"
+    report = stats.report()
+    print_report(report)
+
+    if report_file:
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"   报告已保存到: {report_file}")
+
+    history.merge(stats)
+    history.save(stats_file(rule_classifier.rules))
+
+
+def create_ai_classifier(classification_mode: str, resume: bool = True,
+                         rule_classifier: BookmarkClassifier = None, checkpoint: bool = True,
+                         keep_ai_results: bool = True, verbose: bool = True):
+    """
+    创建 AI 或级联分类器（初始化失败时抛出异常）
+    :param keep_ai_results: 级联分类器是否保留 AI 层的结果（用于提炼域名规则）
+    :param verbose: 每批都显示 AI 分类的标题、进度和级联规则层命中数（分批调用时关闭，
+                    标题只显示一次、进度合并为一行，级联统计在结束时统一显示）
+    """
+    from ai_classifier import AIBookmarkClassifier
+
+    ai_classifier = AIBookmarkClassifier(resume=resume, checkpoint=checkpoint, verbose=verbose)
+    if classification_mode == 'cascade':
+        from cascade import CascadeBookmarkClassifier
+        return CascadeBookmarkClassifier(ai_classifier, rule_classifier, keep_ai_results=keep_ai_results,
+                                         verbose=verbose)
+    return ai_classifier
+
+
+def print_cascade_stats(classifier):
+    """显示级联分类各层处理的书签数"""
+    total = sum(classifier.tier_counts.values()) or 1
+    print(f"\n🔀 级联分类统计:")
+    print(f"   规则层: {classifier.tier_counts['rules']} 个 ({classifier.tier_counts['rules'] * 100 // total}%)")
+    print(f"   AI 层:  {classifier.tier_counts['ai']} 个 ({classifier.tier_counts['ai'] * 100 // total}%)")
+
+
+def merge_classified(*parts: dict) -> dict:
+    """合并多份分类结果 {(主分类, 子分类): [书签列表]}（不修改传入的列表）"""
+    merged = {}
+    for part in parts:
+        for key, group in part.items():
+            merged.setdefault(key, []).extend(group)
+    return merged
+
+
+def finish_ai_classification(classification_mode: str, classifier, classified: dict, known: dict = None):
+    """
+    AI 分类完成后：训练本地模型、提炼域名规则，级联模式显示各层统计
+    :param known: 沿用上次分类的书签（--seen-index），与本次结果一起训练本地模型，
+                  否则只分类了新书签的增量运行会用很少的样本覆盖已有的模型
+    """
+    # AI 分类结果用于训练本地模型
+    train_local_model(merge_classified(known, classified) if known else classified)
+
+    # 级联模式只用 AI 层的结果提炼，规则层的结论本来就有规则覆盖
+    distill_rules(classifier.ai_classified if classification_mode == 'cascade' else classified)
+
+    if classification_mode == 'cascade':
+        print_cascade_stats(classifier)
+
+
+def report_ai_metrics(classifier, metrics_file: str = None):
+    """
+    显示 AI 请求指标（token、耗时、费用），非 AI 分类器直接跳过
+    :param metrics_file: 同时写入 JSON 报告，并在同名 .prom 文件写入 Prometheus 指标
+    """
+    ai_classifier = getattr(classifier, 'ai_classifier', classifier)
+    metrics = getattr(ai_classifier, 'metrics', None)
+    if metrics is None:
+        return
 
-    # 1. 解析书签
+    from metrics import print_summary
+
+    print_summary(metrics.summary())
+    if metrics_file:
+        prom_file = os.path.splitext(metrics_file)[0] + '.prom'
+        metrics.write_json(metrics_file)
+        metrics.write_prometheus(prom_file)
+        print(f"   指标已保存到: {metrics_file}, {prom_file}")
+
+
+def classify_bookmarks(classification_mode: str, bookmarks: list, resume: bool = True,
+                       rule_classifier: BookmarkClassifier = None, known: dict = None):
+    """
+    按分类模式分类书签
+    :param resume: AI 分类存在上次中断的断点时从断点继续
+    :param rule_classifier: 规则分类（及级联的规则层、降级）使用的分类器
+    :param known: 沿用上次分类、不需要再分类的书签 {(主分类, 子分类): [书签列表]}，用于训练本地模型
+    返回: (分类器, {(主分类, 子分类): [书签列表]})
+    """
+    if classification_mode in ('ai', 'cascade'):
+        try:
+            classifier = create_ai_classifier(classification_mode, resume, rule_classifier)
+            classified = classifier.classify_batch(bookmarks)
+        except Exception as e:
+            print(f"\n⚠️  AI 分类器初始化失败: {e}")
+            print("💡 降级使用规则分类...")
+            classifier = rule_classifier or BookmarkClassifier()
+            print(f"\n📏 正在使用规则分类...")
+            return classifier, classifier.classify_batch(bookmarks)
+
+        finish_ai_classification(classification_mode, classifier, classified, known)
+        return classifier, classified
+
+    if classification_mode == 'local':
+        classifier = load_local_classifier()
+        if classifier is not None:
+            print(f"\n🧠 正在使用本地模型分类...")
+            return classifier, classifier.classify_batch(bookmarks)
+        print("💡 降级使用规则分类...")
+
+    classifier = rule_classifier or BookmarkClassifier()
+    print(f"\n📏 正在使用规则分类...")
+    return classifier, classifier.classify_batch(bookmarks)
+
+
+def create_streaming_classifier(classification_mode: str, rule_classifier: BookmarkClassifier = None,
+                                keep_ai_results: bool = True):
+    """
+    创建分批调用的分类器（流水线和超出内存模式），AI 分类不记录断点
+    :param keep_ai_results: 级联分类器是否保留 AI 层的结果（超出内存模式不保留）
+    返回: (分类器, 实际使用的分类模式)，AI 初始化失败时降级为规则分类
+    """
+    if classification_mode in ('ai', 'cascade'):
+        try:
+            classifier = create_ai_classifier(classification_mode, rule_classifier=rule_classifier,
+                                              checkpoint=False, keep_ai_results=keep_ai_results, verbose=False)
+            return classifier, classification_mode
+        except Exception as e:
+            print(f"\n⚠️  AI 分类器初始化失败: {e}")
+            print("💡 降级使用规则分类...")
+            return rule_classifier or BookmarkClassifier(), 'rules'
+
+    if classification_mode == 'local':
+        classifier = load_local_classifier()
+        if classifier is not None:
+            return classifier, classification_mode
+        print("💡 降级使用规则分类...")
+        return rule_classifier or BookmarkClassifier(), 'rules'
+
+    return rule_classifier or BookmarkClassifier(), classification_mode
+
+
+def run_pipeline(classification_mode: str, input_files: list,
+                 rule_classifier: BookmarkClassifier = None, include_icons: bool = True,
+                 archive_months: int = None):
+    """
+    流水线模式：解析、去重、分类、组织同时进行
+    返回: (分类器, {(主分类, 子分类): [书签列表]}, 组织好的根文件夹, 总书签数)
+    """
+    from pipeline import BookmarkPipeline
+    from config import PIPELINE_AI_WORKERS
+
+    classifier, classification_mode = create_streaming_classifier(classification_mode, rule_classifier)
+
+    # AI 分类主要在等待网络，多个批次并发请求；规则和本地模型受 GIL 限制，单线程即可
+    workers = PIPELINE_AI_WORKERS if classification_mode in ('ai', 'cascade') else 1
+
+    print(f"\n🚀 流水线模式: 解析、去重、分类、组织同时进行（{len(input_files)} 个文件，分类并发 {workers}）")
+
+    pipeline = BookmarkPipeline(input_files, classifier, workers=workers, include_icons=include_icons,
+                                archive_months=archive_months)
+    start = time.perf_counter()
+    try:
+        root = pipeline.run()
+    finally:
+        if classification_mode in ('ai', 'cascade'):
+            classifier.end_progress()
+    elapsed = time.perf_counter() - start
+
+    times = pipeline.stage_times
+    print(f"✅ 处理完成！({elapsed:.2f} 秒)")
+    print(f"   总书签数: {pipeline.total}")
+    print(f"   去重后: {pipeline.total - pipeline.duplicates}")
+    print(f"   各阶段耗时: 解析 {times['parse']:.2f}s，去重 {times['dedup']:.2f}s，"
+          f"分类 {times['classify']:.2f}s（{workers} 线程合计），组织 {times['organize']:.2f}s")
+
+    if classification_mode in ('ai', 'cascade'):
+        finish_ai_classification(classification_mode, classifier, pipeline.classified)
+
+    return classifier, pipeline.classified, root, pipeline.total
+
+
+def run_out_of_core(classification_mode: str, input_files: list, output_file: str,
+                    rule_classifier: BookmarkClassifier = None, include_icons: bool = True):
+    """
+    超出内存模式：流式合并 → 分批分类 → 按主分类溢写到磁盘 → 外部排序后流式生成 HTML
+    内存中只保留一批书签、合并/排序的缓冲区和各分类的计数
+    返回: 分类器
+    """
+    from merger import BookmarkMerger
+    from spill import SpillingOrganizer
+    from config import SPILL_BATCH_SIZE, SPILL_SORT_RUN_SIZE
+
+    classifier, classification_mode = create_streaming_classifier(classification_mode, rule_classifier,
+                                                                  keep_ai_results=False)
+
+    print(f"\n💽 超出内存模式: 正在合并并分类 {len(input_files)} 个书签文件...")
+    # 合并阶段使用与排序相同的内存上限
+    merger = BookmarkMerger(input_files, max_in_memory=SPILL_SORT_RUN_SIZE, include_icons=include_icons)
+    organizer = SpillingOrganizer()
+
+    try:
+        batch = []
+        for bookmark in merger.merge():
+            batch.append(bookmark)
+            if len(batch) >= SPILL_BATCH_SIZE:
+                organizer.add_classified(classifier.classify_batch(batch))
+                batch = []
+        if batch:
+            organizer.add_classified(classifier.classify_batch(batch))
+        if classification_mode in ('ai', 'cascade'):
+            classifier.end_progress()
+
+        print(f"✅ 分类完成！")
+        print(f"   总书签数: {merger.total}")
+        print(f"   去重后: {organizer.total}")
+
+        if classification_mode == 'cascade':
+            print_cascade_stats(classifier)
+        if classification_mode in ('ai', 'cascade'):
+            # 训练和提炼都需要全部分类结果，超出内存模式不在内存中保留
+            print("\n💡 超出内存模式不保留分类结果，本次 AI 分类不用于训练本地模型和提炼域名规则")
+
+        print_category_stats(organizer.category_stats())
+
+        print(f"\n💾 正在生成HTML文件: {output_file}")
+        BookmarkHTMLGenerator().generate_stream(output_file, organizer.root_name, organizer.iter_categories())
+    finally:
+        organizer.close()
+
+    print(f"\n✅ 生成完成！")
+    return classifier
+
+
+def print_category_stats(stats: dict):
+    """显示分类统计"""
+    print(f"\n📊 分类统计:")
+    print("-" * 60)
+
+    # 按书签数量排序显示
+    sorted_stats = sorted(stats.items(), key=lambda x: x[1]['total'], reverse=True)
+
+    for category, info in sorted_stats:
+        print(f"\n📁 {category} ({info['total']} 个)")
+        if info['subcategories']:
+            for subcat, count in sorted(info['subcategories'].items(),
+                                         key=lambda x: x[1], reverse=True):
+                print(f"   └─ {subcat}: {count}")
+
+
+def print_import_help(output_file: str):
+    """显示导入方法"""
+    print(f"\n📄 整理后的书签已保存到: {output_file}")
+    print(f"\n💡 导入方法:")
+    print(f"   1. 打开 Chrome 浏览器")
+    print(f"   2. 按 Ctrl+Shift+O (或 Cmd+Shift+O) 打开书签管理器")
+    print(f"   3. 点击右上角的 '...' 菜单")
+    print(f"   4. 选择 '导入书签'")
+    print(f"   5. 选择文件: {output_file}")
+    print(f"\n" + "=" * 60)
+
+
+def parse_args(argv=None):
+    """解析命令行参数（不传参数时进入交互模式）"""
+    arg_parser = argparse.ArgumentParser(description="Chrome 书签智能整理工具",
+                                         epilog="检索已整理的书签: python main.py search 关键词\n"
+                                                "常驻分类服务: python main.py serve -m rules",
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('input', nargs='*', help="书签 HTML 文件（不指定时交互选择，多个文件时合并去重）")
+    arg_parser.add_argument('-m', '--mode', choices=CLASSIFICATION_MODES,
+                            help="分类模式（不指定时交互选择）")
+    arg_parser.add_argument('-o', '--output', help="输出文件（默认按时间戳命名）")
+    arg_parser.add_argument('--sqlite', metavar='DB', help="同时将分类结果追加导出到 SQLite 数据库")
+    arg_parser.add_argument('--no-index', action='store_true', help="不更新全文检索索引")
+    arg_parser.add_argument('--restart', action='store_true', help="忽略上次中断的 AI 分类断点，从头开始")
+    arg_parser.add_argument('--rule-report', metavar='FILE',
+                            help="记录每条规则的命中、未命中次数和耗时，并保存 JSON 报告")
+    arg_parser.add_argument('--adaptive-rules', action='store_true',
+                            help="按历史命中次数重排规则模式，命中多的先检查（分类结果不变）")
+    execution = arg_parser.add_mutually_exclusive_group()
+    execution.add_argument('--pipeline', action='store_true',
+                           help="流水线模式：解析、去重、分类、组织同时进行（按规范化 URL 去重）")
+    execution.add_argument('--out-of-core', action='store_true',
+                           help="超出内存模式：分类结果溢写到磁盘，适合特别大的合并导出"
+                                "（不导出 SQLite、不更新索引，AI 分类结果不用于训练本地模型和提炼域名规则）")
+    arg_parser.add_argument('--seen-index', metavar='DIR', nargs='?', const=SEEN_INDEX_DIR,
+                            help=f"记录整理过的 URL 及其分类，再次整理时只分类新书签（默认目录 {SEEN_INDEX_DIR}）")
+    arg_parser.add_argument('--split-output', metavar='DIR',
+                            help="同时为每个主分类生成一个独立的 HTML 文件（便于只导入部分分类）")
+    arg_parser.add_argument('--archive-months', metavar='N', type=int,
+                            help=f"添加时间早于 N 个月前的书签按年份移入「{ARCHIVE_FOLDER_NAME}」文件夹，书签栏只保留近期书签")
+    arg_parser.add_argument('--metrics', metavar='FILE',
+                            help="将 AI 请求指标（token、耗时、费用）写入 JSON 文件，并在同名 .prom 文件写入 Prometheus 格式")
+    arg_parser.add_argument('--no-icons', action='store_true', help="不读取书签图标（大文件解析更快，输出不含图标）")
+    args = arg_parser.parse_args(argv)
+    if args.archive_months is not None and args.archive_months <= 0:
+        arg_parser.error("--archive-months 必须是正整数")
+    return args
+
+
+def search(argv):
+    """
+    检索已整理的书签
+    用法: python main.py search 关键词 [--category 分类] [--domain 域名] [--limit N]
+    """
+    from search_index import BookmarkSearchIndex
+
+    arg_parser = argparse.ArgumentParser(prog="main.py search", description="检索已整理的书签")
+    arg_parser.add_argument('query', nargs='+', help="检索词")
+    arg_parser.add_argument('-c', '--category', help="只看该主分类")
+    arg_parser.add_argument('-d', '--domain', help="只看该域名（含子域名）")
+    arg_parser.add_argument('-n', '--limit', type=int, default=20, help="最多显示条数（默认 20）")
+    arg_parser.add_argument('--index', default=SEARCH_INDEX_FILE, help=f"索引文件（默认 {SEARCH_INDEX_FILE}）")
+    args = arg_parser.parse_args(argv)
+
+    if not os.path.exists(args.index):
+        print(f"❌ 索引文件不存在: {args.index}")
+        print("💡 请先运行一次整理，索引会自动建立")
+        return
+
+    index = BookmarkSearchIndex(args.index)
+    try:
+        start = time.perf_counter()
+        results = index.search(' '.join(args.query), category=args.category,
+                               domain=args.domain, limit=args.limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    finally:
+        index.close()
+
+    print(f"\n🔍 找到 {len(results)} 条结果 ({elapsed_ms:.1f} ms)")
+    print("-" * 60)
+    for result in results:
+        category = result['category']
+        if result['subcategory']:
+            category += f" / {result['subcategory']}"
+        print(f"   • {result['title']}")
+        print(f"     {result['url']}")
+        print(f"     📁 {category}")
+
+
+def split_seen_bookmarks(index_dir: str, bookmarks: list):
+    """
+    用已整理书签索引把书签分为整理过的和新的
+    返回: (索引, {(主分类, 子分类): [整理过的书签]}, [新书签])
+    """
+    from seen_index import SeenIndex
+
+    index = SeenIndex(index_dir)
+    known, new = index.split(bookmarks)
+    print(f"\n♻️  已整理书签索引 ({len(index)} 个 URL): 整理过 {len(bookmarks) - len(new)} 个，"
+          f"新书签 {len(new)} 个")
+    return index, known, new
+
+
+def parse_input(input_file: str, include_icons: bool = True):
+    """
+    解析单个书签文件并去重
+    返回: (总书签数, 去重后的书签, 只有hash不同的重复组)
+    """
     print(f"\n📖 正在解析书签文件: {input_file}")
-    parser = BookmarkParser(input_file)
+    parser = BookmarkParser(input_file, include_icons=include_icons)
     bookmarks = parser.parse()
 
-    # 去重
-    unique_bookmarks, duplicates = parser.get_unique_bookmarks()
+    # 去重、重复分组等结果来自同一次遍历
+    analysis = parser.analyze()
+    unique_bookmarks, duplicates = analysis.unique, analysis.duplicates
 
     print(f"✅ 解析完成！")
     print(f"   总书签数: {len(bookmarks)}")
@@ -119,7 +556,7 @@ def main():
             print()
 
     # 查找只有hash不同的重复
-    hash_duplicates = parser.find_hash_only_duplicates()
+    hash_duplicates = analysis.hash_only_duplicates
     if hash_duplicates:
         print(f"\n🔗 发现 {len(hash_duplicates)} 组只有hash不同的重复书签:")
         print("=" * 60)
@@ -133,45 +570,216 @@ def main():
                 print(f"       完整URL: {bm.url}")
             print("-" * 60)
 
-    # 2. 智能分类
-    if classification_mode == 'ai':
-        try:
-            classifier = AIBookmarkClassifier()
-            classified = classifier.classify_batch(unique_bookmarks)
-        except Exception as e:
-            print(f"\n⚠️  AI 分类器初始化失败: {e}")
-            print("💡 降级使用规则分类...")
-            classifier = BookmarkClassifier()
-            print(f"\n📏 正在使用规则分类...")
-            classified = classifier.classify_batch(unique_bookmarks)
+    return len(bookmarks), unique_bookmarks, hash_duplicates
+
+
+def merge_inputs(input_files: list, include_icons: bool = True):
+    """
+    流式合并多个书签文件（按规范化 URL 去重）
+    返回: (总书签数, 合并后的书签, 只有hash不同的重复组)
+    """
+    from merger import BookmarkMerger
+
+    print(f"\n📖 正在合并 {len(input_files)} 个书签文件...")
+    merger = BookmarkMerger(input_files, include_icons=include_icons)
+    unique_bookmarks = list(merger.merge())
+
+    print(f"✅ 合并完成！")
+    print(f"   总书签数: {merger.total}")
+    print(f"   合并后: {len(unique_bookmarks)}")
+    print(f"\n📥 各文件贡献:")
+    print("-" * 60)
+    for input_file, info in merger.stats.items():
+        print(f"   • {input_file}: 读取 {info['read']}，新增 {info['new']}，重复 {info['duplicates']}")
+
+    # 合并键已忽略 hash，不再单独报告只有hash不同的重复
+    return merger.total, unique_bookmarks, []
+
+
+def serve(argv):
+    """
+    常驻分类服务
+    用法: python main.py serve [-m 模式] [--port 端口 | --socket 路径]
+    """
+    from daemon import ClassificationService, create_server
+    from config import DAEMON_PORT
+
+    arg_parser = argparse.ArgumentParser(prog="main.py serve", description="常驻分类服务（本地 HTTP 接口）")
+    arg_parser.add_argument('-m', '--mode', choices=CLASSIFICATION_MODES, default='rules',
+                            help="分类模式（默认 rules）")
+    arg_parser.add_argument('--host', default='127.0.0.1', help="监听地址（默认 127.0.0.1）")
+    arg_parser.add_argument('--port', type=int, default=DAEMON_PORT, help=f"监听端口（默认 {DAEMON_PORT}）")
+    arg_parser.add_argument('--socket', metavar='PATH', help="监听 Unix socket（指定时忽略 --host/--port）")
+    args = arg_parser.parse_args(argv)
+
+    if args.mode != 'rules':
+        load_env()
+
+    start = time.perf_counter()
+    try:
+        ai_classifier = None
+        if args.mode in ('ai', 'cascade'):
+            from ai_classifier import AIBookmarkClassifier
+            ai_classifier = AIBookmarkClassifier(checkpoint=False)
+
+        service = ClassificationService(args.mode, ai_classifier=ai_classifier)
+    except ValueError as e:
+        print(f"❌ 分类服务启动失败: {e}")
+        sys.exit(1)
+    server = create_server(service, host=args.host, port=args.port, socket_path=args.socket)
+    address = args.socket or f"http://{args.host}:{server.server_address[1]}"
+
+    print(f"🚀 分类服务已启动（{args.mode} 模式，{(time.perf_counter() - start) * 1000:.0f} ms）: {address}")
+    print(f"   POST /classify         {{\"url\", \"title\"}}")
+    print(f"   POST /classify/batch   {{\"bookmarks\": [...]}}")
+    print(f"   GET  /health")
+    print(f"   按 Ctrl+C 停止")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n👋 服务已停止")
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == 'search':
+        search(argv[1:])
+        return
+    if argv and argv[0] == 'serve':
+        serve(argv[1:])
+        return
+
+    args = parse_args(argv)
+
+    print("=" * 60)
+    print("Chrome 书签智能整理工具")
+    print("=" * 60)
+
+    # 规则分类不需要读取 API 配置
+    if args.mode != 'rules':
+        load_env()
+
+    # 选择分类模式
+    classification_mode = args.mode or select_classification_mode()
+    if not classification_mode:
+        return
+
+    # 选择输入文件（多个文件时合并）
+    input_files = args.input or [select_html_file()]
+    if not input_files[0]:
+        return
+
+    # 生成输出文件名（只用时间戳）
+    output_file = args.output
+    if not output_file:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = f"{timestamp}.html"
+
+    # 所有模式都会用到规则（级联的规则层、AI 不可用时降级），提前加载以便规则文件无效时直接提示
+    rule_classifier, history = create_rule_classifier(with_stats=bool(args.rule_report),
+                                                      adaptive=args.adaptive_rules)
+
+    if args.out_of_core:
+        if args.sqlite:
+            print("\n💡 超出内存模式不支持 --sqlite，已跳过导出")
+        if args.split_output:
+            print("\n💡 超出内存模式不支持 --split-output，已跳过拆分")
+        if args.seen_index:
+            print("\n💡 超出内存模式不支持 --seen-index，将分类全部书签")
+        if args.archive_months:
+            print("\n💡 超出内存模式不支持 --archive-months，不归档旧书签")
+        classifier = run_out_of_core(classification_mode, input_files, output_file,
+                                     rule_classifier=rule_classifier, include_icons=not args.no_icons)
+        report_ai_metrics(classifier, args.metrics)
+        if history is not None:
+            save_rule_stats(rule_classifier, history, args.rule_report)
+        print_import_help(output_file)
+        return
+
+    root = seen_index = None
+    if args.pipeline:
+        if args.seen_index:
+            print("\n💡 流水线模式不支持 --seen-index，将分类全部书签")
+        # 1-3. 解析、分类、组织同时进行
+        classifier, classified, root, total = run_pipeline(
+            classification_mode, input_files,
+            rule_classifier=rule_classifier, include_icons=not args.no_icons,
+            archive_months=args.archive_months
+        )
+        hash_duplicates = []
     else:
-        classifier = BookmarkClassifier()
-        print(f"\n📏 正在使用规则分类...")
-        classified = classifier.classify_batch(unique_bookmarks)
+        # 1. 解析书签
+        if len(input_files) > 1:
+            total, unique_bookmarks, hash_duplicates = merge_inputs(input_files, include_icons=not args.no_icons)
+        else:
+            total, unique_bookmarks, hash_duplicates = parse_input(input_files[0], include_icons=not args.no_icons)
+
+        # 整理过的书签沿用上次的分类，只分类新书签
+        known = {}
+        if args.seen_index:
+            seen_index, known, unique_bookmarks = split_seen_bookmarks(args.seen_index, unique_bookmarks)
+
+        # 2. 智能分类
+        if unique_bookmarks or not known:
+            classifier, classified = classify_bookmarks(classification_mode, unique_bookmarks,
+                                                         resume=not args.restart,
+                                                         rule_classifier=rule_classifier, known=known)
+        else:
+            classifier, classified = rule_classifier or BookmarkClassifier(), {}
+
+        if seen_index is not None:
+            new_classified = classified
+            classified = merge_classified(known, new_classified)
+
+    report_ai_metrics(classifier, args.metrics)
+
+    if history is not None:
+        save_rule_stats(rule_classifier, history, args.rule_report)
 
     # 获取分类统计
     stats = classifier.get_category_stats(classified)
 
     print(f"✅ 分类完成！")
-    print(f"\n📊 分类统计:")
-    print("-" * 60)
-
-    # 按书签数量排序显示
-    sorted_stats = sorted(stats.items(), key=lambda x: x[1]['total'], reverse=True)
-
-    for category, info in sorted_stats:
-        print(f"\n📁 {category} ({info['total']} 个)")
-        if info['subcategories']:
-            for subcat, count in sorted(info['subcategories'].items(),
-                                         key=lambda x: x[1], reverse=True):
-                print(f"   └─ {subcat}: {count}")
+    print_category_stats(stats)
+
+    # 导出到 SQLite
+    if args.sqlite:
+        from exporter import SQLiteExporter
+
+        print(f"\n🗄️  正在导出到 SQLite: {args.sqlite}")
+        run_id = SQLiteExporter(args.sqlite).export(
+            classified,
+            duplicate_groups=hash_duplicates,
+            input_file=', '.join(input_files),
+            output_file=output_file,
+            mode=classification_mode,
+            total=total,
+        )
+        print(f"✅ 导出完成！(run_id: {run_id})")
+
+    # 更新全文检索索引
+    if not args.no_index:
+        from search_index import BookmarkSearchIndex
+
+        index = BookmarkSearchIndex()
+        try:
+            changes = index.update(classified, prune=True)
+        finally:
+            index.close()
+        print(f"\n🔍 检索索引已更新: 新增 {changes['added']}，更新 {changes['updated']}，删除 {changes['removed']}")
 
-    # 3. 组织书签结构
-    print(f"\n📂 正在组织文件夹结构...")
-    organizer = BookmarkOrganizer(classified)
-    root = organizer.organize()
+    # 3. 组织书签结构（流水线模式下已完成）
+    if root is None:
+        print(f"\n📂 正在组织文件夹结构...")
+        organizer = BookmarkOrganizer(classified, archive_months=args.archive_months)
+        root = organizer.organize()
 
-    print(f"✅ 组织完成！")
+        print(f"✅ 组织完成！")
 
     # 4. 生成HTML
     print(f"\n💾 正在生成HTML文件: {output_file}")
@@ -180,18 +788,20 @@ def main():
     # 显示预览
     print(generator.get_preview())
 
-    # 生成文件
+    # 生成文件（书签很多时按主分类并行生成）
     generator.generate(output_file)
 
+    if args.split_output:
+        files = generator.generate_split(args.split_output)
+        print(f"   已按主分类拆分为 {len(files)} 个文件: {args.split_output}")
+
     print(f"\n✅ 生成完成！")
-    print(f"\n📄 整理后的书签已保存到: {output_file}")
-    print(f"\n💡 导入方法:")
-    print(f"   1. 打开 Chrome 浏览器")
-    print(f"   2. 按 Ctrl+Shift+O (或 Cmd+Shift+O) 打开书签管理器")
-    print(f"   3. 点击右上角的 '...' 菜单")
-    print(f"   4. 选择 '导入书签'")
-    print(f"   5. 选择文件: {output_file}")
-    print(f"\n" + "=" * 60)
+
+    if seen_index is not None:
+        added = seen_index.update(new_classified)
+        print(f"\n♻️  已整理书签索引新增 {added} 个 URL（共 {len(seen_index)} 个）")
+
+    print_import_help(output_file)
 
 
 if __name__ == "__main__":
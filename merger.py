@@ -0,0 +1,145 @@
+"""多文件书签合并"""
+import os
+import json
+import zlib
+import tempfile
+from typing import List, Dict, Iterator, Tuple
+from parser import Bookmark, BookmarkParser, canonicalize_url
+from config import MERGE_MAX_IN_MEMORY, MERGE_PARTITIONS
+
+
+def _merge_into(kept: Bookmark, other: Bookmark):
+    """
+    将同一 URL 的另一条书签合并到 kept
+    - add_date 取最早
+    - 标题取"最好"的：非空、不等于 URL，同等条件下取更长的
+    - 图标取数据更多的（通常分辨率更高）
+    """
+    if other.added_at is not None and (kept.added_at is None or other.added_at < kept.added_at):
+        kept.add_date = other.add_date
+        kept.added_at = other.added_at
+
+    def title_score(bm: Bookmark):
+        return (bool(bm.title) and bm.title != bm.url, len(bm.title or ''))
+
+    if title_score(other) > title_score(kept):
+        kept.title = other.title
+
+    if other.icon and len(other.icon) > len(kept.icon or ''):
+        kept.icon = other.icon
+
+
+class BookmarkMerger:
+    """
+    流式合并多个书签导出文件（如多台设备、多个配置文件）
+    - 逐个文件流式读取，按规范化 URL 合并
+    - 内存中的书签超过 max_in_memory 后，按 URL 哈希分片溢写到临时文件，
+      再逐个分片合并，内存占用与分片大小成正比
+    """
+
+    def __init__(self, html_files: List[str], max_in_memory: int = MERGE_MAX_IN_MEMORY,
+                 partitions: int = MERGE_PARTITIONS, include_icons: bool = True):
+        self.html_files = html_files
+        self.include_icons = include_icons
+        self.max_in_memory = max_in_memory
+        self.partitions = partitions
+
+        # 每个来源的贡献：读取数、首次出现（新增）数、重复数
+        self.stats: Dict[str, Dict[str, int]] = {
+            f: {'read': 0, 'new': 0, 'duplicates': 0} for f in html_files
+        }
+        self.total = 0
+
+    def _records(self) -> Iterator[Tuple[int, int, Bookmark]]:
+        """产出 (序号, 来源序号, 书签)"""
+        seq = 0
+        for source, html_file in enumerate(self.html_files):
+            for bookmark in BookmarkParser(html_file, include_icons=self.include_icons).iter_parse():
+                self.stats[html_file]['read'] += 1
+                yield seq, source, bookmark
+                seq += 1
+        self.total = seq
+
+    def _add(self, groups: dict, seq: int, source: int, bookmark: Bookmark, key: str):
+        """把一条记录合并进分组 {key: [最早序号, 最早来源, 书签]}"""
+        entry = groups.get(key)
+        if entry is None:
+            groups[key] = [seq, source, bookmark]
+            return
+
+        # 保留最早读到的那条作为主体，其余合并进去，并记为所属来源的重复
+        if seq < entry[0]:
+            _merge_into(bookmark, entry[2])
+            groups[key] = [seq, source, bookmark]
+            duplicate_source = entry[1]
+        else:
+            _merge_into(entry[2], bookmark)
+            duplicate_source = source
+        self.stats[self.html_files[duplicate_source]]['duplicates'] += 1
+
+    def _finish(self, groups: dict) -> Iterator[Bookmark]:
+        """按最早出现的顺序产出一组合并结果"""
+        for seq, source, bookmark in sorted(groups.values(), key=lambda e: e[0]):
+            self.stats[self.html_files[source]]['new'] += 1
+            yield bookmark
+
+    def merge(self) -> Iterator[Bookmark]:
+        """
+        产出去重合并后的书签流
+        未溢写时按首次出现的顺序输出；溢写后按分片依次输出，分片内保持首次出现的顺序
+        """
+        groups: dict = {}
+        spill_files = None
+        spill_dir = None
+
+        try:
+            for seq, source, bookmark in self._records():
+                key = canonicalize_url(bookmark.url)
+
+                if spill_files is None:
+                    self._add(groups, seq, source, bookmark, key)
+                    if len(groups) <= self.max_in_memory:
+                        continue
+
+                    # 超出内存上限：创建分片文件，把已有分组写出去
+                    spill_dir = tempfile.mkdtemp(prefix='tabsort-merge-')
+                    spill_files = [
+                        open(os.path.join(spill_dir, f'part-{i}.jsonl'), 'w', encoding='utf-8')
+                        for i in range(self.partitions)
+                    ]
+                    for spill_key, (first_seq, first_source, bm) in groups.items():
+                        self._spill(spill_files, spill_key, first_seq, first_source, bm)
+                    groups.clear()
+                else:
+                    self._spill(spill_files, key, seq, source, bookmark)
+
+            if spill_files is None:
+                yield from self._finish(groups)
+                return
+
+            for f in spill_files:
+                f.close()
+
+            # 逐个分片在内存中合并
+            for f in spill_files:
+                groups = {}
+                with open(f.name, 'r', encoding='utf-8') as part:
+                    for line in part:
+                        key, seq, source, url, title, add_date, icon = json.loads(line)
+                        bookmark = Bookmark(url=url, title=title, add_date=add_date, icon=icon)
+                        self._add(groups, seq, source, bookmark, key)
+                yield from self._finish(groups)
+        finally:
+            if spill_files is not None:
+                for f in spill_files:
+                    f.close()
+                    if os.path.exists(f.name):
+                        os.remove(f.name)
+                os.rmdir(spill_dir)
+
+    def _spill(self, spill_files: list, key: str, seq: int, source: int, bookmark: Bookmark):
+        """按 URL 哈希写入分片文件"""
+        part = spill_files[zlib.crc32(key.encode('utf-8')) % len(spill_files)]
+        part.write(json.dumps([key, seq, source, bookmark.url, bookmark.title,
+                               bookmark.add_date, bookmark.icon], ensure_ascii=False))
+        part.write('\n')
@@ -0,0 +1,300 @@
+"""AI 请求指标：token 用量、提示词缓存命中、耗时、重试、费用估算"""
+import os
+import json
+import math
+import threading
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from typing import List, Dict, Optional
+from config import MODEL_PRICING, AI_METRICS_WINDOW
+
+# 直方图分桶
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+TOKEN_BUCKETS = (100, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+ITEM_BUCKETS = (1, 10, 50, 100, 200, 500, 1000, 2000)
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """最近秩法求分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class _Histogram:
+    """累计直方图（只保存各分桶计数、总和与观测数，内存占用与观测数无关）"""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+
+    def cumulative(self) -> Dict[str, int]:
+        """累计分桶计数 {上界: 不超过该值的观测数}，与 Prometheus 的 le 语义一致"""
+        counts = {}
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            counts[str(bound)] = total
+        counts['+Inf'] = self.count
+        return counts
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Optional[float]:
+    """
+    按 MODEL_PRICING 估算费用（美元），未配置价格的模型返回 None
+    :param cached_tokens: prompt_tokens 中命中提示词缓存的部分，按缓存价格计算（未配置缓存价格时按输入价格）
+    """
+    pricing = MODEL_PRICING.get(model)
+    if pricing is None:
+        return None
+    input_price, output_price = pricing[:2]
+    cached_price = pricing[2] if len(pricing) > 2 else input_price
+    return ((prompt_tokens - cached_tokens) * input_price + cached_tokens * cached_price
+            + completion_tokens * output_price) / 1_000_000
+
+
+class AIMetrics:
+    """
+    记录每次 AI 请求的指标（线程安全，流水线模式下会并发请求）
+    kind 区分请求类型：'batch'（批量分类）/ 'single'（逐个分类）
+
+    计数、token 和直方图是累计值；每次请求的明细只保留最近 window 次（用于耗时分位数和 JSON 报告），
+    常驻服务长时间运行时内存占用和汇总耗时都有上限
+    """
+
+    def __init__(self, model: str, window: int = AI_METRICS_WINDOW):
+        self.model = model
+        self.requests = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+        self._totals = {'requests': 0, 'failed_requests': 0, 'retries': 0, 'items': 0,
+                        'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}
+        self._finish_reasons: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        # 按请求类型累计 {kind: {'requests', 'items', 'cached_tokens'}}
+        self._kinds: Dict[str, Dict[str, int]] = {}
+        # 成功请求的直方图，按请求类型分别累计
+        self._histograms: Dict[str, Dict[str, _Histogram]] = {}
+
+    def record(self, kind: str, items: int, latency: float, prompt_tokens: Optional[int] = None,
+               completion_tokens: Optional[int] = None, finish_reason: Optional[str] = None,
+               retries: int = 0, error: Optional[str] = None, cached_tokens: Optional[int] = None):
+        """
+        记录一次请求（latency 为最后一次尝试的耗时，秒）
+        :param cached_tokens: prompt_tokens 中命中服务端提示词缓存的部分
+        """
+        with self._lock:
+            self.requests.append({
+                'kind': kind,
+                'items': items,
+                'latency': latency,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'cached_tokens': cached_tokens,
+                'finish_reason': finish_reason,
+                'retries': retries,
+                'error': error,
+            })
+
+            totals = self._totals
+            totals['requests'] += 1
+            totals['retries'] += retries
+            by_kind = self._kinds.setdefault(kind, {'requests': 0, 'items': 0, 'cached_tokens': 0})
+            by_kind['requests'] += 1
+
+            if error is not None:
+                totals['failed_requests'] += 1
+                self._errors[error] = self._errors.get(error, 0) + 1
+                return
+
+            reason = finish_reason or 'unknown'
+            self._finish_reasons[reason] = self._finish_reasons.get(reason, 0) + 1
+            totals['items'] += items
+            totals['prompt_tokens'] += prompt_tokens or 0
+            totals['completion_tokens'] += completion_tokens or 0
+            totals['cached_tokens'] += cached_tokens or 0
+            by_kind['items'] += items
+            by_kind['cached_tokens'] += cached_tokens or 0
+
+            histograms = self._histograms.get(kind)
+            if histograms is None:
+                histograms = self._histograms[kind] = {
+                    'latency': _Histogram(LATENCY_BUCKETS),
+                    'items': _Histogram(ITEM_BUCKETS),
+                    'tokens': _Histogram(TOKEN_BUCKETS),
+                }
+            histograms['latency'].observe(latency)
+            histograms['items'].observe(items)
+            histograms['tokens'].observe((prompt_tokens or 0) + (completion_tokens or 0))
+
+    def totals(self) -> dict:
+        """累计的请求数、token 用量和估算费用（不计算分位数，开销与请求数无关）"""
+        with self._lock:
+            totals = dict(self._totals)
+        cost = estimate_cost(self.model, totals['prompt_tokens'], totals['completion_tokens'],
+                             totals['cached_tokens'])
+        totals['cost_usd'] = round(cost, 6) if cost is not None else None
+        return totals
+
+    def _merged_histogram(self, name: str) -> Dict[str, int]:
+        """所有请求类型合并后的累计直方图"""
+        merged = None
+        for histograms in self._histograms.values():
+            counts = histograms[name].cumulative()
+            merged = counts if merged is None else {bound: merged[bound] + count for bound, count in counts.items()}
+        if merged is None:
+            buckets = {'latency': LATENCY_BUCKETS, 'items': ITEM_BUCKETS, 'tokens': TOKEN_BUCKETS}[name]
+            merged = _Histogram(buckets).cumulative()
+        return merged
+
+    def summary(self) -> dict:
+        """汇总指标（耗时分位数按最近 window 次请求计算）"""
+        totals = self.totals()
+        with self._lock:
+            recent = [r for r in self.requests if r['error'] is None]
+            finish_reasons = dict(self._finish_reasons)
+            errors = dict(self._errors)
+            kinds = {kind: dict(values) for kind, values in self._kinds.items()}
+            histograms = {name: self._merged_histogram(name) for name in ('latency', 'items', 'tokens')}
+
+        latencies = [r['latency'] for r in recent]
+        items = totals['items']
+        prompt_tokens = totals['prompt_tokens']
+        completion_tokens = totals['completion_tokens']
+        cached_tokens = totals['cached_tokens']
+        cost = totals['cost_usd']
+
+        by_kind = {}
+        for kind in sorted(kinds):
+            kind_latencies = [r['latency'] for r in recent if r['kind'] == kind]
+            by_kind[kind] = {
+                **kinds[kind],
+                'latency_p50': percentile(kind_latencies, 0.5),
+                'latency_p95': percentile(kind_latencies, 0.95),
+            }
+
+        return {
+            'model': self.model,
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'requests': totals['requests'],
+            'failed_requests': totals['failed_requests'],
+            'retries': totals['retries'],
+            'items': items,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cached_tokens': cached_tokens,
+            'cache_hit_ratio': round(cached_tokens / prompt_tokens, 3) if prompt_tokens else None,
+            'tokens_per_item': round((prompt_tokens + completion_tokens) / items, 1) if items else None,
+            'cost_usd': cost,
+            'cost_per_1k_items_usd': round(cost * 1000 / items, 6) if cost is not None and items else None,
+            'latency_seconds': {
+                'p50': percentile(latencies, 0.5),
+                'p95': percentile(latencies, 0.95),
+                'max': max(latencies) if latencies else None,
+                'histogram': histograms['latency'],
+            },
+            'items_per_request': histograms['items'],
+            'tokens_per_request': histograms['tokens'],
+            'finish_reasons': finish_reasons,
+            'errors': errors,
+            'by_kind': by_kind,
+        }
+
+    def write_json(self, path: str):
+        """写入 JSON 报告（汇总 + 最近请求的明细）"""
+        report = self.summary()
+        with self._lock:
+            report['request_log'] = list(self.requests)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    def write_prometheus(self, path: str):
+        """写入 Prometheus 文本格式（可用 node_exporter 的 textfile collector 采集）"""
+        with self._lock:
+            histograms = {kind: {name: (h.cumulative(), h.sum, h.count) for name, h in values.items()}
+                          for kind, values in self._histograms.items()}
+            finish_reasons = dict(self._finish_reasons)
+            errors = dict(self._errors)
+        totals = self.totals()
+
+        model = self.model.replace('\\', '\\\\').replace('"', '\\"')
+        lines = []
+
+        def histogram(name: str, help_text: str, field: str):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for kind in sorted(histograms):
+                counts, total, count = histograms[kind][field]
+                labels = f'model="{model}",kind="{kind}"'
+                for bound, bucket_count in counts.items():
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {bucket_count}')
+                lines.append(f'{name}_sum{{{labels}}} {total}')
+                lines.append(f'{name}_count{{{labels}}} {count}')
+
+        def counter(name: str, help_text: str, samples: Dict[str, float]):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for labels, value in samples.items():
+                lines.append(f'{name}{{{labels}}} {value}')
+
+        histogram('tabsort_ai_request_latency_seconds', 'AI request latency (last attempt).', 'latency')
+        histogram('tabsort_ai_request_items', 'Bookmarks classified per AI request.', 'items')
+        histogram('tabsort_ai_request_tokens', 'Prompt plus completion tokens per AI request.', 'tokens')
+
+        counter('tabsort_ai_tokens_total', 'Tokens used by AI requests.', {
+            f'model="{model}",type="prompt"': totals['prompt_tokens'],
+            f'model="{model}",type="completion"': totals['completion_tokens'],
+        })
+        counter('tabsort_ai_cached_prompt_tokens_total', 'Prompt tokens served from the provider prompt cache.',
+                {f'model="{model}"': totals['cached_tokens']})
+        counter('tabsort_ai_requests_total', 'AI requests by finish reason or error.', {
+            **{f'model="{model}",result="{reason}"': count
+               for reason, count in finish_reasons.items()},
+            **{f'model="{model}",result="error:{error}"': count
+               for error, count in errors.items()},
+        })
+        counter('tabsort_ai_retries_total', 'Retried AI request attempts.',
+                {f'model="{model}"': totals['retries']})
+        if totals['cost_usd'] is not None:
+            counter('tabsort_ai_cost_usd_total', 'Estimated AI cost in USD.',
+                    {f'model="{model}"': totals['cost_usd']})
+
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_file, path)
+
+
+def print_summary(summary: dict):
+    """打印指标摘要"""
+    if not summary['requests']:
+        return
+
+    latency = summary['latency_seconds']
+    print(f"\n📐 AI 请求指标 ({summary['model']})")
+    print("-" * 60)
+    print(f"   请求: {summary['requests']} 次（失败 {summary['failed_requests']}，重试 {summary['retries']}）")
+    print(f"   Token: 输入 {summary['prompt_tokens']}，输出 {summary['completion_tokens']}"
+          + (f"，每个书签 {summary['tokens_per_item']}" if summary['tokens_per_item'] else ""))
+    if summary['cached_tokens']:
+        print(f"   提示词缓存: 命中 {summary['cached_tokens']} 个输入 token（{summary['cache_hit_ratio']:.0%}）")
+    if latency['p50'] is not None:
+        print(f"   耗时: p50 {latency['p50']:.1f}s，p95 {latency['p95']:.1f}s，最长 {latency['max']:.1f}s")
+    if summary['cost_usd'] is not None:
+        print(f"   估算费用: ${summary['cost_usd']:.4f}"
+              + (f"（每千个书签 ${summary['cost_per_1k_items_usd']:.4f}）" if summary['cost_per_1k_items_usd'] else ""))
+    else:
+        print(f"   估算费用: 未知（在 config.MODEL_PRICING 中添加该模型的价格）")
+    if summary['finish_reasons'].get('length'):
+        print(f"   ⚠️  {summary['finish_reasons']['length']} 次请求因长度限制被截断，建议减小批量大小")
@@ -1,8 +1,28 @@
 """书签组织器"""
-from typing import List, Dict
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from heapq import merge
+from operator import attrgetter
+from typing import List, Dict, Iterable, Optional
 from dataclasses import dataclass
 from parser import Bookmark
-from config import MIN_CATEGORY_SIZE
+from config import MIN_CATEGORY_SIZE, ARCHIVE_FOLDER_NAME
+
+
+def months_ago(months: int, now: Optional[float] = None) -> int:
+    """N 个月前的同一时刻（本地时间，该月没有这一天时取月末）的时间戳"""
+    current = datetime.fromtimestamp(time.time() if now is None else now)
+    year, month = divmod(current.year * 12 + current.month - 1 - months, 12)
+    # 该月最后一天：下个月 1 日的前一天
+    next_year, next_month = divmod(year * 12 + month + 1, 12)
+    last_day = (datetime(next_year, next_month + 1, 1) - timedelta(days=1)).day
+    return int(current.replace(year=year, month=month + 1, day=min(current.day, last_day)).timestamp())
+
+
+def _year_start(year: int) -> int:
+    """该年 1 月 1 日零点（本地时间）的时间戳"""
+    return int(datetime(year, 1, 1).timestamp())
 
 
 @dataclass
@@ -52,65 +72,150 @@ class Folder:
             subfolder.sort_folders()
 
 
+class AddDateIndex:
+    """
+    按添加时间排序的书签索引（没有添加时间的书签单独放在 undated）
+    时间范围查询用二分查找，不需要遍历全部书签
+    """
+
+    def __init__(self, bookmarks: Iterable[Bookmark] = ()):
+        self.bookmarks = []
+        self.undated = []
+        for bookmark in bookmarks:
+            (self.undated if bookmark.added_at is None else self.bookmarks).append(bookmark)
+        self.bookmarks.sort(key=attrgetter('added_at'))
+        self.dates = [bookmark.added_at for bookmark in self.bookmarks]
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def range(self, start: Optional[int] = None, end: Optional[int] = None) -> List[Bookmark]:
+        """添加时间在 [start, end) 内的书签（按时间先后），不指定的一端不限"""
+        lo = bisect_left(self.dates, start) if start is not None else 0
+        hi = bisect_left(self.dates, end) if end is not None else len(self.dates)
+        return self.bookmarks[lo:hi]
+
+
 class BookmarkOrganizer:
     """书签组织器"""
 
-    def __init__(self, classified_bookmarks: dict):
+    def __init__(self, classified_bookmarks: dict = None, archive_months: Optional[int] = None,
+                 now: Optional[float] = None):
         """
         初始化
-        :param classified_bookmarks: {(主分类, 子分类): [书签列表]}
+        :param classified_bookmarks: {(主分类, 子分类): [书签列表]}，也可以之后用 add_classified 分批加入
+        :param archive_months: 添加时间早于这么多个月前的书签移入按年份划分的归档文件夹（不指定时不归档）
+        :param now: 计算归档时间点使用的当前时间（默认取组织时的时间）
         """
-        self.classified_bookmarks = classified_bookmarks
+        self.classified_bookmarks = classified_bookmarks or {}
+        self.archive_months = archive_months
+        self.now = now
         self.root = Folder("书签栏")
 
-    def organize(self) -> Folder:
-        """
-        组织书签为文件夹结构
-        """
         # 按主分类组织
-        category_folders = {}
+        self.category_folders: Dict[str, Folder] = {}
+        self._subfolders: Dict[tuple, Folder] = {}
 
-        for (category, subcategory), bookmarks in self.classified_bookmarks.items():
+    def add_classified(self, classified: dict):
+        """
+        增量加入一批分类结果（流水线模式下边分类边组织）
+        :param classified: {(主分类, 子分类): [书签列表]}
+        """
+        for (category, subcategory), bookmarks in classified.items():
             # 创建或获取主分类文件夹
-            if category not in category_folders:
-                category_folders[category] = Folder(category)
-
-            main_folder = category_folders[category]
+            main_folder = self.category_folders.get(category)
+            if main_folder is None:
+                main_folder = self.category_folders[category] = Folder(category)
 
             # 如果有子分类
             if subcategory:
                 # 查找或创建子分类文件夹
-                sub_folder = None
-                for sf in main_folder.subfolders:
-                    if sf.name == subcategory:
-                        sub_folder = sf
-                        break
-
-                if not sub_folder:
-                    sub_folder = Folder(subcategory)
+                sub_folder = self._subfolders.get((category, subcategory))
+                if sub_folder is None:
+                    sub_folder = self._subfolders[(category, subcategory)] = Folder(subcategory)
                     main_folder.add_subfolder(sub_folder)
 
                 # 添加书签到子分类
-                for bookmark in bookmarks:
-                    sub_folder.add_bookmark(bookmark)
+                sub_folder.bookmarks.extend(bookmarks)
             else:
                 # 直接添加到主分类
-                for bookmark in bookmarks:
-                    main_folder.add_bookmark(bookmark)
+                main_folder.bookmarks.extend(bookmarks)
+
+    def organize(self) -> Folder:
+        """
+        组织书签为文件夹结构
+        """
+        self.add_classified(self.classified_bookmarks)
+
+        # 先移出旧书签，合并小分类时只看留在书签栏的书签
+        archive = self._archive_old_bookmarks() if self.archive_months else None
 
         # 优化分类结构（合并小分类）
-        self._optimize_structure(category_folders)
+        self._optimize_structure(self.category_folders)
 
         # 添加所有主分类到根目录
-        for folder in category_folders.values():
+        for folder in self.category_folders.values():
             self.root.add_subfolder(folder)
 
         # 排序
         self.root.sort_bookmarks(by='domain')
         self.root.sort_folders()
 
+        # 归档文件夹放在最后
+        if archive is not None:
+            archive.sort_bookmarks(by='domain')
+            archive.sort_folders()
+            self.root.add_subfolder(archive)
+
         return self.root
 
+    def _archive_old_bookmarks(self) -> Optional[Folder]:
+        """
+        把添加时间早于 archive_months 个月前的书签从分类文件夹中移出
+        返回: 归档文件夹（归档/年份/主分类），没有需要归档的书签时返回 None
+        """
+        cutoff = months_ago(self.archive_months, self.now)
+
+        # 主分类文件夹和每个子分类各一个索引，归档和保留的书签都直接取二分查找的切片
+        indexes = {category: [(target, AddDateIndex(target.bookmarks)) for target in [folder] + folder.subfolders]
+                   for category, folder in self.category_folders.items()}
+        oldest = min((index.dates[0] for targets in indexes.values() for _, index in targets if index.dates),
+                     default=None)
+        if oldest is None or oldest >= cutoff:
+            return None
+
+        archive = Folder(ARCHIVE_FOLDER_NAME)
+        # 早于 1970 年（添加时间为负数）的书签归入第一个年份，不设下界
+        first_year = datetime.fromtimestamp(max(oldest, 0)).year
+        last_year = datetime.fromtimestamp(cutoff - 1).year
+        for year in range(first_year, last_year + 1):
+            start = _year_start(year) if year > first_year else None
+            end = min(_year_start(year + 1), cutoff)
+            year_folder = Folder(str(year))
+            for category, targets in indexes.items():
+                # 各文件夹的切片已按添加时间排序，合并后与整个主分类按时间排序的结果相同
+                bookmarks = list(merge(*(index.range(start, end) for _, index in targets),
+                                       key=attrgetter('added_at')))
+                if bookmarks:
+                    folder = Folder(category)
+                    folder.bookmarks = bookmarks
+                    year_folder.add_subfolder(folder)
+            if year_folder.subfolders:
+                archive.add_subfolder(year_folder)
+
+        # 分类文件夹只保留没有添加时间和归档时间点之后的书签，移除因此变空的文件夹
+        for category, targets in indexes.items():
+            for target, index in targets:
+                target.bookmarks = index.undated + index.range(cutoff)
+            folder = self.category_folders[category]
+            folder.subfolders = [subfolder for subfolder in folder.subfolders if subfolder.bookmarks]
+            if not folder.bookmarks and not folder.subfolders:
+                del self.category_folders[category]
+
+        self._subfolders = {key: subfolder for key, subfolder in self._subfolders.items()
+                            if key[0] in self.category_folders and subfolder.bookmarks}
+        return archive
+
     def _optimize_structure(self, category_folders: Dict[str, Folder]):
         """
         优化文件夹结构
@@ -1,9 +1,59 @@
 """书签解析器"""
-from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
+import os
+import re
+import html
+import mmap
+from typing import List, Dict, Optional, Iterator
 from dataclasses import dataclass
 from urllib.parse import urlparse
 
+# scheme://netloc 与其余部分
+_URL_RE = re.compile(r'([A-Za-z][A-Za-z0-9+.-]*)://([^/?]*)(.*)', re.S)
+
+# 快速解析用的 bytes 正则
+_NETSCAPE_DOCTYPE_RE = re.compile(rb'<!DOCTYPE\s+NETSCAPE-Bookmark-file-1>', re.I)
+_ANCHOR_RE = re.compile(rb'<A\s([^>]*)>(.*?)</A\s*>', re.I | re.S)
+_ANCHOR_OPEN_RE = re.compile(rb'<A[\s>]', re.I)
+_H3_RE = re.compile(rb'<H3(?:\s[^>]*)?>(.*?)</H3\s*>', re.I | re.S)
+_H3_OPEN_RE = re.compile(rb'<H3[\s>]', re.I)
+# 属性值可以是双引号、单引号或不带引号（与 HTML 解析规则一致），值在最后一个匹配的分组中
+_ATTR_RE = re.compile(rb'''([A-Za-z_][A-Za-z0-9_-]*)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))''')
+_TAG_START_RE = re.compile(rb'<')
+_TAG_RE = re.compile(r'<[^>]*>')
+_BOOKMARK_ATTRS = {b'href', b'add_date', b'icon'}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    规范化URL，用作跨文件/跨运行的书签标识
+    - scheme 和域名转小写，去掉默认端口
+    - 移除 fragment(hash)
+    - 空路径补为 /
+    """
+    # 字符串操作代替 urlparse，大批量导出/合并时开销小很多
+    url = url.strip().partition('#')[0]
+    match = _URL_RE.match(url)
+    if not match:
+        return url
+
+    scheme, netloc, rest = match.groups()
+    scheme = scheme.lower()
+    netloc = netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+
+    if not rest.startswith('/'):
+        rest = '/' + rest
+    return f"{scheme}://{netloc}{rest}"
+
+
+def parse_add_date(add_date: Optional[str]) -> Optional[int]:
+    """ADD_DATE 转为整数（秒），无法解析时返回 None"""
+    try:
+        return int(add_date) if add_date else None
+    except ValueError:
+        return None
+
 
 @dataclass
 class Bookmark:
@@ -13,11 +63,15 @@ class Bookmark:
     add_date: Optional[str] = None
     icon: Optional[str] = None
     domain: Optional[str] = None
+    # 解析后的 add_date（秒），排序、比较和按时间归档时使用；修改 add_date 时需同步更新
+    added_at: Optional[int] = None
 
     def __post_init__(self):
         """初始化后处理"""
         if self.url and not self.domain:
             self.domain = self._extract_domain(self.url)
+        if self.added_at is None and self.add_date:
+            self.added_at = parse_add_date(self.add_date)
 
     @staticmethod
     def _extract_domain(url: str) -> str:
@@ -33,18 +87,121 @@ class Bookmark:
             return ""
 
 
+def _decode(view: memoryview, start: int, end: int) -> str:
+    """解码 mmap 中的一段并反转义 HTML 实体"""
+    return html.unescape(str(view[start:end], 'utf-8', 'replace'))
+
+
+class MalformedBookmarkFile(ValueError):
+    """快速解析无法处理的书签文件（交给 BeautifulSoup 解析）"""
+
+
 class BookmarkParser:
     """书签解析器"""
 
-    def __init__(self, html_file: str):
+    def __init__(self, html_file: str, include_icons: bool = True, fast: bool = True):
+        """
+        :param include_icons: 是否读取 ICON（图标数据通常占文件大部分体积）
+        :param fast: 优先使用基于 mmap 的快速解析，格式异常时自动回退
+        """
         self.html_file = html_file
+        self.include_icons = include_icons
+        self.fast = fast
         self.bookmarks: List[Bookmark] = []
+        self.folders: List[str] = []
+        self._analyzer = None
+        self._analyzed_count = 0
 
     def parse(self) -> List[Bookmark]:
         """解析书签文件"""
+        self.bookmarks.extend(self.iter_parse())
+        return self.bookmarks
+
+    def iter_parse(self) -> Iterator[Bookmark]:
+        """逐个产出书签（不保存到 self.bookmarks），用于流式处理"""
+        if self.fast:
+            try:
+                yield from self._parse_fast()
+                return
+            except MalformedBookmarkFile as e:
+                print(f"⚠️  快速解析失败（{e}），改用完整解析")
+
+        yield from self._parse_soup()
+
+    def _parse_fast(self) -> Iterator[Bookmark]:
+        """
+        快速解析：mmap 整个文件，用 bytes 正则扫描 <A ...> 和 <H3> 标签
+        只解码需要的属性和标题片段，不需要图标时 ICON 数据只跳过不复制
+        先校验整个文件（只匹配不解码，开销很小），通过后再逐个产出书签，
+        异常时在产出任何书签之前抛出 MalformedBookmarkFile
+        """
+        with open(self.html_file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise MalformedBookmarkFile("文件为空")
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if not _NETSCAPE_DOCTYPE_RE.search(mm, 0, 1024):
+                    raise MalformedBookmarkFile("不是 Netscape 书签格式")
+
+                view = memoryview(mm)
+                try:
+                    self._validate(mm, view)
+                    yield from self._scan(mm, view)
+                finally:
+                    view.release()
+
+    def _validate(self, mm, view: memoryview):
+        """校验标签完整性，并读取文件夹名称"""
+        # 开始标签数与完整匹配数不一致，说明存在未闭合或畸形的标签
+        anchors = sum(1 for _ in _ANCHOR_RE.finditer(mm))
+        if anchors != len(_ANCHOR_OPEN_RE.findall(mm)):
+            raise MalformedBookmarkFile("<A> 标签不完整")
+
+        folders = [_decode(view, m.start(1), m.end(1)).strip() for m in _H3_RE.finditer(mm)]
+        if len(folders) != len(_H3_OPEN_RE.findall(mm)):
+            raise MalformedBookmarkFile("<H3> 标签不完整")
+        self.folders = folders
+
+    def _scan(self, mm, view: memoryview) -> Iterator[Bookmark]:
+        """扫描 mmap 中的书签"""
+        for match in _ANCHOR_RE.finditer(mm):
+            attrs = {}
+            for attr in _ATTR_RE.finditer(mm, match.start(1), match.end(1)):
+                name = mm[attr.start(1):attr.end(1)].lower()
+                if name == b'icon' and not self.include_icons:
+                    continue
+                if name in _BOOKMARK_ATTRS:
+                    value = attr.lastindex
+                    attrs[name] = _decode(view, attr.start(value), attr.end(value))
+
+            url = attrs.get(b'href')
+            if not url:
+                continue
+
+            title_start, title_end = match.start(2), match.end(2)
+            if _TAG_START_RE.search(mm, title_start, title_end):
+                # 标题中嵌套了标签：与 get_text(strip=True) 一致，各段文本去空白后拼接
+                raw = str(view[title_start:title_end], 'utf-8', 'replace')
+                title = ''.join(html.unescape(part).strip() for part in _TAG_RE.split(raw))
+            else:
+                title = _decode(view, title_start, title_end).strip()
+
+            yield Bookmark(
+                url=url,
+                title=title,
+                add_date=attrs.get(b'add_date'),
+                icon=attrs.get(b'icon')
+            )
+
+    def _parse_soup(self) -> Iterator[Bookmark]:
+        """使用 BeautifulSoup 解析（容错性好，但需要解码并构建整棵 DOM）"""
+        from bs4 import BeautifulSoup
+
         with open(self.html_file, 'r', encoding='utf-8') as f:
             soup = BeautifulSoup(f, 'html.parser')
 
+        self.folders = [h3.get_text(strip=True) for h3 in soup.find_all('h3')]
+
         # 查找所有的书签链接
         links = soup.find_all('a')
 
@@ -55,89 +212,43 @@ class BookmarkParser:
 
             title = link.get_text(strip=True)
             add_date = link.get('add_date')
-            icon = link.get('icon')
+            icon = link.get('icon') if self.include_icons else None
 
-            bookmark = Bookmark(
+            yield Bookmark(
                 url=url,
                 title=title,
                 add_date=add_date,
                 icon=icon
             )
 
-            self.bookmarks.append(bookmark)
+    def analyze(self):
+        """
+        获取书签分析结果（单次遍历，结果缓存）
+        书签列表变化（如再次 parse）后会重新分析
+        """
+        from analyzer import BookmarkAnalyzer
 
-        return self.bookmarks
+        analyzer = self._analyzer
+        if analyzer is None or analyzer.bookmarks is not self.bookmarks or self._analyzed_count != len(self.bookmarks):
+            analyzer = self._analyzer = BookmarkAnalyzer(self.bookmarks)
+            self._analyzed_count = len(self.bookmarks)
+        return analyzer
 
     def get_unique_bookmarks(self) -> tuple[List[Bookmark], List[Bookmark]]:
         """
         获取去重后的书签（基于URL）
         返回: (唯一书签列表, 重复书签列表)
         """
-        seen = {}  # url -> bookmark
-        unique = []
-        duplicates = []
-
-        for bookmark in self.bookmarks:
-            if bookmark.url not in seen:
-                seen[bookmark.url] = bookmark
-                unique.append(bookmark)
-            else:
-                duplicates.append(bookmark)
-
-        return unique, duplicates
+        analysis = self.analyze()
+        return analysis.unique, analysis.duplicates
 
     def find_hash_only_duplicates(self) -> List[tuple[str, List[Bookmark]]]:
         """
         查找只有hash不同的重复书签
         返回: [(基础URL, [书签列表])] - 只返回有多个书签的组
         """
-        from urllib.parse import urlparse, urlunparse
-
-        # 移除URL的hash部分
-        def remove_hash(url: str) -> str:
-            parsed = urlparse(url)
-            # 将hash部分设为空，重新组合URL
-            return urlunparse((
-                parsed.scheme,
-                parsed.netloc,
-                parsed.path,
-                parsed.params,
-                parsed.query,
-                ''  # 移除fragment(hash)
-            ))
-
-        # 按无hash的URL分组
-        url_groups = {}
-        for bookmark in self.bookmarks:
-            base_url = remove_hash(bookmark.url)
-            if base_url not in url_groups:
-                url_groups[base_url] = []
-            url_groups[base_url].append(bookmark)
-
-        # 只返回有多个书签的组（即有重复的）
-        duplicates = [(url, bookmarks) for url, bookmarks in url_groups.items()
-                      if len(bookmarks) > 1]
-
-        # 按重复数量排序
-        duplicates.sort(key=lambda x: len(x[1]), reverse=True)
-
-        return duplicates
+        return self.analyze().hash_only_duplicates
 
     def get_stats(self) -> Dict:
         """获取统计信息"""
-        total = len(self.bookmarks)
-        unique_bookmarks, _ = self.get_unique_bookmarks()
-        unique = len(unique_bookmarks)
-
-        domains = {}
-        for bookmark in self.bookmarks:
-            if bookmark.domain:
-                domains[bookmark.domain] = domains.get(bookmark.domain, 0) + 1
-
-        return {
-            'total': total,
-            'unique': unique,
-            'duplicates': total - unique,
-            'domains_count': len(domains),
-            'domains': domains
-        }
+        return self.analyze().stats
@@ -0,0 +1,200 @@
+"""流水线执行：解析 → 去重 → 分类 → 组织 并行进行"""
+import time
+import queue
+import threading
+from typing import List, Dict, Optional
+from parser import Bookmark, BookmarkParser, canonicalize_url
+from merger import _merge_into
+from organizer import BookmarkOrganizer, Folder
+from config import PIPELINE_BATCH_SIZE, PIPELINE_QUEUE_SIZE
+
+# 阶段结束标记
+_DONE = object()
+
+# 解析阶段每次向下游传递的书签数（减少队列操作次数）
+_PARSE_CHUNK_SIZE = 1000
+
+
+class BookmarkPipeline:
+    """
+    流水线执行整理流程
+    - 解析线程：流式解析各个输入文件，分块送入去重队列
+    - 去重线程：按规范化 URL 去重（重复书签的元数据合并到首次出现的书签），凑满一批送入分类队列
+    - 分类线程（workers 个）：每次分类一批，AI 分类时多个批次的请求可以同时进行
+    - 当前线程：按批次顺序把分类结果加入组织器，全部完成后整理文件夹结构
+
+    阶段之间是有界队列，下游跟不上时上游会阻塞等待（背压）；已送去分类、还没加入组织器的批次数也有上限
+    （某个批次分类很慢时，后面的批次完成后要等它才能按顺序加入组织器，不限制的话等待重排的结果会无限堆积），
+    在途的书签数有上限；总耗时趋近于最慢的那个阶段，而不是各阶段耗时之和
+    """
+
+    def __init__(self, input_files: List[str], classifier, workers: int = 1,
+                 batch_size: int = PIPELINE_BATCH_SIZE, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 include_icons: bool = True, archive_months: Optional[int] = None):
+        self.input_files = input_files
+        self.classifier = classifier
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.include_icons = include_icons
+        self.archive_months = archive_months
+
+        self.total = 0
+        self.duplicates = 0
+        self.classified: Dict[tuple, List[Bookmark]] = {}
+        # 各阶段实际工作的耗时（不含等待队列的时间），分类阶段为所有线程之和
+        self.stage_times = {'parse': 0.0, 'dedup': 0.0, 'classify': 0.0, 'organize': 0.0}
+
+        self._errors: List[BaseException] = []
+        self._lock = threading.Lock()
+        # 已送去分类、还没加入组织器的批次数上限：两个队列和正在分类的批次都占满时才会等待，
+        # 批次按顺序完成时不会限制吞吐，只在等待重排的结果堆积时阻塞去重阶段
+        self._in_flight = threading.Semaphore(queue_size * 2 + workers)
+
+    def _add_time(self, stage: str, seconds: float):
+        with self._lock:
+            self.stage_times[stage] += seconds
+
+    def _parse_stage(self, out_queue: queue.Queue):
+        """解析阶段"""
+        try:
+            chunk = []
+            start = time.perf_counter()
+            for input_file in self.input_files:
+                for bookmark in BookmarkParser(input_file, include_icons=self.include_icons).iter_parse():
+                    chunk.append(bookmark)
+                    if len(chunk) >= _PARSE_CHUNK_SIZE:
+                        self._add_time('parse', time.perf_counter() - start)
+                        out_queue.put(chunk)
+                        start = time.perf_counter()
+                        chunk = []
+            self._add_time('parse', time.perf_counter() - start)
+            if chunk:
+                out_queue.put(chunk)
+        except BaseException as e:
+            self._errors.append(e)
+        finally:
+            out_queue.put(_DONE)
+
+    def _dedup_stage(self, in_queue: queue.Queue, out_queue: queue.Queue):
+        """去重阶段：产出 (批次序号, 书签列表)"""
+        try:
+            seen: Dict[str, Bookmark] = {}
+            batch = []
+            batch_index = 0
+
+            while True:
+                chunk = in_queue.get()
+                if chunk is _DONE:
+                    break
+
+                start = time.perf_counter()
+                for bookmark in chunk:
+                    self.total += 1
+                    key = canonicalize_url(bookmark.url)
+                    kept = seen.get(key)
+                    if kept is not None:
+                        # 保留首次出现的书签（可能已在分类中），只合并元数据
+                        _merge_into(kept, bookmark)
+                        self.duplicates += 1
+                        continue
+
+                    seen[key] = bookmark
+                    batch.append(bookmark)
+                    if len(batch) >= self.batch_size:
+                        self._add_time('dedup', time.perf_counter() - start)
+                        self._in_flight.acquire()
+                        out_queue.put((batch_index, batch))
+                        start = time.perf_counter()
+                        batch_index += 1
+                        batch = []
+                self._add_time('dedup', time.perf_counter() - start)
+
+            if batch:
+                self._in_flight.acquire()
+                out_queue.put((batch_index, batch))
+        except BaseException as e:
+            self._errors.append(e)
+        finally:
+            # 每个分类线程一个结束标记
+            for _ in range(self.workers):
+                out_queue.put(_DONE)
+
+    def _classify_stage(self, in_queue: queue.Queue, out_queue: queue.Queue):
+        """分类阶段：产出 (批次序号, {(主分类, 子分类): [书签列表]})"""
+        try:
+            while True:
+                item = in_queue.get()
+                if item is _DONE:
+                    break
+
+                batch_index, batch = item
+                start = time.perf_counter()
+                classified = self.classifier.classify_batch(batch)
+                self._add_time('classify', time.perf_counter() - start)
+                out_queue.put((batch_index, classified))
+        except BaseException as e:
+            self._errors.append(e)
+        finally:
+            out_queue.put(_DONE)
+
+    def run(self) -> Folder:
+        """
+        执行流水线
+        返回: 组织好的根文件夹；分类结果保存在 self.classified
+        """
+        parsed_queue = queue.Queue(maxsize=self.queue_size)
+        batch_queue = queue.Queue(maxsize=self.queue_size)
+        result_queue = queue.Queue(maxsize=self.queue_size)
+
+        threads = [
+            threading.Thread(target=self._parse_stage, args=(parsed_queue,), daemon=True),
+            threading.Thread(target=self._dedup_stage, args=(parsed_queue, batch_queue), daemon=True),
+        ]
+        threads.extend(
+            threading.Thread(target=self._classify_stage, args=(batch_queue, result_queue), daemon=True)
+            for _ in range(self.workers)
+        )
+        for thread in threads:
+            thread.start()
+
+        organizer = BookmarkOrganizer(archive_months=self.archive_months)
+
+        # 分类线程完成的顺序不固定，按批次序号依次加入组织器，保证输出与线程调度无关
+        pending = {}
+        next_index = 0
+        running = self.workers
+
+        while running:
+            item = result_queue.get()
+            if item is _DONE:
+                running -= 1
+                # 分类线程出错时缺少的批次永远不会到达，去重阶段可能一直等待在途批次数的上限，直接结束
+                if self._errors:
+                    break
+                continue
+
+            batch_index, classified = item
+            pending[batch_index] = classified
+
+            start = time.perf_counter()
+            while next_index in pending:
+                classified = pending.pop(next_index)
+                organizer.add_classified(classified)
+                for key, group in classified.items():
+                    self.classified.setdefault(key, []).extend(group)
+                next_index += 1
+                self._in_flight.release()
+            self._add_time('organize', time.perf_counter() - start)
+
+        # 出错时上游线程可能阻塞在已满的队列上，不等待它们（守护线程随进程退出）
+        if self._errors:
+            raise self._errors[0]
+
+        for thread in threads:
+            thread.join()
+
+        start = time.perf_counter()
+        root = organizer.organize()
+        self._add_time('organize', time.perf_counter() - start)
+        return root
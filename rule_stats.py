@@ -0,0 +1,196 @@
+"""规则命中统计与自适应排序"""
+import os
+import json
+from dataclasses import replace
+from typing import List, Dict, Optional, Tuple
+from rules import CompiledRules, CompiledRule, _PATTERN_FIELDS
+from config import CACHE_DIR
+
+
+def _rule_paths(rules: CompiledRules) -> List[Tuple[str, CompiledRule]]:
+    """按优先级列出所有规则 [(路径, 规则)]，子分类路径为 "主分类/子分类" """
+    paths = []
+    for rule in rules.rules:
+        paths.append((rule.name, rule))
+        for subrule in rule.subrules:
+            paths.append((f"{rule.name}/{subrule.name}", subrule))
+    return paths
+
+
+class RuleStats:
+    """
+    规则命中统计
+    - evaluations: 规则被检查的次数
+    - hits: 检查后命中的次数；index_hits: 通过域名索引直接命中（未逐条检查）的次数
+    - time_ns: 检查耗时
+    - patterns: 各模式命中次数（每次命中只记第一个匹配的模式）
+    """
+
+    def __init__(self, rules: CompiledRules):
+        self.source_hash = rules.source_hash
+        self.bookmarks = 0
+        self.entries: Dict[str, dict] = {}
+        self._paths: Dict[int, str] = {}
+
+        for path, rule in _rule_paths(rules):
+            self._paths[id(rule)] = path
+            self.entries[path] = {
+                'evaluations': 0,
+                'hits': 0,
+                'index_hits': 0,
+                'time_ns': 0,
+                'patterns': {field_name: {pattern: 0 for pattern in getattr(rule, field_name)}
+                             for field_name in _PATTERN_FIELDS},
+            }
+
+    def record(self, rule: CompiledRule, match: Optional[str], pattern: Optional[str], elapsed_ns: int):
+        """记录一次规则检查"""
+        entry = self.entries[self._paths[id(rule)]]
+        entry['evaluations'] += 1
+        entry['time_ns'] += elapsed_ns
+        if match:
+            entry['hits'] += 1
+            self._count_pattern(entry, match, pattern)
+
+    def record_index_hit(self, rule: CompiledRule, pattern: Optional[str]):
+        """记录一次域名索引命中"""
+        entry = self.entries[self._paths[id(rule)]]
+        entry['index_hits'] += 1
+        self._count_pattern(entry, 'domain', pattern)
+
+    def _count_pattern(self, entry: dict, match: str, pattern: Optional[str]):
+        # 匹配方式 'domain' / 'keyword' / 'url_pattern' 对应字段名加 s
+        patterns = entry['patterns'][f"{match}s"]
+        if pattern in patterns:
+            patterns[pattern] += 1
+
+    def merge(self, other: 'RuleStats'):
+        """累加另一份统计（规则相同的部分）"""
+        self.bookmarks += other.bookmarks
+        for path, other_entry in other.entries.items():
+            entry = self.entries.get(path)
+            if entry is None:
+                continue
+            for key in ('evaluations', 'hits', 'index_hits', 'time_ns'):
+                entry[key] += other_entry[key]
+            for field_name, counts in other_entry['patterns'].items():
+                for pattern, hits in counts.items():
+                    if pattern in entry['patterns'][field_name]:
+                        entry['patterns'][field_name][pattern] += hits
+
+    def report(self) -> dict:
+        """生成报告（规则按优先级排列），并列出从未命中的规则和模式"""
+        rules = []
+        dead_rules = []
+        dead_patterns = []
+
+        for path, entry in self.entries.items():
+            hits = entry['hits'] + entry['index_hits']
+            rules.append({
+                'rule': path,
+                'evaluations': entry['evaluations'],
+                'hits': entry['hits'],
+                'index_hits': entry['index_hits'],
+                'misses': entry['evaluations'] - entry['hits'],
+                'time_ms': round(entry['time_ns'] / 1e6, 3),
+                'patterns': entry['patterns'],
+            })
+            if not hits:
+                dead_rules.append(path)
+            for field_name, counts in entry['patterns'].items():
+                dead_patterns.extend(f"{path}.{field_name}: {pattern}"
+                                     for pattern, count in counts.items() if not count)
+
+        return {
+            'source_hash': self.source_hash,
+            'bookmarks': self.bookmarks,
+            'rules': rules,
+            'dead_rules': dead_rules,
+            'dead_patterns': dead_patterns,
+        }
+
+    def save(self, path: str):
+        """保存原始计数（用于跨运行累计）"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'source_hash': self.source_hash, 'bookmarks': self.bookmarks,
+                       'entries': self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_file, path)
+
+    def load(self, path: str) -> bool:
+        """累加之前保存的计数，规则内容不同时忽略，返回是否加载成功"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('source_hash') != self.source_hash:
+            return False
+
+        saved = RuleStats.__new__(RuleStats)
+        saved.bookmarks = data.get('bookmarks', 0)
+        saved.entries = data.get('entries', {})
+        self.merge(saved)
+        return True
+
+
+def stats_file(rules: CompiledRules) -> str:
+    """规则统计的累计文件（按规则内容哈希区分）"""
+    return os.path.join(CACHE_DIR, f"rule-stats-{rules.source_hash[:16]}.json")
+
+
+def reorder_rules(rules: CompiledRules, stats: RuleStats) -> CompiledRules:
+    """
+    按历史命中次数重排规则中的模式，命中多的先检查
+
+    只在同一规则的同一字段（domains / keywords / url_patterns）内部重排：
+    字段内任一模式命中的结果都相同（同一个匹配方式），检查顺序只影响多快找到命中，
+    不影响是否命中，因此首次命中的分类、子分类和匹配方式都与原顺序完全一致。
+    分类之间、子分类之间以及字段之间的顺序决定了首次命中的结果，保持不变——
+    子串匹配下任意两条规则都可能同时命中同一个书签，无法安全交换。
+    """
+    def reorder(path: str, rule: CompiledRule) -> CompiledRule:
+        counts = stats.entries[path]['patterns']
+        fields = {
+            field_name: tuple(sorted(getattr(rule, field_name),
+                                     key=lambda pattern: -counts[field_name].get(pattern, 0)))
+            for field_name in _PATTERN_FIELDS
+        }
+        return replace(rule, **fields)
+
+    reordered = []
+    for rule in rules.rules:
+        new_rule = reorder(rule.name, rule)
+        new_rule = replace(new_rule, subrules=tuple(
+            reorder(f"{rule.name}/{subrule.name}", subrule) for subrule in rule.subrules
+        ))
+        reordered.append(new_rule)
+
+    return replace(rules, rules=reordered)
+
+
+def print_report(report: dict, top: int = 5):
+    """打印报告摘要"""
+    rules = report['rules']
+    total_ms = sum(rule['time_ms'] for rule in rules)
+
+    print(f"\n📈 规则命中统计 ({report['bookmarks']} 个书签，规则检查共 {total_ms:.1f} ms)")
+    print("-" * 60)
+
+    hottest = sorted(rules, key=lambda r: r['hits'] + r['index_hits'], reverse=True)[:top]
+    print("   命中最多:")
+    for rule in hottest:
+        print(f"     • {rule['rule']}: 命中 {rule['hits'] + rule['index_hits']}"
+              f"（索引 {rule['index_hits']}），检查 {rule['evaluations']} 次")
+
+    slowest = sorted(rules, key=lambda r: r['time_ms'], reverse=True)[:top]
+    print("   耗时最多:")
+    for rule in slowest:
+        print(f"     • {rule['rule']}: {rule['time_ms']:.1f} ms，未命中 {rule['misses']} 次")
+
+    if report['dead_rules']:
+        print(f"   从未命中的规则 ({len(report['dead_rules'])}): {', '.join(report['dead_rules'][:10])}"
+              + (" ..." if len(report['dead_rules']) > 10 else ""))
+    print(f"   从未命中的模式: {len(report['dead_patterns'])} 个")
+
@@ -0,0 +1,335 @@
+"""分类规则加载与编译"""
+import os
+import sys
+import json
+import pickle
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple
+from config import CATEGORIES, RULES_FILE, CACHE_DIR, GENERATED_RULES_FILE, RULES_CACHE_MAX_AGE_DAYS
+from distill import categories_to_domains
+
+# 编译产物格式版本，结构变化时递增以使旧缓存失效
+_ARTIFACT_VERSION = 2
+
+_PATTERN_FIELDS = ('domains', 'keywords', 'url_patterns')
+
+# 本进程已提示过检查结果的规则（source_hash），同一份规则多次加载时只提示一次
+_reported = set()
+
+
+@dataclass
+class CompiledRule:
+    """编译后的单条规则（主分类或子分类）"""
+    name: str
+    priority: int
+    domains: Tuple[str, ...] = ()
+    keywords: Tuple[str, ...] = ()
+    url_patterns: Tuple[str, ...] = ()
+    subrules: Tuple['CompiledRule', ...] = ()
+
+
+@dataclass
+class CompiledRules:
+    """
+    编译后的规则集
+    - rules: 按优先级排列的主分类规则（优先级表）
+    - domain_index: 域名 -> 列出该域名的最高优先级主分类序号
+    - generated: 从 AI 分类结果提炼的规则，域名 -> (主分类, 子分类)，优先于手写规则
+    """
+    source_hash: str
+    rules: List[CompiledRule]
+    domain_index: Dict[str, int] = field(default_factory=dict)
+    warnings: List[str] = field(default_factory=list)
+    generated: Dict[str, Tuple[str, Optional[str]]] = field(default_factory=dict)
+
+    def lookup_generated(self, domain: str) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        查找域名在生成规则中的分类，只按域名精确匹配（不查上级域名、不做子串匹配）
+        生成规则是按书签的完整域名投票得到的，上级域名的结论不能代表子域名（amazon.com 与 aws.amazon.com）
+        返回 (主分类, 子分类)，未命中返回 None
+        """
+        return self.generated.get(domain) if domain else None
+
+    def lookup_domain(self, domain: str) -> Optional[int]:
+        """
+        查找域名（及其上级域名）命中的最高优先级主分类
+        返回主分类序号，未命中返回 None
+        """
+        best = None
+        while domain:
+            priority = self.domain_index.get(domain)
+            if priority is not None and (best is None or priority < best):
+                best = priority
+            _, _, domain = domain.partition('.')
+        return best
+
+
+def _validate(categories: dict, source: str):
+    """校验规则结构，出错时抛出 ValueError"""
+    if not isinstance(categories, dict) or not categories:
+        raise ValueError(f"{source}: 规则文件顶层必须是非空的分类字典")
+
+    def check_rule(path: str, info, allow_sub: bool):
+        if not isinstance(info, dict):
+            raise ValueError(f"{source}: {path} 必须是字典")
+
+        allowed = set(_PATTERN_FIELDS) | ({'subcategories'} if allow_sub else set())
+        unknown = set(info) - allowed
+        if unknown:
+            raise ValueError(f"{source}: {path} 包含未知字段 {sorted(unknown)}")
+
+        for field_name in _PATTERN_FIELDS:
+            patterns = info.get(field_name, [])
+            if not isinstance(patterns, list):
+                raise ValueError(f"{source}: {path}.{field_name} 必须是列表")
+            for pattern in patterns:
+                if not isinstance(pattern, str) or not pattern.strip():
+                    raise ValueError(f"{source}: {path}.{field_name} 包含空值或非字符串: {pattern!r}")
+
+        subcategories = info.get('subcategories', {})
+        if not isinstance(subcategories, dict):
+            raise ValueError(f"{source}: {path}.subcategories 必须是字典")
+        for sub_name, sub_info in subcategories.items():
+            check_rule(f"{path}/{sub_name}", sub_info, allow_sub=False)
+
+    for name, info in categories.items():
+        check_rule(name, info, allow_sub=True)
+
+
+def _compile_rule(name: str, priority: int, info: dict, warnings: List[str], path: str) -> CompiledRule:
+    """编译单条规则：模式转小写并去重"""
+    fields = {}
+    for field_name in _PATTERN_FIELDS:
+        seen = []
+        for pattern in info.get(field_name, []):
+            pattern = pattern.lower()
+            if pattern in seen:
+                warnings.append(f"重复规则: {path}.{field_name} 中 '{pattern}' 出现多次")
+                continue
+            seen.append(pattern)
+        fields[field_name] = tuple(seen)
+
+    subrules = tuple(
+        _compile_rule(sub_name, sub_priority, sub_info, warnings, f"{path}/{sub_name}")
+        for sub_priority, (sub_name, sub_info) in enumerate(info.get('subcategories', {}).items())
+    )
+
+    return CompiledRule(name=name, priority=priority, subrules=subrules, **fields)
+
+
+def _find_shadowed(rules: Tuple[CompiledRule, ...], warnings: List[str], parent: str = ""):
+    """
+    查找被遮蔽的规则模式
+    规则按顺序首次命中即返回，若靠前规则的某个模式是靠后规则模式的子串，
+    则靠后的模式永远不会生效：
+    - 域名 d2 被靠前的域名或关键词（子串）遮蔽
+    - 关键词 k2 被靠前的关键词（子串）遮蔽
+    - URL 模式 u2 被靠前的关键词或 URL 模式（子串）遮蔽
+    """
+    earlier_domains: List[str] = []
+    earlier_keywords: List[str] = []
+    earlier_url_patterns: List[str] = []
+
+    for rule in rules:
+        path = f"{parent}{rule.name}"
+        checks = (
+            ('domains', rule.domains, earlier_domains + earlier_keywords),
+            ('keywords', rule.keywords, earlier_keywords),
+            ('url_patterns', rule.url_patterns, earlier_keywords + earlier_url_patterns),
+        )
+
+        shadowed_count = 0
+        total_count = 0
+        for field_name, patterns, shadowing in checks:
+            for pattern in patterns:
+                total_count += 1
+                by = next((s for s in shadowing if s in pattern), None)
+                if by is not None:
+                    shadowed_count += 1
+                    warnings.append(f"被遮蔽规则: {path}.{field_name} 中 '{pattern}' 已被更靠前的 '{by}' 覆盖")
+
+        if total_count and shadowed_count == total_count:
+            warnings.append(f"被遮蔽规则: {path} 的所有模式都被更靠前的规则覆盖，该分类永远不会命中")
+
+        earlier_domains.extend(rule.domains)
+        earlier_keywords.extend(rule.keywords)
+        earlier_url_patterns.extend(rule.url_patterns)
+
+        if rule.subrules:
+            _find_shadowed(rule.subrules, warnings, parent=f"{path}/")
+
+
+def compile_generated(categories: dict, source: str, warnings: List[str]) -> Dict[str, Tuple[str, Optional[str]]]:
+    """
+    编译生成的规则（结构与 CATEGORIES 相同，由 distill.py 写入）
+    生成规则只按域名精确匹配，keywords / url_patterns 会被忽略
+    """
+    _validate(categories, source)
+
+    def has_patterns(info: dict) -> bool:
+        return bool(info.get('keywords') or info.get('url_patterns'))
+
+    if any(has_patterns(info) or any(has_patterns(sub) for sub in info.get('subcategories', {}).values())
+           for info in categories.values()):
+        warnings.append(f"生成规则: {source} 中的 keywords / url_patterns 不生效，生成规则只按域名匹配")
+
+    return categories_to_domains(categories)
+
+
+def compile_rules(categories: dict, source_hash: str = "", source: str = "<config>",
+                  generated: Optional[dict] = None, generated_source: str = GENERATED_RULES_FILE) -> CompiledRules:
+    """
+    校验并编译规则
+    :param generated: 生成的规则（结构与 categories 相同），优先于 categories 按域名匹配
+    """
+    _validate(categories, source)
+
+    warnings: List[str] = []
+    rules = [
+        _compile_rule(name, priority, info, warnings, name)
+        for priority, (name, info) in enumerate(categories.items())
+    ]
+    _find_shadowed(tuple(rules), warnings)
+
+    # 域名索引：记录列出该域名的最高优先级主分类
+    domain_index: Dict[str, int] = {}
+    for rule in rules:
+        for domain in rule.domains:
+            domain_index.setdefault(domain, rule.priority)
+
+    generated_domains = compile_generated(generated, generated_source, warnings) if generated else {}
+
+    return CompiledRules(source_hash=source_hash, rules=rules, domain_index=domain_index,
+                         warnings=warnings, generated=generated_domains)
+
+
+def _read_rules_file(path: str) -> Tuple[dict, bytes]:
+    """读取 JSON / TOML 规则文件，返回 (规则字典, 原始内容)"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+
+    try:
+        if path.endswith('.toml'):
+            import tomllib
+            categories = tomllib.loads(raw.decode('utf-8'))
+        else:
+            categories = json.loads(raw)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"{path}: 规则文件解析失败: {e}") from e
+
+    return categories, raw
+
+
+def load_rules(path: Optional[str] = RULES_FILE, use_cache: bool = True, verbose: bool = True,
+               generated_path: Optional[str] = GENERATED_RULES_FILE) -> CompiledRules:
+    """
+    加载规则：优先使用规则文件，未配置时使用 config.CATEGORIES
+    generated_path 存在时一并加载生成的规则（优先于手写规则）
+    编译结果按内容哈希缓存到 CACHE_DIR，内容不变时直接加载
+    """
+    if path:
+        categories, raw = _read_rules_file(path)
+        source = path
+    else:
+        categories = CATEGORIES
+        raw = json.dumps(CATEGORIES, ensure_ascii=False).encode('utf-8')
+        source = "<config>"
+
+    generated = None
+    generated_raw = b''
+    if generated_path and os.path.exists(generated_path):
+        generated, generated_raw = _read_rules_file(generated_path)
+
+    source_hash = hashlib.sha256(raw + b'\0' + generated_raw).hexdigest()
+    cache_file = os.path.join(CACHE_DIR, f"rules-v{_ARTIFACT_VERSION}-{source_hash[:16]}.pickle")
+
+    compiled = _load_cached(cache_file, source_hash) if use_cache else None
+    if compiled is None:
+        compiled = compile_rules(categories, source_hash=source_hash, source=source,
+                                 generated=generated, generated_source=generated_path)
+        if use_cache:
+            _save_cached(cache_file, compiled)
+
+    # 检查结果保存在编译产物中，命中缓存时同样提示；内置规则的检查结果不打印，生成规则的问题总是提示
+    shown = compiled.warnings if path else [w for w in compiled.warnings if w.startswith("生成规则")]
+    if verbose and shown and source_hash not in _reported:
+        _reported.add(source_hash)
+        print(f"\n⚠️  规则检查发现 {len(shown)} 个问题 ({source}):")
+        for warning in shown:
+            print(f"   • {warning}")
+
+    return compiled
+
+
+def _load_cached(cache_file: str, source_hash: str) -> Optional[CompiledRules]:
+    """读取缓存的编译产物，不存在或已失效时返回 None"""
+    try:
+        with open(cache_file, 'rb') as f:
+            compiled = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if not isinstance(compiled, CompiledRules) or compiled.source_hash != source_hash:
+        return None
+
+    # 更新修改时间，标记为仍在使用，避免被清理
+    try:
+        os.utime(cache_file)
+    except OSError:
+        pass
+    return compiled
+
+
+def _save_cached(cache_file: str, compiled: CompiledRules):
+    """写入编译产物，并清理旧的缓存"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_file = cache_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"⚠️  规则缓存写入失败: {e}")
+        return
+    _prune_stale(cache_file)
+
+
+def _prune_stale(current: str):
+    """
+    删除旧的规则缓存：其他格式版本的缓存总是删除（不会再被读取），
+    当前版本的其他缓存超过 RULES_CACHE_MAX_AGE_DAYS 天未使用时删除（规则文件修改后旧缓存不会再命中）
+    """
+    cutoff = time.time() - RULES_CACHE_MAX_AGE_DAYS * 86400
+    current_prefix = f"rules-v{_ARTIFACT_VERSION}-"
+    try:
+        entries = list(os.scandir(CACHE_DIR))
+    except OSError:
+        return
+
+    for entry in entries:
+        name = entry.name
+        if not (name.startswith("rules-v") and name.endswith(".pickle")) or entry.path == current:
+            continue
+        try:
+            if not name.startswith(current_prefix) or entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+if __name__ == "__main__":
+    # 校验规则文件: python rules.py [规则文件]
+    target = sys.argv[1] if len(sys.argv) > 1 else RULES_FILE
+    try:
+        result = load_rules(target, use_cache=False, verbose=False)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"✅ 规则有效: {target or '<config>'}")
+    print(f"   主分类: {len(result.rules)} 个")
+    print(f"   子分类: {sum(len(rule.subrules) for rule in result.rules)} 个")
+    print(f"   索引域名: {len(result.domain_index)} 个")
+    print(f"   生成规则域名: {len(result.generated)} 个")
+    for warning in result.warnings:
+        print(f"   ⚠️  {warning}")
@@ -0,0 +1,178 @@
+"""书签全文检索索引（SQLite FTS5）"""
+import re
+import sqlite3
+import time
+from typing import List, Optional, Tuple
+from parser import canonicalize_url
+from config import SEARCH_INDEX_FILE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    canonical_url TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    title TEXT,
+    domain TEXT,
+    category TEXT,
+    subcategory TEXT,
+    updated_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_docs_category ON docs(category);
+CREATE INDEX IF NOT EXISTS idx_docs_domain ON docs(domain);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    title, url_tokens, domain, category,
+    tokenize = 'unicode61'
+);
+"""
+
+# 各列的 bm25 权重：标题 > 域名 > 分类 > URL
+_BM25_WEIGHTS = (10.0, 2.0, 5.0, 3.0)
+
+# 英文/数字单词，或连续的中文字符
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]+")
+
+
+def _tokenize(text: str) -> List[str]:
+    """
+    切分为检索词
+    unicode61 会把连续中文当作一个词，这里预先切成二元组，单字保留原样
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall((text or "").lower()):
+        if token[0] >= '\u4e00' and len(token) > 1:
+            tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def _fts_row(title: str, url: str, domain: str, category: str, subcategory: Optional[str]) -> Tuple[str, str, str, str]:
+    """构建写入 FTS 表的一行（预先切词）"""
+    category_text = f"{category} {subcategory}" if subcategory else category
+    return (
+        ' '.join(_tokenize(title)),
+        ' '.join(_tokenize(url)),
+        ' '.join(_tokenize(domain)),
+        ' '.join(_tokenize(category_text)),
+    )
+
+
+class BookmarkSearchIndex:
+    """
+    书签全文检索索引
+    以规范化 URL 为键，每次运行只写入新增或变化的书签
+    """
+
+    def __init__(self, db_file: str = SEARCH_INDEX_FILE):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def update(self, classified: dict, prune: bool = False) -> dict:
+        """
+        增量更新索引
+        :param classified: {(主分类, 子分类): [书签列表]}
+        :param prune: 是否删除本次未出现的书签（传入的是完整书签集时使用）
+        返回: {'added': 新增数, 'updated': 更新数, 'removed': 删除数}
+        """
+        existing = {
+            row[0]: row[1:]
+            for row in self.conn.execute(
+                'SELECT canonical_url, id, url, title, category, subcategory FROM docs'
+            )
+        }
+
+        now = int(time.time())
+        to_insert = []
+        to_update = []
+        seen = set()
+
+        # 新书签的 id 由这里分配，FTS 表的 rowid 与之一致
+        next_id = (self.conn.execute('SELECT MAX(id) FROM docs').fetchone()[0] or 0) + 1
+
+        for (category, subcategory), bookmarks in classified.items():
+            for bm in bookmarks:
+                key = canonicalize_url(bm.url)
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                old = existing.get(key)
+                if old is None:
+                    to_insert.append((next_id, key, bm.url, bm.title, bm.domain or '', category, subcategory))
+                    next_id += 1
+                elif old[1:] != (bm.url, bm.title, category, subcategory):
+                    to_update.append((old[0], key, bm.url, bm.title, bm.domain or '', category, subcategory))
+
+        removed_ids = []
+        if prune:
+            removed_ids = [(value[0],) for key, value in existing.items() if key not in seen]
+
+        with self.conn:
+            self.conn.execute('BEGIN')
+
+            # 变化的和被删除的书签，先从 FTS 表中移除
+            self.conn.executemany('DELETE FROM docs_fts WHERE rowid = ?',
+                                  ((row[0],) for row in to_update))
+            self.conn.executemany('DELETE FROM docs_fts WHERE rowid = ?', removed_ids)
+            self.conn.executemany('DELETE FROM docs WHERE id = ?', removed_ids)
+
+            self.conn.executemany(
+                'UPDATE docs SET url = ?, title = ?, domain = ?, category = ?, subcategory = ?, updated_at = ? '
+                'WHERE id = ?',
+                ((url, title, domain, category, sub, now, doc_id)
+                 for doc_id, _, url, title, domain, category, sub in to_update)
+            )
+            self.conn.executemany(
+                'INSERT INTO docs (id, canonical_url, url, title, domain, category, subcategory, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (row + (now,) for row in to_insert)
+            )
+            self.conn.executemany(
+                'INSERT INTO docs_fts (rowid, title, url_tokens, domain, category) VALUES (?, ?, ?, ?, ?)',
+                ((doc_id,) + _fts_row(title, url, domain, category, sub)
+                 for doc_id, _, url, title, domain, category, sub in to_update + to_insert)
+            )
+
+        return {'added': len(to_insert), 'updated': len(to_update), 'removed': len(removed_ids)}
+
+    def search(self, query: str, category: Optional[str] = None, domain: Optional[str] = None,
+               limit: int = 20) -> List[dict]:
+        """
+        检索书签，按 bm25 相关度排序
+        :param category: 只返回该主分类下的书签
+        :param domain: 只返回该域名（含子域名）下的书签
+        """
+        tokens = _tokenize(query)
+        if not tokens:
+            return []
+
+        # 每个词加引号，避免被当成 FTS5 语法；多个词之间为 AND
+        match = ' '.join(f'"{token}"' for token in tokens)
+
+        sql = (
+            'SELECT d.title, d.url, d.domain, d.category, d.subcategory, '
+            f'bm25(docs_fts, {", ".join(str(w) for w in _BM25_WEIGHTS)}) AS rank '
+            'FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid '
+            'WHERE docs_fts MATCH ?'
+        )
+        params = [match]
+
+        if category:
+            sql += ' AND d.category = ?'
+            params.append(category)
+        if domain:
+            domain = domain.lower()
+            sql += " AND (d.domain = ? OR d.domain LIKE '%.' || ?)"
+            params.extend([domain, domain])
+
+        sql += ' ORDER BY rank LIMIT ?'
+        params.append(limit)
+
+        columns = ('title', 'url', 'domain', 'category', 'subcategory', 'rank')
+        return [dict(zip(columns, row)) for row in self.conn.execute(sql, params)]
@@ -0,0 +1,172 @@
+"""已整理书签索引：跨运行记录整理过的 URL 及其分类，再次整理时只分类新书签"""
+import os
+import json
+import shutil
+import hashlib
+from typing import List, Tuple, Optional, Dict
+
+import numpy as np
+
+from parser import Bookmark, canonicalize_url
+from config import SEEN_INDEX_DIR
+
+_HASHES_FILE = 'hashes.npy'
+_PLACEMENTS_FILE = 'placements.npy'
+_CATEGORIES_FILE = 'categories.json'
+# 指向当前版本子目录的文件
+_CURRENT_FILE = 'CURRENT'
+_GENERATION_PREFIX = 'gen-'
+
+
+def url_hash(url: str) -> int:
+    """规范化 URL 的 64 位哈希（百万级书签的碰撞概率约 1e-8）"""
+    digest = hashlib.blake2b(canonicalize_url(url).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _hash_bookmarks(bookmarks: List[Bookmark]) -> np.ndarray:
+    return np.fromiter((url_hash(bookmark.url) for bookmark in bookmarks), dtype=np.uint64, count=len(bookmarks))
+
+
+class SeenIndex:
+    """
+    已整理书签索引（目录），每次更新写入一个新的版本子目录 gen-N/：
+    - hashes.npy: 排序后的 URL 哈希 (uint64)，加载时内存映射，查询用二分查找
+    - placements.npy: 与 hashes 一一对应的分类序号 (uint32)
+    - categories.json: 分类列表 [[主分类, 子分类]]
+    三个文件都写完后再替换 CURRENT（记录当前版本子目录名）切换版本，中断时仍读取完整的旧版本
+
+    每个书签只占 12 字节，查询不需要把索引读入内存
+    """
+
+    def __init__(self, directory: str = SEEN_INDEX_DIR):
+        self.directory = directory
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.placements = np.empty(0, dtype=np.uint32)
+        self.categories: List[Tuple[str, Optional[str]]] = []
+        self.generation = 0
+
+        current_file = os.path.join(directory, _CURRENT_FILE)
+        if os.path.exists(current_file):
+            with open(current_file, 'r', encoding='utf-8') as f:
+                name = f.read().strip()
+            if not name.startswith(_GENERATION_PREFIX) or not name[len(_GENERATION_PREFIX):].isdigit():
+                raise ValueError(f"{directory}: 已整理书签索引已损坏，删除该目录后重新运行")
+            self.generation = int(name[len(_GENERATION_PREFIX):])
+            self._load(os.path.join(directory, name))
+        elif os.path.exists(os.path.join(directory, _HASHES_FILE)):
+            # 旧格式：文件直接放在目录下
+            self._load(directory)
+
+    def _load(self, path: str):
+        """加载一个版本，并检查三个文件是否一致"""
+        try:
+            self.hashes = np.load(os.path.join(path, _HASHES_FILE), mmap_mode='r')
+            self.placements = np.load(os.path.join(path, _PLACEMENTS_FILE), mmap_mode='r')
+            with open(os.path.join(path, _CATEGORIES_FILE), 'r', encoding='utf-8') as f:
+                self.categories = [(main, sub) for main, sub in json.load(f)]
+        except (OSError, ValueError) as e:
+            raise ValueError(f"{self.directory}: 已整理书签索引已损坏（{e}），删除该目录后重新运行") from e
+
+        consistent = (
+            len(self.hashes) == len(self.placements)
+            and (not len(self.placements) or int(self.placements.max()) < len(self.categories))
+        )
+        if not consistent:
+            raise ValueError(f"{self.directory}: 已整理书签索引已损坏，删除该目录后重新运行")
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def split(self, bookmarks: List[Bookmark]) -> Tuple[dict, List[Bookmark]]:
+        """
+        把书签分为已整理过的和新的
+        返回: ({(主分类, 子分类): [已整理过的书签]}（沿用上次的分类）, [新书签])
+        """
+        if not len(self.hashes) or not bookmarks:
+            return {}, list(bookmarks)
+
+        hashes = _hash_bookmarks(bookmarks)
+        positions = np.searchsorted(self.hashes, hashes)
+        positions[positions == len(self.hashes)] = 0
+        found = self.hashes[positions] == hashes
+        placements = self.placements[positions]
+
+        known: Dict[Tuple[str, Optional[str]], List[Bookmark]] = {}
+        new = []
+        for bookmark, is_known, placement in zip(bookmarks, found.tolist(), placements.tolist()):
+            if is_known:
+                known.setdefault(self.categories[placement], []).append(bookmark)
+            else:
+                new.append(bookmark)
+        return known, new
+
+    def update(self, classified: dict) -> int:
+        """
+        记录分类结果（已存在的 URL 更新为新的分类）
+        写入新的版本子目录后替换 CURRENT，三个文件作为整体切换（原子更新）
+        :param classified: {(主分类, 子分类): [书签列表]}
+        返回: 新增的 URL 数
+        """
+        category_ids = {key: i for i, key in enumerate(self.categories)}
+        new_hashes = []
+        new_placements = []
+        for key, bookmarks in classified.items():
+            key = (key[0], key[1] or None)
+            if key not in category_ids:
+                category_ids[key] = len(self.categories)
+                self.categories.append(key)
+            new_hashes.append(_hash_bookmarks(bookmarks))
+            new_placements.append(np.full(len(bookmarks), category_ids[key], dtype=np.uint32))
+
+        if not new_hashes:
+            return 0
+
+        # 新结果排在前面，np.unique 对重复的哈希取第一次出现的位置，即新的分类
+        hashes = np.concatenate(new_hashes + [np.asarray(self.hashes)])
+        placements = np.concatenate(new_placements + [np.asarray(self.placements)])
+        hashes, first = np.unique(hashes, return_index=True)
+        placements = placements[first]
+        added = len(hashes) - len(self.hashes)
+
+        generation = self.generation + 1
+        name = f"{_GENERATION_PREFIX}{generation}"
+        path = os.path.join(self.directory, name)
+        # 上次写到一半中断留下的同名目录
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        self._write(os.path.join(path, _HASHES_FILE), lambda f: np.save(f, hashes))
+        self._write(os.path.join(path, _PLACEMENTS_FILE), lambda f: np.save(f, placements))
+        self._write(os.path.join(path, _CATEGORIES_FILE), lambda f: f.write(
+            json.dumps([list(key) for key in self.categories], ensure_ascii=False).encode('utf-8')
+        ))
+
+        current_file = os.path.join(self.directory, _CURRENT_FILE)
+        self._write(current_file + '.tmp', lambda f: f.write(name.encode('utf-8')))
+        os.replace(current_file + '.tmp', current_file)
+
+        self.hashes = hashes
+        self.placements = placements
+        self.generation = generation
+        self._prune(name)
+        return added
+
+    @staticmethod
+    def _write(path: str, write):
+        """写入文件并落盘（切换版本前必须确保数据完整）"""
+        with open(path, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _prune(self, current: str):
+        """删除旧版本和旧格式的文件"""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.startswith(_GENERATION_PREFIX) and name != current:
+                    shutil.rmtree(path)
+                elif name in (_HASHES_FILE, _PLACEMENTS_FILE, _CATEGORIES_FILE):
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,179 @@
+"""超出内存的整理：分类结果溢写到磁盘，外部排序后流式输出"""
+import os
+import json
+import heapq
+import shutil
+import tempfile
+from itertools import groupby
+from typing import Dict, List, Iterator, Optional, Tuple, TextIO
+from parser import Bookmark
+from config import MIN_CATEGORY_SIZE, SPILL_SORT_RUN_SIZE
+
+# 同时打开的溢写文件数上限（AI 可能产生很多主分类）
+_MAX_OPEN_FILES = 64
+
+
+class SpillingOrganizer:
+    """
+    内存占用有上限的书签组织器，与 BookmarkOrganizer 产生相同的文件夹结构和顺序
+    - add_classified: 分类结果按主分类追加写入各自的临时文件，内存中只保留每个(主分类, 子分类)的数量
+    - iter_categories: 按 BookmarkOrganizer 的规则决定哪些子分类合并到主分类，
+      然后逐个主分类外部排序（超过 sort_run_size 时分段排序再归并），流式产出书签
+
+    排序键与 organize() 结果一致：
+    - 文件夹按名称排序，子文件夹在前、直属书签在后
+    - 书签按 (域名, 标题小写) 稳定排序；合并进主分类的书签排在主分类原有书签之后、
+      多个被合并的子分类按创建顺序排列，同一分组内按加入顺序排列
+    """
+
+    def __init__(self, root_name: str = "书签栏", sort_run_size: int = SPILL_SORT_RUN_SIZE):
+        self.root_name = root_name
+        self.sort_run_size = sort_run_size
+        self.spill_dir = tempfile.mkdtemp(prefix='tabsort-spill-')
+
+        # {(主分类, 子分类): 书签数}，键的顺序即首次出现的顺序（子分类为空字符串表示直属书签）
+        self.counts: Dict[Tuple[str, str], int] = {}
+        self.total = 0
+
+        self._paths: Dict[str, str] = {}
+        self._open_files: Dict[str, TextIO] = {}
+
+    def _file(self, category: str) -> TextIO:
+        """获取主分类的溢写文件（追加模式）"""
+        f = self._open_files.get(category)
+        if f is not None:
+            return f
+
+        if len(self._open_files) >= _MAX_OPEN_FILES:
+            for opened in self._open_files.values():
+                opened.close()
+            self._open_files.clear()
+
+        path = self._paths.get(category)
+        if path is None:
+            path = self._paths[category] = os.path.join(self.spill_dir, f'category-{len(self._paths)}.jsonl')
+
+        f = self._open_files[category] = open(path, 'a', encoding='utf-8')
+        return f
+
+    def add_classified(self, classified: dict):
+        """
+        加入一批分类结果
+        :param classified: {(主分类, 子分类): [书签列表]}
+        """
+        for (category, subcategory), bookmarks in classified.items():
+            key = (category, subcategory or '')
+            self.counts[key] = self.counts.get(key, 0) + len(bookmarks)
+
+            f = self._file(category)
+            for bookmark in bookmarks:
+                f.write(json.dumps([self.total, key[1], bookmark.url, bookmark.title,
+                                    bookmark.add_date, bookmark.icon, bookmark.domain], ensure_ascii=False))
+                f.write('\n')
+                self.total += 1
+
+    def _merged_subcategories(self, category: str) -> Dict[str, int]:
+        """
+        按 BookmarkOrganizer._optimize_structure 的规则，返回需要合并到主分类的子分类
+        返回: {子分类: 合并顺序}（从 1 开始，0 表示主分类原有的书签）
+        """
+        subcategories = [sub for (cat, sub) in self.counts if cat == category and sub]
+
+        # 只有一个子分类时直接平铺
+        if len(subcategories) == 1:
+            return {subcategories[0]: 1}
+
+        # 数量太少的子分类合并到主分类
+        small = [sub for sub in subcategories if self.counts[(category, sub)] < MIN_CATEGORY_SIZE]
+        return {sub: order for order, sub in enumerate(small, 1)}
+
+    def category_stats(self) -> dict:
+        """分类统计，格式与分类器的 get_category_stats 相同"""
+        stats = {}
+        for (category, subcategory), count in self.counts.items():
+            info = stats.setdefault(category, {'total': 0, 'subcategories': {}})
+            info['total'] += count
+            info['subcategories'][subcategory or '未分组'] = count
+        return stats
+
+    def iter_categories(self) -> Iterator[Tuple[str, Iterator[Tuple[Optional[str], Iterator[Bookmark]]]]]:
+        """
+        按输出顺序产出 (主分类, 分组迭代器)，可直接传给 BookmarkHTMLGenerator.generate_stream
+        分组迭代器产出 (子分类, 书签迭代器)，子分类为 None 表示直属书签；必须按顺序消费
+        """
+        for f in self._open_files.values():
+            f.close()
+        self._open_files.clear()
+
+        for category in sorted(self._paths):
+            yield category, self._iter_sections(category)
+
+    def _iter_sections(self, category: str) -> Iterator[Tuple[Optional[str], Iterator[Bookmark]]]:
+        merged = self._merged_subcategories(category)
+
+        def sort_key(record: list) -> tuple:
+            seq, subcategory, url, title, add_date, icon, domain = record
+            order = 0
+            if subcategory in merged:
+                order = merged[subcategory]
+                subcategory = ''
+            # 子文件夹（按名称）在前，直属书签在后
+            return (not subcategory, subcategory, domain or '', title.lower(), order, seq)
+
+        records = self._sorted_records(self._paths[category], sort_key)
+        for (is_direct, subcategory), group in groupby(records, key=lambda item: item[0][:2]):
+            bookmarks = (Bookmark(url=url, title=title, add_date=add_date, icon=icon, domain=domain)
+                         for _, (seq, sub, url, title, add_date, icon, domain) in group)
+            yield (None if is_direct else subcategory), bookmarks
+
+    def _sorted_records(self, path: str, sort_key) -> Iterator[Tuple[tuple, list]]:
+        """
+        外部排序一个溢写文件，产出 (排序键, 记录)
+        记录数不超过 sort_run_size 时直接在内存中排序，否则分段排序写入临时文件后归并
+        """
+        runs: List[str] = []
+        chunk: List[Tuple[tuple, list]] = []
+
+        def flush():
+            chunk.sort(key=lambda item: item[0])
+            run_path = f"{path}.run{len(runs)}"
+            with open(run_path, 'w', encoding='utf-8') as run:
+                for item in chunk:
+                    run.write(json.dumps(item, ensure_ascii=False))
+                    run.write('\n')
+            runs.append(run_path)
+            chunk.clear()
+
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                chunk.append((sort_key(record), record))
+                if len(chunk) >= self.sort_run_size:
+                    flush()
+
+        if not runs:
+            chunk.sort(key=lambda item: item[0])
+            yield from chunk
+            return
+
+        if chunk:
+            flush()
+
+        def read_run(run_path: str) -> Iterator[Tuple[tuple, list]]:
+            with open(run_path, 'r', encoding='utf-8') as run:
+                for line in run:
+                    key, record = json.loads(line)
+                    yield tuple(key), record
+
+        try:
+            yield from heapq.merge(*(read_run(run_path) for run_path in runs), key=lambda item: item[0])
+        finally:
+            for run_path in runs:
+                os.remove(run_path)
+
+    def close(self):
+        """删除所有临时文件"""
+        for f in self._open_files.values():
+            f.close()
+        self._open_files.clear()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
@@ -0,0 +1,21 @@
+from ai_classifier import AIBookmarkClassifier
+from parser import Bookmark
+
+
+def test_streaming_prints_header_once(monkeypatch, capsys):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "dummy")
+    classifier = AIBookmarkClassifier(checkpoint=False, verbose=False)
+    classifier.classify_chunk = lambda batch, start, categories: [("AI", None)] * len(batch)
+
+    for i in range(3):
+        classified = classifier.classify_batch([Bookmark(url=f"https://{i}-{j}.example/", title="t") for j in range(4)])
+        assert len(classified[("AI", None)]) == 4
+    classifier.end_progress()
+
+    out = capsys.readouterr().out
+    assert out.count("使用 AI 进行智能分类") == 1
+    assert "处理批次" not in out
+    # 进度在同一行刷新，结束时只换一次行
+    progress = out[out.index("进度"):]
+    assert progress.count("\n") == 1
+    assert "已分类 12 个" in progress
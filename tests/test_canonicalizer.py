@@ -0,0 +1,42 @@
+import re
+
+from ai_classifier import AIBookmarkClassifier
+from canonicalizer import CategoryCanonicalizer, normalize_category
+from config import CATEGORY_SYNONYMS, DEFAULT_CATEGORY
+
+
+def test_normalize_keeps_character_order():
+    assert normalize_category("ＡＩ - 工具") == normalize_category("ai工具")
+    assert normalize_category("技术开发") != normalize_category("开发技术")
+
+
+def test_similar_names_with_opposite_meaning_are_not_merged():
+    canonicalizer = CategoryCanonicalizer()
+    assert canonicalizer.canonicalize("技术开发", "Web前端") == ("技术开发", "Web前端")
+    assert canonicalizer.canonicalize("技术开发", "Web后端") == ("技术开发", "Web后端")
+    assert canonicalizer.canonicalize("站点-aws.amazon.com") == ("站点-aws.amazon.com", None)
+    assert canonicalizer.canonicalize("站点-amazon.com") == ("站点-amazon.com", None)
+
+
+def test_synonyms_and_formatting_variants_merge():
+    canonicalizer = CategoryCanonicalizer()
+    assert canonicalizer.canonicalize("编程开发", "前端") == ("技术开发", "前端")
+    assert canonicalizer.canonicalize("技术 开发", "前端") == ("技术开发", "前端")
+    assert canonicalizer.canonicalize("ai", "AI对话") == ("AI", "AI对话")
+    assert canonicalizer.canonicalize("AI", "人工智能") == ("AI", None)
+
+
+def test_non_string_names_fall_back_to_default():
+    canonicalizer = CategoryCanonicalizer()
+    assert canonicalizer.canonicalize(["技术开发"], "前端") == (DEFAULT_CATEGORY, None)
+    assert canonicalizer.canonicalize("技术开发", {"name": "前端"}) == ("技术开发", None)
+
+
+def test_prompt_categories_are_canonical():
+    """提示词推荐的主分类归一后保持不变，AI 按提示词回答时不会被改写"""
+    prompt = AIBookmarkClassifier.__new__(AIBookmarkClassifier)._build_system_prompt()
+    recommended = re.search(r"推荐的主分类参考：(.+)", prompt).group(1).split("、")
+    canonicalizer = CategoryCanonicalizer()
+    for name in recommended:
+        assert canonicalizer.canonicalize(name) == (name, None)
+    assert set(CATEGORY_SYNONYMS) <= set(recommended)
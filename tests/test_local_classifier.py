@@ -0,0 +1,55 @@
+import numpy as np
+
+from config import DEFAULT_CATEGORY
+from local_classifier import LocalBookmarkClassifier
+from parser import Bookmark
+
+
+def bookmark(url, title):
+    return Bookmark(url=url, title=title, domain=url.split('/')[2])
+
+
+TRAINING = {
+    ("技术开发", "代码仓库"): [
+        bookmark("https://github.com/a/repo", "repo source code"),
+        bookmark("https://github.com/b/lib", "lib source code"),
+    ],
+    ("视频娱乐", None): [
+        bookmark("https://www.youtube.com/watch", "music video"),
+        bookmark("https://www.bilibili.com/video", "动画视频"),
+    ],
+}
+
+
+def test_classify_batch_with_confidence():
+    model = LocalBookmarkClassifier(min_confidence=0.2).fit(TRAINING)
+    items = [
+        bookmark("https://github.com/c/tool", "tool source code"),
+        bookmark("https://unknown.example/x", "zzz"),
+        bookmark("https://www.youtube.com/watch", "video"),
+    ]
+
+    classified, confidence = model.classify_batch(items, batch_size=2, with_confidence=True)
+    predictions, expected = model.predict(items)
+
+    assert np.allclose(confidence, expected)
+    assert classified == model.classify_batch(items)
+    assert items[0] in classified[("技术开发", "代码仓库")]
+    assert items[1] in classified[(DEFAULT_CATEGORY, None)]
+    assert confidence[1] < 0.2 <= confidence[0]
+
+
+def test_max_features_bounds_weights(tmp_path):
+    full = LocalBookmarkClassifier().fit(TRAINING)
+    small = LocalBookmarkClassifier(max_features=5).fit(TRAINING)
+
+    assert small.weights.shape == (5, len(small.labels))
+    assert sorted(small.vocab.values()) == list(range(5))
+    # 保留的是文档频率最高的特征
+    assert {"D:github.com", "d:github", "d:com"} <= set(small.vocab)
+
+    path = str(tmp_path / "model.npz")
+    small.save(path)
+    loaded = LocalBookmarkClassifier().load(path)
+    assert loaded.vocab == small.vocab
+    assert len(full.vocab) > 5
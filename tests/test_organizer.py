@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from config import ARCHIVE_FOLDER_NAME
+from organizer import AddDateIndex, BookmarkOrganizer
+from parser import Bookmark
+
+NOW = datetime(2024, 6, 15).timestamp()
+
+
+def bookmark(name, added_at):
+    return Bookmark(url=f"https://{name}.example/", title=name, domain=f"{name}.example", added_at=added_at)
+
+
+def all_titles(folder):
+    titles = {bookmark.title for bookmark in folder.bookmarks}
+    for subfolder in folder.subfolders:
+        titles |= all_titles(subfolder)
+    return titles
+
+
+def test_add_date_index_range():
+    items = [bookmark("b", 20), bookmark("none", None), bookmark("a", 10), bookmark("c", 30)]
+    index = AddDateIndex(items)
+
+    assert [b.title for b in index.range(15)] == ["b", "c"]
+    assert [b.title for b in index.range(None, 30)] == ["a", "b"]
+    assert [b.title for b in index.undated] == ["none"]
+
+
+def test_archive_keeps_pre_epoch_bookmarks():
+    recent = datetime(2024, 5, 1).timestamp()
+    classified = {
+        ("技术开发", "代码仓库"): [bookmark("negative", -86400 * 400), bookmark("recent", recent)] +
+                                  [bookmark(f"repo{i}", datetime(2019, 3, 1).timestamp()) for i in range(3)],
+        ("技术开发", None): [bookmark("epoch", 0), bookmark("undated", None)],
+    }
+    root = BookmarkOrganizer(classified, archive_months=12, now=NOW).organize()
+
+    archive = root.subfolders[-1]
+    assert archive.name == ARCHIVE_FOLDER_NAME
+    assert all_titles(archive) == {"negative", "epoch", "repo0", "repo1", "repo2"}
+    # 1970 年之前的书签归入第一个年份
+    first_year = archive.subfolders[0]
+    assert {"negative", "epoch"} <= all_titles(first_year)
+
+    kept = all_titles(root) - all_titles(archive)
+    assert kept == {"recent", "undated"}
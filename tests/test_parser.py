@@ -0,0 +1,50 @@
+import pytest
+
+from parser import BookmarkParser
+
+HEADER = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>Bookmarks</TITLE>
+<H1>Bookmarks</H1>
+<DL><p>
+    <DT><H3 ADD_DATE="1700000000">文件夹</H3>
+    <DL><p>
+"""
+FOOTER = """    </DL><p>
+</DL><p>
+"""
+
+
+def write_bookmarks(tmp_path, anchors):
+    path = tmp_path / "bookmarks.html"
+    path.write_text(HEADER + "".join(f"        <DT>{anchor}\n" for anchor in anchors) + FOOTER, encoding="utf-8")
+    return str(path)
+
+
+def parse(path, fast):
+    return [(b.url, b.title, b.add_date) for b in BookmarkParser(path, fast=fast).parse()]
+
+
+@pytest.mark.parametrize("anchor", [
+    "<A HREF='https://example.com/single?a=1&amp;b=2' ADD_DATE='1700000001'>单引号</A>",
+    "<A HREF=https://example.com/unquoted ADD_DATE=1700000002>不带引号</A>",
+    "<A href=\"https://example.com/double\" add_date=\"1700000003\">双引号</A>",
+])
+def test_fast_parser_reads_every_quoting_form(tmp_path, anchor):
+    path = write_bookmarks(tmp_path, [anchor])
+    fast = parse(path, fast=True)
+    assert len(fast) == 1
+    assert fast == parse(path, fast=False)
+
+
+def test_fast_parser_matches_soup_on_mixed_quoting(tmp_path):
+    path = write_bookmarks(tmp_path, [
+        "<A HREF=\"https://a.example/\" ADD_DATE=\"1\">A</A>",
+        "<A HREF='https://b.example/' ADD_DATE=\"2\">B</A>",
+        "<A HREF=https://c.example/ ADD_DATE='3' ICON='data:image/png;base64,AAAA'>C</A>",
+        "<A NAME=anchor>没有链接</A>",
+    ])
+    assert parse(path, fast=True) == parse(path, fast=False)
+    assert [url for url, _, _ in parse(path, fast=True)] == [
+        "https://a.example/", "https://b.example/", "https://c.example/",
+    ]
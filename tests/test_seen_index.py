@@ -0,0 +1,88 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import seen_index
+from parser import Bookmark
+from seen_index import SeenIndex
+
+
+def bookmarks(*urls):
+    return [Bookmark(url=url, title=url) for url in urls]
+
+
+def placements(index, urls):
+    known, new = index.split(bookmarks(*urls))
+    result = {bookmark.url: key for key, group in known.items() for bookmark in group}
+    result.update((bookmark.url, None) for bookmark in new)
+    return result
+
+
+def test_update_and_reload(tmp_path):
+    directory = str(tmp_path / "seen")
+    index = SeenIndex(directory)
+    assert index.update({("技术开发", "代码仓库"): bookmarks("https://github.com/a")}) == 1
+    assert index.update({("AI", None): bookmarks("https://github.com/a", "https://chatgpt.com/")}) == 1
+
+    reloaded = SeenIndex(directory)
+    assert placements(reloaded, ["https://github.com/a", "https://chatgpt.com/", "https://new.example/"]) == {
+        "https://github.com/a": ("AI", None),
+        "https://chatgpt.com/": ("AI", None),
+        "https://new.example/": None,
+    }
+    # 只保留当前版本
+    assert sorted(os.listdir(directory)) == ["CURRENT", f"gen-{reloaded.generation}"]
+
+
+def test_interrupted_update_keeps_previous_version(tmp_path, monkeypatch):
+    directory = str(tmp_path / "seen")
+    SeenIndex(directory).update({("技术开发", None): bookmarks("https://github.com/a")})
+
+    # 写完 hashes / placements 后、写 categories 时中断
+    original = SeenIndex._write
+
+    def interrupted(path, write):
+        if path.endswith(seen_index._CATEGORIES_FILE):
+            raise KeyboardInterrupt
+        original(path, write)
+
+    monkeypatch.setattr(SeenIndex, "_write", staticmethod(interrupted))
+    with pytest.raises(KeyboardInterrupt):
+        SeenIndex(directory).update({("AI", None): bookmarks("https://chatgpt.com/", "https://github.com/a")})
+    monkeypatch.undo()
+
+    index = SeenIndex(directory)
+    assert placements(index, ["https://github.com/a", "https://chatgpt.com/"]) == {
+        "https://github.com/a": ("技术开发", None),
+        "https://chatgpt.com/": None,
+    }
+    # 中断留下的目录在下次更新时被覆盖和清理
+    index.update({("AI", None): bookmarks("https://chatgpt.com/")})
+    assert placements(SeenIndex(directory), ["https://chatgpt.com/"]) == {"https://chatgpt.com/": ("AI", None)}
+
+
+def test_inconsistent_index_is_rejected(tmp_path):
+    directory = tmp_path / "seen"
+    SeenIndex(str(directory)).update({("技术开发", None): bookmarks("https://github.com/a")})
+    generation = (directory / "CURRENT").read_text()
+    (directory / generation / "categories.json").write_text(json.dumps([]), encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        SeenIndex(str(directory))
+
+
+def test_legacy_layout_is_loaded_and_migrated(tmp_path):
+    directory = tmp_path / "seen"
+    directory.mkdir()
+    np.save(directory / "hashes.npy", np.array([seen_index.url_hash("https://github.com/a")], dtype=np.uint64))
+    np.save(directory / "placements.npy", np.array([0], dtype=np.uint32))
+    (directory / "categories.json").write_text(json.dumps([["技术开发", None]]), encoding="utf-8")
+
+    index = SeenIndex(str(directory))
+    assert placements(index, ["https://github.com/a"]) == {"https://github.com/a": ("技术开发", None)}
+
+    index.update({("AI", None): bookmarks("https://chatgpt.com/")})
+    assert sorted(os.listdir(directory)) == ["CURRENT", "gen-1"]
+    assert placements(SeenIndex(str(directory)), ["https://github.com/a"]) == {"https://github.com/a": ("技术开发", None)}